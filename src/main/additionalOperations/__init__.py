@@ -40,6 +40,7 @@ class EuclideanDistanceOperation(AbstractAdditionalLayerOperation):
         super(EuclideanDistanceOperation, self).__init__(1)
         self.selectedPointCoordinatesAttribute, self.nearestVertexCoordinatesAttribute, self.coordinatesCRSAttribute = tuple(
             getConfigurationProperties("GEOJSON_LAYERS_ATTRIBUTES")["points_attributes"].split(","))
+        self.precomputedEuclideanDistanceAttribute = "euclideanDistanceToNearestVertex"
 
     def runOperation(self, featureJson, prefix=""):
         """
@@ -49,6 +50,13 @@ class EuclideanDistanceOperation(AbstractAdditionalLayerOperation):
         :param prefix: "startPoint_" or "endPoint_".
         :return: Euclidean distance.
         """
+        if self.precomputedEuclideanDistanceAttribute in featureJson["properties"]:
+            # Grid point resolved with the GridVertexTable.
+            return {
+                prefix + PostfixAttribute.EUCLIDEAN_DISTANCE:
+                    featureJson["properties"][self.precomputedEuclideanDistanceAttribute]
+            }
+
         startPoint = Point(
             latitute=featureJson["properties"][self.selectedPointCoordinatesAttribute][1],
             longitude=featureJson["properties"][self.selectedPointCoordinatesAttribute][0],
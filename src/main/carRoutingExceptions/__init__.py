@@ -50,6 +50,16 @@ class NotParameterGivenException(Exception):
         super(NotParameterGivenException, self).__init__(message)
 
 
+class OutdatedNetworkException(Exception):
+    """
+    Thrown when a structure built offline from the network (i.e. the landmarks) was built on a different version of
+    the edges table.
+    """
+
+    def __init__(self, message):
+        super(OutdatedNetworkException, self).__init__(message)
+
+
 def deprecated(func):
     """This is a decorator which can be used to mark functions
     as deprecated. It will result in a warning being emmitted
@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+
+from src.main.util import getConfigurationProperties, Logger
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    def __init__(self, *args, **kwargs):
+        """
+        Connection of the pool, it keeps the names of the statements prepared in its session.
+        """
+        super(PooledConnection, self).__init__(*args, **kwargs)
+        self.preparedStatements = set()
+
+
+class PostgisConnectionPool:
+    __instance = None
+    __instanceLock = threading.Lock()
+
+    def __init__(self, connectionFactory, size, healthCheckInterval):
+        """
+        Thread-safe pool of database connections, the threads wait for a free connection when all of them are in use.
+
+        A connection idle for more than ``healthCheckInterval`` seconds is checked with ``SELECT 1`` before lending
+        it, and the connections that fail (or that fail the check) are discarded and replaced by new ones.
+
+        :param connectionFactory: Function creating a new connection.
+        :param size: Max number of open connections.
+        :param healthCheckInterval: Idle seconds after which a connection is checked before being used again.
+        """
+        self.connectionFactory = connectionFactory
+        self.size = size
+        self.healthCheckInterval = healthCheckInterval
+        self.semaphore = threading.BoundedSemaphore(size)
+        self.lock = threading.Lock()
+        self.idleConnections = []
+        self.pid = os.getpid()
+
+    @staticmethod
+    def getInstance():
+        """
+        :return: Pool shared by all the PostgisServiceProvider of the process, configured with the
+        ``DATABASE_CONFIG`` section.
+        """
+        with PostgisConnectionPool.__instanceLock:
+            if PostgisConnectionPool.__instance is None:
+                config = getConfigurationProperties(section="DATABASE_CONFIG")
+                PostgisConnectionPool.__instance = PostgisConnectionPool(
+                    connectionFactory=lambda: psycopg2.connect(database=config["database_name"],
+                                                               user=config["user"],
+                                                               password=config["password"],
+                                                               host=config["host"],
+                                                               connection_factory=PooledConnection),
+                    size=int(config["pool_size"]),
+                    healthCheckInterval=float(config["pool_health_check_interval"]))
+            return PostgisConnectionPool.__instance
+
+    @contextmanager
+    def connection(self):
+        """
+        Lend a connection, it is returned to the pool when the block ends. If the block raises a connection error
+        the connection is discarded.
+        """
+        con = self.acquire()
+        broken = False
+        try:
+            yield con
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.release(con, broken)
+
+    def acquire(self):
+        self.semaphore.acquire()
+        try:
+            while True:
+                with self.lock:
+                    if self.pid != os.getpid():
+                        # Forked worker, the connections of the parent process can not be shared.
+                        self.idleConnections = []
+                        self.pid = os.getpid()
+                    if not self.idleConnections:
+                        break
+                    con, lastUse = self.idleConnections.pop()
+
+                if self.isHealthy(con, lastUse):
+                    return con
+                self.close(con)
+
+            return self.connectionFactory()
+        except Exception:
+            self.semaphore.release()
+            raise
+
+    def release(self, con, broken=False):
+        try:
+            if broken or con.closed:
+                self.close(con)
+                return
+
+            try:
+                # Finish the transaction opened by the last query.
+                con.rollback()
+            except psycopg2.Error:
+                self.close(con)
+                return
+
+            with self.lock:
+                self.idleConnections.append((con, time.time()))
+        finally:
+            self.semaphore.release()
+
+    def isHealthy(self, con, lastUse):
+        if con.closed:
+            return False
+        if time.time() - lastUse < self.healthCheckInterval:
+            return True
+
+        try:
+            cursor = con.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            con.rollback()
+            return True
+        except psycopg2.Error:
+            Logger.getInstance().warning("Discarding a broken database connection")
+            return False
+
+    def close(self, con):
+        try:
+            con.close()
+        except psycopg2.Error:
+            pass
+
+    def closeAll(self):
+        with self.lock:
+            idleConnections = self.idleConnections
+            self.idleConnections = []
+        for con, _ in idleConnections:
+            self.close(con)
@@ -1,9 +1,18 @@
+import hashlib
+import io
+import queue
+import threading
+import uuid
+
+import numpy as np
 import psycopg2
 import geopandas as gpd
+from joblib import Parallel, delayed
 
 from src.main.connection import AbstractGeojsonProvider
+from src.main.connection.PostgisConnectionPool import PostgisConnectionPool
 from src.main.util import getConfigurationProperties, GPD_CRS, FileActions, \
-    dgl_timer
+    dgl_timer, Logger, parallel_job_print
 
 
 def executePostgisQueryReturningDataFrame(self, sql):
@@ -14,14 +23,44 @@ def executePostgisQueryReturningDataFrame(self, sql):
     :return: Sentence query results.
     """
 
-    con = self.getConnection()
+    return self.runWithPooledConnection(
+        lambda con: gpd.GeoDataFrame.from_postgis(sql, con, geom_col='geom', crs=GPD_CRS.PSEUDO_MERCATOR))
+
+
+BINARY_COPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+
 
-    try:
-        df = gpd.GeoDataFrame.from_postgis(sql, con, geom_col='geom', crs=GPD_CRS.PSEUDO_MERCATOR)
-    finally:
-        con.close()
+def decodeBinaryCopy(data, columnTypes):
+    """
+    Decode the output of ``COPY (...) TO STDOUT WITH (FORMAT binary)`` with fixed width columns, every row is read
+    as a record of (field count, (field length, value) per column) without parsing any text.
+
+    :param data: Bytes written by the COPY.
+    :param columnTypes: NumPy type of every column, "i8" for bigint and "f8" for double precision.
+    :return: List with one array per column.
+    """
+    if not data.startswith(BINARY_COPY_SIGNATURE):
+        raise ValueError("Invalid binary COPY signature")
 
-    return df
+    extensionLength = int(np.frombuffer(data, dtype=">i4", count=1, offset=15)[0])
+    offset = 19 + extensionLength
+
+    fields = [("fieldCount", ">i2")]
+    for i, columnType in enumerate(columnTypes):
+        fields.append(("length%s" % i, ">i4"))
+        fields.append(("column%s" % i, ">%s" % columnType))
+    rowType = np.dtype(fields)
+
+    # The last two bytes are the trailer (-1 as field count).
+    rowsLength = len(data) - offset - 2
+    if rowsLength % rowType.itemsize != 0:
+        raise ValueError("Unexpected binary COPY row size, the columns must be non NULL and of the given types")
+
+    rows = np.frombuffer(data, dtype=rowType, count=rowsLength // rowType.itemsize, offset=offset)
+    if np.any(rows["fieldCount"] != len(columnTypes)):
+        raise ValueError("Unexpected number of columns in the binary COPY rows")
+
+    return [rows["column%s" % i].astype(columnType) for i, columnType in enumerate(columnTypes)]
 
 
 class PostgisServiceProvider(AbstractGeojsonProvider):
@@ -31,7 +70,8 @@ class PostgisServiceProvider(AbstractGeojsonProvider):
 
     def getConnection(self):
         """
-        Creates a new connection to the pg_database
+        Creates a new connection to the pg_database, not shared with the connection pool and to be closed by the
+        caller.
 
         :return: New connection.
         """
@@ -41,6 +81,24 @@ class PostgisServiceProvider(AbstractGeojsonProvider):
 
         return con
 
+    def runWithPooledConnection(self, function):
+        """
+        Run the function with a connection of the shared PostgisConnectionPool. If the connection is lost during the
+        execution, the function is run once again with a new connection.
+
+        :param function: Function receiving the connection.
+        :return: Function result.
+        """
+        pool = PostgisConnectionPool.getInstance()
+        for attempt in range(2):
+            with pool.connection() as con:
+                try:
+                    return function(con)
+                except Exception:
+                    if attempt > 0 or not con.closed:
+                        raise
+            Logger.getInstance().warning("Database connection lost, retrying with a new connection")
+
     @dgl_timer
     def execute(self, sql):
         """
@@ -50,16 +108,339 @@ class PostgisServiceProvider(AbstractGeojsonProvider):
         :return: Sentence query results.
         """
 
-        con = self.getConnection()
+        df = executePostgisQueryReturningDataFrame(self, sql)
+
+        newJson = self.fileActions.convertToGeojson(df)
+
+        return newJson
+
+    def prepareStatement(self, con, sqlTemplate, parameterTypes):
+        """
+        Prepare the statement in the session of the pooled connection, only the first time it is used there.
+
+        :param con: Connection of the PostgisConnectionPool.
+        :param sqlTemplate: SQL sentence with the parameters given as $1, $2...
+        :param parameterTypes: PostgreSQL type of every parameter, i.e. ["integer", "bigint[]"].
+        :return: Name of the prepared statement.
+        """
+        name = "dora_%s" % hashlib.md5(("%s|%s" % (sqlTemplate, ",".join(parameterTypes))).encode()).hexdigest()
+        if name not in con.preparedStatements:
+            cursor = con.cursor()
+            cursor.execute("PREPARE %s (%s) AS %s" % (name, ",".join(parameterTypes), sqlTemplate))
+            con.preparedStatements.add(name)
+        return name
+
+    def executePreparedReturningDataFrame(self, sqlTemplate, parameterTypes, parameters):
+        """
+        Execute the prepared statement of the template, so that PostgreSQL parses and plans it once per connection.
+
+        :param sqlTemplate: SQL sentence with the parameters given as $1, $2...
+        :param parameterTypes: PostgreSQL type of every parameter.
+        :param parameters: Value of every parameter, the lists are sent as arrays.
+        :return: Sentence query results.
+        """
+
+        def executePrepared(con):
+            name = self.prepareStatement(con, sqlTemplate, parameterTypes)
+            return gpd.GeoDataFrame.from_postgis("EXECUTE %s (%s)" % (name, ",".join(["%s"] * len(parameters))),
+                                                 con, geom_col='geom', crs=GPD_CRS.PSEUDO_MERCATOR,
+                                                 params=list(parameters))
+
+        return self.runWithPooledConnection(executePrepared)
+
+    @dgl_timer
+    def executePrepared(self, sqlTemplate, parameterTypes, parameters):
+        """
+        Same as ``execute`` with a prepared statement.
+
+        :param sqlTemplate: SQL sentence with the parameters given as $1, $2...
+        :param parameterTypes: PostgreSQL type of every parameter.
+        :param parameters: Value of every parameter, the lists are sent as arrays.
+        :return: Sentence query results.
+        """
+
+        df = self.executePreparedReturningDataFrame(sqlTemplate, parameterTypes, parameters)
+
+        return self.fileActions.convertToGeojson(df)
+
+    @dgl_timer
+    def executeCopyReturningArrays(self, sql, columnTypes):
+        """
+        Stream the query results with a binary ``COPY (...) TO STDOUT`` and decode them straight into NumPy arrays,
+        without building any GeoDataFrame nor geojson text.
+
+        :param sql: SQL sentence, its columns must be cast to the given types (i.e. ``::bigint``,
+        ``::double precision``) and must not be NULL.
+        :param columnTypes: NumPy type of every column, "i8" for bigint and "f8" for double precision.
+        :return: List with one array per column.
+        """
+
+        def copy(con):
+            buffer = io.BytesIO()
+            con.cursor().copy_expert("COPY (%s) TO STDOUT WITH (FORMAT binary)" % sql, buffer)
+            return decodeBinaryCopy(buffer.getvalue(), columnTypes)
+
+        return self.runWithPooledConnection(copy)
+
+    @dgl_timer
+    def executeStagedCopyReturningArrays(self, sqlTemplate, columnTypes, startVerticesID, endVerticesID, blocks,
+                                         jobs=1):
+        """
+        Run the blocks of a many-to-many query over the start and end vertices staged in temporary tables. Every
+        connection used copies the vertex ids once into its session, and its blocks select their range of ids from
+        there instead of parsing them as ``ARRAY[...]`` literals. The blocks are run by ``jobs`` connections at the
+        same time and retrieved as with ``executeCopyReturningArrays``.
+
+        :param sqlTemplate: SQL sentence with two ``%s``, replaced by the start and end vertices array of the block.
+        :param columnTypes: NumPy type of every column, "i8" for bigint and "f8" for double precision.
+        :param startVerticesID: Start vertex ids.
+        :param endVerticesID: End vertex ids.
+        :param blocks: List of (start bottom limit, start upper limit, end bottom limit, end upper limit) positions
+        of the vertex ids of every block.
+        :param jobs: Number of connections running blocks at the same time.
+        :return: List with the columns of every block, in the order of the blocks.
+        """
+        pendingBlocks = queue.Queue()
+        for blockIndex in range(len(blocks)):
+            pendingBlocks.put(blockIndex)
+        results = [None] * len(blocks)
+
+        def runStagedBlocks(con):
+            startTableName, endTableName = self.stageVertices(con, startVerticesID, endVerticesID)
+            try:
+                cursor = con.cursor()
+                while True:
+                    try:
+                        blockIndex = pendingBlocks.get_nowait()
+                    except queue.Empty:
+                        break
+
+                    sql = self.getStagedBlockSQL(sqlTemplate, startTableName, endTableName, blocks[blockIndex])
+                    try:
+                        buffer = io.BytesIO()
+                        cursor.copy_expert("COPY (%s) TO STDOUT WITH (FORMAT binary)" % sql, buffer)
+                    except Exception:
+                        if con.closed:
+                            # Run again by the retry of runWithPooledConnection or by another connection.
+                            pendingBlocks.put(blockIndex)
+                        raise
+                    results[blockIndex] = decodeBinaryCopy(buffer.getvalue(), columnTypes)
+            finally:
+                self.dropStagedVertices(con, startTableName, endTableName)
 
+        with Parallel(n_jobs=jobs,
+                      backend="threading",
+                      verbose=int(getConfigurationProperties(section="PARALLELIZATION")["verbose"])) as parallel:
+            parallel._print = parallel_job_print
+            parallel(delayed(self.runWithPooledConnection)(runStagedBlocks)
+                     for _ in range(max(1, min(jobs, len(blocks)))))
+
+        return results
+
+    def stageVertices(self, con, startVerticesID, endVerticesID):
+        """
+        Copy the start and end vertex ids, with their position, into two temporary tables of the connection session.
+        The tables keep their rows until the end of the current transaction.
+
+        :param con: Connection of the PostgisConnectionPool.
+        :return: Names of the start and end vertices tables.
+        """
+        code = str(self.getUUID(con)).replace("-", "_")
+        startTableName = "dora_start_vertices_%s" % code
+        endTableName = "dora_end_vertices_%s" % code
+
+        # createTemporaryTable commits, both tables are created before copying any row.
+        for tableName in (startTableName, endTableName):
+            self.createTemporaryTable(con, tableName, {"position": "integer PRIMARY KEY", "vertex_id": "bigint"})
+
+        cursor = con.cursor()
+        for tableName, verticesID in ((startTableName, startVerticesID), (endTableName, endVerticesID)):
+            buffer = io.StringIO("".join("%s\t%s\n" % (position, vertexID)
+                                         for position, vertexID in enumerate(verticesID)))
+            cursor.copy_from(buffer, tableName, columns=("position", "vertex_id"))
+            cursor.execute("ANALYZE %s" % tableName)
+
+        return startTableName, endTableName
+
+    def dropStagedVertices(self, con, startTableName, endTableName):
+        """
+        Drop the tables created by ``stageVertices``, unless the connection was lost (its session tables are gone).
+        The transaction may have been aborted by a failing block, so it is rolled back first; the tables were
+        committed when created and outlive the rollback.
+
+        :param con: Connection of the PostgisConnectionPool.
+        :param startTableName: Start vertices table returned by ``stageVertices``.
+        :param endTableName: End vertices table returned by ``stageVertices``.
+        """
+        if con.closed:
+            return
+        con.rollback()
+        con.cursor().execute("DROP TABLE %s, %s" % (startTableName, endTableName))
+        con.commit()
+
+    def getStagedBlockSQL(self, sqlTemplate, startTableName, endTableName, block):
+        """
+        :param sqlTemplate: SQL sentence with two ``%s``, replaced by the start and end vertices array of the block.
+        :param startTableName: Start vertices table returned by ``stageVertices``.
+        :param endTableName: End vertices table returned by ``stageVertices``.
+        :param block: (start bottom limit, start upper limit, end bottom limit, end upper limit) positions of the
+        vertex ids of the block.
+        :return: SQL sentence of the block, selecting its vertex ids from the staged tables.
+        """
+        startBottomLimit, startUpperLimit, endBottomLimit, endUpperLimit = block
+        verticesSQL = "ARRAY(SELECT vertex_id FROM %s WHERE position >= %s AND position < %s ORDER BY position)"
+        return sqlTemplate % (verticesSQL % (startTableName, startBottomLimit, startUpperLimit),
+                              verticesSQL % (endTableName, endBottomLimit, endUpperLimit))
+
+    def fetchRowChunks(self, con, sql, chunkSize, skippedRows=0):
+        """
+        Run the query with a server-side (named) cursor and yield its rows in chunks, only one chunk is kept in the
+        client memory at a time.
+
+        :param con: Connection of the PostgisConnectionPool.
+        :param sql: SQL sentence.
+        :param chunkSize: Max number of rows of every chunk.
+        :param skippedRows: Number of first rows moved over in the server without fetching them.
+        :return: Generator of lists of tuples.
+        """
+        cursor = con.cursor(name="dora_%s" % uuid.uuid4().hex)
+        cursor.itersize = chunkSize
+        cursor.execute(sql)
         try:
-            df = gpd.GeoDataFrame.from_postgis(sql, con, geom_col='geom', crs=GPD_CRS.PSEUDO_MERCATOR)
+            if skippedRows > 0:
+                cursor.scroll(skippedRows)
+            while True:
+                rows = cursor.fetchmany(chunkSize)
+                if not rows:
+                    break
+                yield rows
         finally:
-            con.close()
+            if not con.closed:
+                cursor.close()
 
-        newJson = self.fileActions.convertToGeojson(df)
+    def executeStagedReturningRowChunks(self, sqlTemplate, startVerticesID, endVerticesID, blocks, chunkSize,
+                                        jobs=1):
+        """
+        Stream the rows of the blocks of a many-to-many query, over the vertices staged once per connection as in
+        ``executeStagedCopyReturningArrays``, with server-side cursors. Up to ``jobs`` connections run blocks at the
+        same time and their chunks are yielded as soon as they are fetched, in any order. At most ``jobs`` chunks
+        wait to be consumed, so that the memory used is bounded by the chunk size and not by the size of the results.
 
-        return newJson
+        If a connection is lost, its block is run again with a new connection from the first row not yielded yet,
+        the rows of every block must come in a deterministic order (as the ones of pgr_dijkstraCost, sorted by start
+        and end vertex).
+
+        :param sqlTemplate: SQL sentence with two ``%s``, replaced by the start and end vertices array of the block.
+        :param startVerticesID: Start vertex ids.
+        :param endVerticesID: End vertex ids.
+        :param blocks: List of (start bottom limit, start upper limit, end bottom limit, end upper limit) positions
+        of the vertex ids of every block.
+        :param chunkSize: Max number of rows of every chunk.
+        :param jobs: Number of connections running blocks at the same time.
+        :return: Generator of lists of tuples.
+        """
+        if not blocks:
+            return
+
+        # (block index, rows of the block already yielded)
+        pendingBlocks = queue.Queue()
+        for blockIndex in range(len(blocks)):
+            pendingBlocks.put((blockIndex, 0))
+
+        chunks = queue.Queue(maxsize=jobs)
+        stopped = threading.Event()
+        finished = object()
+
+        def put(item):
+            while not stopped.is_set():
+                try:
+                    chunks.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        def streamStagedBlocks(con):
+            startTableName, endTableName = self.stageVertices(con, startVerticesID, endVerticesID)
+            try:
+                while not stopped.is_set():
+                    try:
+                        blockIndex, yieldedRows = pendingBlocks.get_nowait()
+                    except queue.Empty:
+                        break
+
+                    sql = self.getStagedBlockSQL(sqlTemplate, startTableName, endTableName, blocks[blockIndex])
+                    try:
+                        for rows in self.fetchRowChunks(con, sql, chunkSize, yieldedRows):
+                            put(rows)
+                            yieldedRows += len(rows)
+                            if stopped.is_set():
+                                break
+                    except Exception:
+                        if con.closed:
+                            # Run again by the retry of runWithPooledConnection or by another connection.
+                            pendingBlocks.put((blockIndex, yieldedRows))
+                        raise
+            finally:
+                self.dropStagedVertices(con, startTableName, endTableName)
+
+        def fetch():
+            try:
+                self.runWithPooledConnection(streamStagedBlocks)
+            except Exception as e:
+                put(e)
+            finally:
+                put(finished)
+
+        threads = [threading.Thread(target=fetch, daemon=True) for _ in range(max(1, min(jobs, len(blocks))))]
+        for thread in threads:
+            thread.start()
+
+        try:
+            runningThreads = len(threads)
+            while runningThreads > 0:
+                item = chunks.get()
+                if item is finished:
+                    runningThreads -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            stopped.set()
+            for thread in threads:
+                thread.join()
+
+    @dgl_timer
+    def executeReturningRows(self, sql):
+        """
+        Given a PG_SQL execute the query and retrieve the plain rows, without any geometry parsing.
+
+        :param sql: SQL sentence.
+        :return: List of tuples with the query results.
+        """
+
+        def fetchRows(con):
+            cursor = con.cursor()
+            cursor.execute(sql)
+            return cursor.fetchall()
+
+        return self.runWithPooledConnection(fetchRows)
+
+    @dgl_timer
+    def executeStatements(self, sqlList):
+        """
+        Execute in a single transaction a list of sentences that do not retrieve any result (i.e. CREATE TABLE).
+
+        :param sqlList: List of SQL sentences.
+        """
+
+        def executeInTransaction(con):
+            cursor = con.cursor()
+            for sql in sqlList:
+                cursor.execute(sql)
+            con.commit()
+
+        self.runWithPooledConnection(executeInTransaction)
 
     def createTemporaryTable(self, con, tableName, columns):
 
@@ -11,6 +11,17 @@ from src.main.carRoutingExceptions import ImpedanceAttributeNotDefinedException,
     TransportModeNotDefinedException
 from src.main.connection.PostgisServiceProvider import PostgisServiceProvider
 from src.main.logic.DORARouterAnalyst import DORARouterAnalyst
+from src.main.routing.EdgeSnapper import EdgeSnapper
+from src.main.routing.GridVertexTable import GridVertexTable
+from src.main.routing.KDTreeSnapper import KDTreeSnapper
+from src.main.routing.PostgisSnapper import PostgisSnapper
+from src.main.routing.SnappingCache import SnappingCache
+from src.main.routing.StronglyConnectedComponents import StronglyConnectedComponents
+from src.main.transportMode.AltTransportMode import AltTransportMode
+from src.main.transportMode.BoundingBoxTransportMode import BoundingBoxTransportMode
+from src.main.transportMode.ContractionHierarchyTransportMode import ContractionHierarchyTransportMode
+from src.main.transportMode.InMemoryTransportMode import InMemoryTransportMode
+from src.main.transportMode.MaxCostTransportMode import MaxCostTransportMode
 from src.main.transportMode.OSMPrivateCarTransportMode import OSMPrivateCarTransportMode
 from src.main.util import CostAttributes, getConfigurationProperties, TransportModes, Logger, getFormattedDatetime, \
     GeneralLogger, timeDifference
@@ -32,6 +43,25 @@ def printHelp():
         "\n\t[--summary]: Only the cost summary should be calculated."
         "\n\t[--is_entry_list]: The start and end points entries are folders containing a set of geojson files."
         "\n\t[--all]: Calculate the shortest path to all the impedance/cost attributes."
+        "\n\t[--bounding_box]: Give to pgRouting only the edges around the requested vertices, widening the area when a route is not found."
+        "\n\t[--in_memory]: Load the network once into memory and calculate the routes and cost summary in-process."
+        "\n\t[--contraction_hierarchies]: Calculate the routes and cost summary in-process with the contraction hierarchies built by --contract."
+        "\n\t[--phast]: Same as --contraction_hierarchies but the cost summary is calculated with PHAST sweeps, for all-pairs matrices of the YKR grid."
+        "\n\t[--alt]: Calculate every route in-process with A* and the landmarks built by --landmarks."
+        "\n\t[--max_cost]: Only calculate the cost summary of the pairs with a total cost up to this value (i.e. --max_cost=1800 with SPEED_LIMIT_TIME), the other pairs are considered unreachable."
+        "\n\t[--kd_tree_snapping]: Snap all the start/end points to the nearest routable vertex with one in-memory KD-tree lookup instead of one query per point."
+        "\n\t[--batch_snapping]: Snap all the start/end points of a file with a single nearest vertex query."
+        "\n\t[--edge_snapping]: Project all the start/end points onto their nearest routable edge and add the fraction of the edge cost to the cost summary."
+        "\n\t[--strongly_connected]: Do not route the pairs of points snapped to different strongly connected components of the network, with --kd_tree_snapping snap only to the largest component."
+        "\n\t[--snapping_cache]: Keep the snapped start/end points on disk, the next executions over the same points and network skip the snapping."
+        "\n\t[--csv_summary]: Write the cost summary only as csv, the many-to-many cost matrix is queried without geometries."
+        "\n\t[--stream_summary]: Same as --csv_summary, but the many-to-many cost summary is streamed from the database in chunks and appended to the csv."
+        "\n\t[--grid_lookup]: Resolve the YKR grid start/end points with the grid vertex table built by --grid_vertices instead of snapping them."
+        "\n\t[--processes]: With --in_memory or --alt, calculate the cost summary in a pool of processes sharing the network in memory."
+        "\n\t[--contract]: Build and store the contraction hierarchy of the transport mode (-t) for the impedance/cost attributes (-c or --all)."
+        "\n\t[--landmarks]: Build and store the landmarks of the transport mode (-t) for the impedance/cost attributes (-c or --all)."
+        "\n\t[--routable_vertices]: Create the routable vertices table (with a GiST index) of the transport mode (-t) used by --batch_snapping."
+        "\n\t[--grid_vertices]: Snap once all the YKR grid points given with -s and store their nearest vertices for --grid_lookup."
         "\n\nImpedance/cost values allowed:"
         "\n\tDISTANCE"
         "\n\tSPEED_LIMIT_TIME"
@@ -64,10 +94,15 @@ def main():
     opts, args = getopt.getopt(
         argv, "s:e:o:c:t:",
         ["start_point=", "end_point=", "outputFolder=", "costAttributes=",
-         "transportMode", "is_entry_list", "routes", "summary", "all", "help"]
+         "transportMode", "is_entry_list", "routes", "summary", "all", "bounding_box", "in_memory", "contraction_hierarchies",
+         "phast", "alt", "processes", "max_cost=", "kd_tree_snapping", "batch_snapping", "edge_snapping", "strongly_connected", "snapping_cache", "contract",
+         "landmarks", "routable_vertices", "grid_vertices", "grid_lookup", "csv_summary", "stream_summary", "help"]
     )
 
     startPointsGeojsonFilename = None
+    endPointsGeojsonFilename = None
+    transportModeSelected = None
+    impedance = None
     outputFolder = None
     # impedance = CostAttributes.DISTANCE
     # impedance = None
@@ -91,8 +126,27 @@ def main():
 
     allImpedanceAttribute = False
     summaryOnly = False
+    csvSummary = False
+    streamSummary = False
     routesOnly = False
     isEntryList = False
+    boundingBox = False
+    inMemory = False
+    contractionHierarchies = False
+    phast = False
+    alt = False
+    processes = False
+    maxCost = None
+    kdTreeSnapping = False
+    batchSnapping = False
+    edgeSnapping = False
+    stronglyConnected = False
+    snappingCache = False
+    contract = False
+    landmarks = False
+    routableVertices = False
+    gridVertices = False
+    gridLookup = False
 
     impedanceErrorMessage = "Use the paramenter -c or --cost.\nValues allowed: DISTANCE, SPEED_LIMIT_TIME, DAY_AVG_DELAY_TIME, MIDDAY_DELAY_TIME, RUSH_HOUR_DELAY.\nThe parameter --all enable the analysis for all the impedance attributes."
     transportModeErrorMessage = "Use the paramenter -t or --transportMode.\nValues allowed: PRIVATE_CAR, BICYCLE."
@@ -124,6 +178,65 @@ def main():
         if opt in "--is_entry_list":
             isEntryList = True
 
+        if opt == "--bounding_box":
+            boundingBox = True
+
+        if opt == "--in_memory":
+            inMemory = True
+
+        if opt == "--contraction_hierarchies":
+            contractionHierarchies = True
+
+        if opt == "--phast":
+            contractionHierarchies = True
+            phast = True
+
+        if opt == "--alt":
+            alt = True
+
+        if opt == "--processes":
+            processes = True
+
+        if opt == "--max_cost":
+            maxCost = float(arg)
+
+        if opt == "--kd_tree_snapping":
+            kdTreeSnapping = True
+
+        if opt == "--batch_snapping":
+            batchSnapping = True
+
+        if opt == "--edge_snapping":
+            edgeSnapping = True
+
+        if opt == "--strongly_connected":
+            stronglyConnected = True
+
+        if opt == "--snapping_cache":
+            snappingCache = True
+
+        if opt == "--contract":
+            contract = True
+
+        if opt == "--landmarks":
+            landmarks = True
+
+        if opt == "--routable_vertices":
+            routableVertices = True
+
+        if opt == "--grid_vertices":
+            gridVertices = True
+
+        if opt == "--grid_lookup":
+            gridLookup = True
+
+        if opt == "--csv_summary":
+            csvSummary = True
+
+        if opt == "--stream_summary":
+            csvSummary = True
+            streamSummary = True
+
         if opt in "--all":
             allImpedanceAttribute = True
         else:
@@ -141,38 +254,126 @@ def main():
 
                     impedanceList.append(impedance)
 
-    if not startPointsGeojsonFilename or not endPointsGeojsonFilename or not outputFolder:
-        raise NotParameterGivenException("Type --help for more information.")
-
     if not transportModeSelected:
         raise TransportModeNotDefinedException(
             transportModeErrorMessage)
 
-    if not allImpedanceAttribute and not impedance:
+    if not allImpedanceAttribute and not impedance and not routableVertices and not gridVertices:
         raise ImpedanceAttributeNotDefinedException(
             impedanceErrorMessage)
 
-    generalLogger = GeneralLogger(loggerName="GENERAL", outputFolder=outputFolder, prefix="General")
-    MAX_TRIES = 2
-    RECOVERY_WAIT_TIME = 10
-    RECOVERY_WAIT_TIME_8_MIN = 480
-
     postgisServiceProvider = PostgisServiceProvider()
 
     transportMode = None
     impedances = None
 
     if transportModeSelected == TransportModes.BICYCLE:
-        transportMode = BicycleTransportMode(postgisServiceProvider)
+        transportMode = BicycleTransportMode(postgisServiceProvider, summaryGeometry=not csvSummary)
         impedances = bicycle_impedances
     elif transportModeSelected == TransportModes.PRIVATE_CAR:
-        transportMode = PrivateCarTransportMode(postgisServiceProvider)
+        transportMode = PrivateCarTransportMode(postgisServiceProvider, summaryGeometry=not csvSummary)
+        impedances = car_impedances
     elif transportModeSelected == TransportModes.OSM_PRIVATE_CAR:
-        transportMode = OSMPrivateCarTransportMode(postgisServiceProvider)
+        transportMode = OSMPrivateCarTransportMode(postgisServiceProvider, summaryGeometry=not csvSummary)
         impedances = car_impedances
 
+    stronglyConnectedComponents = {}
+    if stronglyConnected:
+        for impedance in (impedances.values() if allImpedanceAttribute else impedanceList):
+            stronglyConnectedComponents[impedance] = StronglyConnectedComponents.fromTransportMode(transportMode,
+                                                                                                  impedance)
+
+    snapper = None
+    if kdTreeSnapping:
+        snapper = KDTreeSnapper.fromTransportMode(transportMode, components=stronglyConnectedComponents.values())
+    elif batchSnapping:
+        snapper = PostgisSnapper(transportMode)
+    elif edgeSnapping:
+        snapper = EdgeSnapper.fromTransportMode(transportMode)
+
+    snappingMode = SnappingCache.getSnappingMode(snapper, stronglyConnected=len(stronglyConnectedComponents) > 0)
+    cache = None
+    if snappingCache:
+        cache = SnappingCache.fromTransportMode(transportMode,
+                                                getConfigurationProperties(section="SNAPPING")["cache_folder"],
+                                                snappingMode)
+
+    if gridVertices:
+        if not startPointsGeojsonFilename:
+            raise NotParameterGivenException("Use the parameter -s with the YKR grid points.")
+
+        fingerprint = SnappingCache.getFingerprint(transportMode)
+        gridVertexTable = DORARouterAnalyst(transportMode=transportMode, snapper=snapper, snappingCache=cache) \
+            .createGridVertexTable(startPointsGeojsonFilename, fingerprint)
+        cacheFolder = getConfigurationProperties(section="SNAPPING")["cache_folder"]
+        if not os.path.exists(cacheFolder):
+            os.makedirs(cacheFolder)
+        gridVertexTable.save(GridVertexTable.getPath(transportMode, cacheFolder, snappingMode))
+        return
+
+    if contract or landmarks or routableVertices:
+        if routableVertices:
+            PostgisSnapper(transportMode).createRoutableVerticesTable()
+        contractionHierarchyTransportMode = ContractionHierarchyTransportMode(transportMode)
+        altTransportMode = AltTransportMode(transportMode)
+        for impedance in (impedances.values() if allImpedanceAttribute else impedanceList):
+            if contract:
+                contractionHierarchyTransportMode.contract(impedance)
+            if landmarks:
+                altTransportMode.selectLandmarks(impedance)
+        return
+
+    if not startPointsGeojsonFilename or not endPointsGeojsonFilename or not outputFolder:
+        raise NotParameterGivenException("Type --help for more information.")
+
+    generalLogger = GeneralLogger(loggerName="GENERAL", outputFolder=outputFolder, prefix="General")
+    MAX_TRIES = 2
+    RECOVERY_WAIT_TIME = 10
+    RECOVERY_WAIT_TIME_8_MIN = 480
+
+    gridVertexTable = None
+    if gridLookup:
+        gridVertexTablePath = GridVertexTable.getPath(transportMode,
+                                                      getConfigurationProperties(section="SNAPPING")["cache_folder"],
+                                                      snappingMode)
+        if os.path.exists(gridVertexTablePath):
+            gridVertexTable = GridVertexTable.load(gridVertexTablePath)
+            if gridVertexTable.fingerprint != SnappingCache.getFingerprint(transportMode):
+                Logger.getInstance().warning("The network changed since the grid vertex table was built, "
+                                             "run --grid_vertices again: %s" % gridVertexTablePath)
+                gridVertexTable = None
+        else:
+            Logger.getInstance().warning("Grid vertex table not found: %s" % gridVertexTablePath)
+
+    if contractionHierarchies:
+        transportMode = ContractionHierarchyTransportMode(transportMode, phast=phast, maxCost=maxCost)
+    elif alt:
+        transportMode = AltTransportMode(transportMode, processes=processes, maxCost=maxCost)
+    elif inMemory:
+        transportMode = InMemoryTransportMode(transportMode, processes=processes, maxCost=maxCost)
+    else:
+        if boundingBox:
+            # The pairs of different components are never found, they must not make the blocks retry.
+            boundingBoxComponents = stronglyConnectedComponents
+            if not boundingBoxComponents:
+                boundingBoxComponents = {
+                    impedance: StronglyConnectedComponents.fromTransportMode(transportMode, impedance)
+                    for impedance in (impedances.values() if allImpedanceAttribute else impedanceList)
+                }
+            transportMode = BoundingBoxTransportMode(transportMode, boundingBoxComponents)
+        if maxCost is not None:
+            transportMode = MaxCostTransportMode(transportMode, maxCost)
+
     starter = DORARouterAnalyst(
-        transportMode=transportMode
+        transportMode=transportMode,
+        shortestPathTrees=inMemory and not (contractionHierarchies or alt),
+        maxCost=maxCost,
+        snapper=snapper,
+        snappingCache=cache,
+        gridVertexTable=gridVertexTable,
+        stronglyConnectedComponents=stronglyConnectedComponents,
+        summaryGeometry=not csvSummary,
+        streamSummary=streamSummary
     )
 
     startTime = time.time()
@@ -1,6 +1,9 @@
 import copy
 import os
+import threading
 
+import numpy as np
+import pandas as pd
 from joblib import delayed, Parallel
 
 from src.main.carRoutingExceptions import NotURLDefinedException, \
@@ -8,9 +11,12 @@ from src.main.carRoutingExceptions import NotURLDefinedException, \
 from src.main.entities import Point
 from src.main.logic.Operations import Operations
 from src.main.reflection import Reflection
+from src.main.routing.EdgeSnapper import EdgeSnapper
+from src.main.routing.GridVertexTable import GridVertexTable
 from src.main.util import GeometryType, getEnglishMeaning, FileActions, extractCRS, createPointFromPointFeature, \
     getConfigurationProperties, dgl_timer_enabled, \
-    dgl_timer, parallel_job_print, Logger, PostfixAttribute, getFormattedDatetime, timeDifference
+    dgl_timer, parallel_job_print, Logger, PostfixAttribute, getFormattedDatetime, timeDifference, \
+    CostSummaryAccumulator
 
 #from src.main.carRoutingExceptions import NotWFSDefinedException, NotURLDefinedException  # ONLY test purposes
 from src.main.util import CostAttributes
@@ -25,7 +31,8 @@ def createShortestPathFileWithAdditionalProperties(self,
                                                    summaryFolderPath,
                                                    csv_filename,
                                                    epsgCode,
-                                                   endEpsgCode):
+                                                   endEpsgCode,
+                                                   shortestPathTree=None):
     # startTime = time.time()
     # functionName = "createShortestPathFileWithAdditionalProperties"
     # Logger.getInstance().info("%s Start Time: %s" % (functionName, getFormattedDatetime(timemilis=startTime)))
@@ -71,6 +78,9 @@ def createShortestPathFileWithAdditionalProperties(self,
     if startPoint.equals(endPoint):
         return None, None, None, None
 
+    if not self.isReachable(startVertexId, endVertexId, costAttribute):
+        return None, None, None, None
+
     # shortestPathId = str(startVertexId) + "_" + str(endVertexId)
     # existShortestPath = shortestPathId in self.shortestPathCache
     # if existShortestPath:
@@ -85,9 +95,19 @@ def createShortestPathFileWithAdditionalProperties(self,
     # shortestPath = copy.deepcopy(shortestPath)
     ### The above cache procedure is too large that exceed the shared memory.
 
-    shortestPath = self.transportMode.getShortestPath(startVertexId=startVertexId,
-                                                      endVertexId=endVertexId,
-                                                      cost=costAttribute)
+    if isinstance(self.snapper, EdgeSnapper) and (
+            "edgeId" in newStartPointFeature["properties"] or "edgeId" in newEndPointFeature["properties"]):
+        startVertexId, endVertexId, shortestPath = self.selectPartialEdgeShortestPath(
+            costAttribute, newStartPointFeature, newEndPointFeature, shortestPathTree)
+        if shortestPath is None:
+            return None, None, None, None
+    elif shortestPathTree is not None:
+        shortestPath = self.transportMode.getShortestPathFromTree(shortestPathTree=shortestPathTree,
+                                                                  endVertexId=endVertexId)
+    else:
+        shortestPath = self.transportMode.getShortestPath(startVertexId=startVertexId,
+                                                          endVertexId=endVertexId,
+                                                          cost=costAttribute)
 
     shortestPath["overallProperties"] = self.insertAdditionalProperties(
         newStartPointFeature,
@@ -140,18 +160,118 @@ def createShortestPathFileWithAdditionalProperties(self,
     return outputFolderPath, completeFilename, summaryFolderPath, csv_filename
 
 
+def createShortestPathFilesFromShortestPathTree(self,
+                                                costAttribute,
+                                                startPointFeature,
+                                                endPointFeatures,
+                                                outputFolderPath,
+                                                summaryFolderPath,
+                                                csv_filename,
+                                                epsgCode,
+                                                endEpsgCode):
+    """
+    Calculate a single shortest path tree from the start point nearest vertex and extract from it the shortest path
+    to every end point, one search per start point instead of one search per pair of points.
+
+    :return: List with the ``createShortestPathFileWithAdditionalProperties`` results of each end point.
+    """
+    startVertexId, newStartPointFeature = extractFeatureInformation(
+        self=self,
+        epsgCode=epsgCode,
+        feature=startPointFeature,
+        geojsonServiceProvider=self.transportMode,
+        operations=self.operations
+    )
+
+    shortestPathTree = self.transportMode.getShortestPathTree(startVertexId=startVertexId, cost=costAttribute)
+
+    returns = []
+    for endPointFeature in endPointFeatures:
+        returns.append(createShortestPathFileWithAdditionalProperties(self,
+                                                                      costAttribute,
+                                                                      startPointFeature,
+                                                                      endPointFeature,
+                                                                      outputFolderPath,
+                                                                      summaryFolderPath,
+                                                                      csv_filename,
+                                                                      epsgCode,
+                                                                      endEpsgCode,
+                                                                      shortestPathTree))
+    return returns
+
+
 def extractFeatureInformation(self, epsgCode, feature, geojsonServiceProvider, operations):
+    """
+    Retrieve the nearest routable vertex of the point feature, only one thread snaps a point that is not cached yet,
+    the other threads requesting the same point wait for its result.
+
+    :return: Vertex id and the feature with the snapping properties.
+    """
     pointIdentifierKey = getConfigurationProperties(section="WFS_CONFIG")["point_identifier"]
 
     pointId = feature["properties"][pointIdentifierKey]
-    if pointId in self.nearestVerticesCache:
-        return self.nearestVerticesCache[pointId]
+    with self.nearestVerticesCacheLock:
+        if pointId in self.nearestVerticesCache:
+            return self.nearestVerticesCache[pointId]
+
+        inFlightEvent = self.nearestVerticesInFlight.get(pointId)
+        if inFlightEvent is None:
+            inFlightEvent = threading.Event()
+            self.nearestVerticesInFlight[pointId] = inFlightEvent
+            isOwner = True
+        else:
+            isOwner = False
+
+    if not isOwner:
+        inFlightEvent.wait()
+        # If the owner failed the point is not cached, and the next call snaps it again.
+        return extractFeatureInformation(self, epsgCode, feature, geojsonServiceProvider, operations)
+
+    try:
+        return snapFeature(self, epsgCode, feature, geojsonServiceProvider, operations)
+    finally:
+        with self.nearestVerticesCacheLock:
+            del self.nearestVerticesInFlight[pointId]
+        inFlightEvent.set()
+
+
+def snapFeature(self, epsgCode, feature, geojsonServiceProvider, operations):
+    pointIdentifierKey = getConfigurationProperties(section="WFS_CONFIG")["point_identifier"]
+
+    pointId = feature["properties"][pointIdentifierKey]
+    if self.gridVertexTable is not None:
+        position = self.gridVertexTable.getPosition(pointId)
+        if position >= 0:
+            feature["properties"].update(self.gridVertexTable.getProperties(position))
+            vertexID = feature["properties"]["vertex_id"]
+            self.nearestVerticesCache[pointId] = (vertexID, feature)
+            return vertexID, feature
 
     coordinates = feature["geometry"]["coordinates"]
     featurePoint = Point(latitute=coordinates[1],
                          longitude=coordinates[0],
                          epsgCode=epsgCode)
     featurePoint = operations.transformPoint(featurePoint, geojsonServiceProvider.getEPSGCode())
+    if self.snapper is not None:
+        if isinstance(self.snapper, EdgeSnapper):
+            vertexIds, vertexCoordinates, edgeProperties = self.snapper.project(
+                [[featurePoint.getLongitude(), featurePoint.getLatitude()]])
+            if edgeProperties[0] is not None:
+                feature["properties"].update(edgeProperties[0])
+        else:
+            vertexIds, vertexCoordinates, _ = self.snapper.snap(
+                [[featurePoint.getLongitude(), featurePoint.getLatitude()]])
+        vertexID = int(vertexIds[0])
+        feature["properties"]["vertex_id"] = vertexID
+        feature["properties"]["selectedPointCoordinates"] = [featurePoint.getLongitude(),
+                                                             featurePoint.getLatitude()]
+        feature["properties"]["nearestVertexCoordinates"] = vertexCoordinates[0].tolist()
+        feature["properties"]["coordinatesCRS"] = featurePoint.getEPSGCode()
+        if vertexID >= 0:
+            # The points without a routable vertex are not cached, they are dropped by getVerticesID.
+            self.nearestVerticesCache[pointId] = (vertexID, feature)
+        return vertexID, feature
+
     nearestVertexGeojson = geojsonServiceProvider.getNearestRoutableVertexFromAPoint(
         featurePoint)
     newFeaturePoint = nearestVertexGeojson["features"][0]
@@ -179,9 +299,20 @@ def createCostSummaryWithAdditionalProperties(self, costAttribute, startPointFea
     startVertexID = startPointFeature["properties"]["vertex_id"]
     endVertexID = endPointFeature["properties"]["vertex_id"]
 
+    if isinstance(self.snapper, EdgeSnapper) and (
+            "edgeId" in startPointFeature["properties"] or "edgeId" in endPointFeature["properties"]):
+        startVertexID, endVertexID, costSummaryMap = self.selectPartialEdgeCostSummary(
+            costAttribute, startPointFeature, endPointFeature, costSummaryMap)
+
     # if startVertexID == endVertexID:
     #     return None
     if (startVertexID not in costSummaryMap) or (endVertexID not in costSummaryMap[startVertexID]):
+        if self.maxCost is not None:
+            # Over the max cost, counted once in createGeneralSummary.
+            return None
+        if not self.isReachable(startVertexID, endVertexID, costAttribute):
+            # Different strongly connected components, counted once in createGeneralSummary.
+            return None
         Logger.getInstance().warning("Not contained into the costSummaryMap: %s %s" % (startVertexID, endVertexID))
         return None
 
@@ -228,15 +359,46 @@ def createCostSummaryWithAdditionalProperties(self, costAttribute, startPointFea
 
 
 class DORARouterAnalyst:
-    def __init__(self, transportMode=None):
+    def __init__(self, transportMode=None, shortestPathTrees=False, maxCost=None, snapper=None,
+                 snappingCache=None, gridVertexTable=None, stronglyConnectedComponents=None, summaryGeometry=True,
+                 streamSummary=False):
+        """
+        :param transportMode: Transport mode used to find the nearest vertices and to calculate the routes.
+        :param shortestPathTrees: If True, ``calculateTotalTimeTravel`` calculates one shortest path tree per start
+        point (and impedance) and extracts all the routes from it. The transport mode must implement
+        ``getShortestPathTree``.
+        :param maxCost: Max cost given to the transport mode, the pairs missing in the cost summaries are considered
+        over it and they are not reported one by one.
+        :param snapper: KDTreeSnapper or PostgisSnapper used to snap all the points of a file to their nearest
+        routable vertices at once, instead of one nearest vertex query per point.
+        :param snappingCache: SnappingCache keeping the snapped points between executions.
+        :param gridVertexTable: GridVertexTable resolving the YKR grid points without snapping them.
+        :param stronglyConnectedComponents: StronglyConnectedComponents by impedance/cost attribute, the pairs of
+        vertices of different components are not routed.
+        :param summaryGeometry: If False, ``createGeneralSummary`` writes only the csv summary, without writing (and
+        reading back) the geojson summary. It is built straight from the cost columns of the transport mode when it
+        provides ``getTotalShortestPathCostManyToManyColumns``, otherwise from the summary properties.
+        :param streamSummary: If True, ``createGeneralSummary`` streams the many-to-many cost summary from the
+        transport mode (``getTotalShortestPathCostManyToManyChunks``) and appends every chunk to the csv summary.
+        """
         self.fileActions = FileActions()
         self.operations = Operations(FileActions())
         self.reflection = Reflection()
         self.transportMode = transportMode
         self.nearestVerticesCache = {}
+        self.nearestVerticesCacheLock = threading.Lock()
+        self.nearestVerticesInFlight = {}
         self.additionalStartFeaturePropertiesCache = {}
         self.additionalEndFeaturePropertiesCache = {}
         self.shortestPathCache = {}
+        self.shortestPathTrees = shortestPathTrees
+        self.maxCost = maxCost
+        self.snapper = snapper
+        self.snappingCache = snappingCache
+        self.gridVertexTable = gridVertexTable
+        self.stronglyConnectedComponents = {} if stronglyConnectedComponents is None else stronglyConnectedComponents
+        self.summaryGeometry = summaryGeometry
+        self.streamSummary = streamSummary
 
     @dgl_timer_enabled
     def calculateTotalTimeTravel(self,
@@ -312,6 +474,41 @@ class DORARouterAnalyst:
             #     startPointFeature, startCoordinatesGeojsonFilename, epsgCode
             # )
 
+            if self.shortestPathTrees:
+                if isinstance(costAttribute, dict):
+                    for key in costAttribute:
+                        newOutputFolderPath = outputFolderPath + os.sep + "geoms" + os.sep + getEnglishMeaning(
+                            costAttribute[key]) + os.sep
+                        csv_filename = os.path.basename(startCoordinatesGeojsonFilename) + "_" + os.path.basename(
+                            endCoordinatesGeojsonFilename) + "_" + getEnglishMeaning(
+                            costAttribute[key]) + "_costSummary.csv"
+
+                        delayedShortedPathCalculations.append(
+                            delayed(createShortestPathFilesFromShortestPathTree)(
+                                self, costAttribute[key],
+                                startPointFeature, inputEndCoordinates["features"],
+                                newOutputFolderPath, summaryFolderPath,
+                                csv_filename,
+                                epsgCode,
+                                enDEpsgCode
+                            )
+                        )
+                else:
+                    csv_filename = os.path.basename(startCoordinatesGeojsonFilename) + "_" + os.path.basename(
+                        endCoordinatesGeojsonFilename) + "_" + getEnglishMeaning(costAttribute) + "_costSummary.csv"
+
+                    delayedShortedPathCalculations.append(
+                        delayed(createShortestPathFilesFromShortestPathTree)(
+                            self,
+                            costAttribute,
+                            startPointFeature, inputEndCoordinates["features"],
+                            newOutputFolderPath, summaryFolderPath,
+                            csv_filename,
+                            epsgCode,
+                            enDEpsgCode)
+                    )
+                continue
+
 
             for endPointFeature in inputEndCoordinates["features"]:
                 # nearestEndPoint, endPoint, endPointEPSGCode, endVertexId = self.featureDataCompilation(
@@ -639,33 +836,38 @@ class DORARouterAnalyst:
         endVerticesID, endPointsFeaturesList = self.getVerticesID(inputEndCoordinates, endEpsgCode)
         Logger.getInstance().info("End nearest vertices finding")
 
-        totals = None
+        if self.streamSummary:
+            if hasattr(self.transportMode, "getTotalShortestPathCostManyToManyChunks") and \
+                    not isinstance(self.snapper, EdgeSnapper):
+                self.createCsvSummary(costAttribute, startPointsFeaturesList, endPointsFeaturesList,
+                                      outputFolderPath, outputFilename,
+                                      lambda startVerticesID, endVerticesID:
+                                      self.transportMode.getTotalShortestPathCostManyToManyChunks(
+                                          startVerticesID=startVerticesID,
+                                          endVerticesID=endVerticesID,
+                                          costAttribute=costAttribute))
+                return
+            Logger.getInstance().warning("The cost summary can not be streamed with this transport mode or snapping, "
+                                         "calculating it at once")
+
+        if not self.summaryGeometry and hasattr(self.transportMode, "getTotalShortestPathCostManyToManyColumns") and \
+                not isinstance(self.snapper, EdgeSnapper):
+            self.createCsvSummary(costAttribute, startPointsFeaturesList, endPointsFeaturesList,
+                                  outputFolderPath, outputFilename,
+                                  lambda startVerticesID, endVerticesID: [
+                                      self.calculateTotalColumns(startVerticesID, endVerticesID, costAttribute)])
+            return
+
+        if isinstance(self.snapper, EdgeSnapper):
+            # Both vertices of the projected edges, the best one of every pair is selected afterwards.
+            startVerticesID = self.getEdgeVerticesID(startPointsFeaturesList)
+            endVerticesID = self.getEdgeVerticesID(endPointsFeaturesList)
 
         Logger.getInstance().info("Start cost summary calculation")
-        if len(startVerticesID) == 1 and len(endVerticesID) == 1:
-            totals = self.transportMode.getTotalShortestPathCostOneToOne(
-                startVertexID=startVerticesID[0],
-                endVertexID=endVerticesID[0],
-                costAttribute=costAttribute
-            )
-        elif len(startVerticesID) == 1 and len(endVerticesID) > 1:
-            totals = self.transportMode.getTotalShortestPathCostOneToMany(
-                startVertexID=startVerticesID[0],
-                endVerticesID=endVerticesID,
-                costAttribute=costAttribute
-            )
-        elif len(startVerticesID) > 1 and len(endVerticesID) == 1:
-            totals = self.transportMode.getTotalShortestPathCostManyToOne(
-                startVerticesID=startVerticesID,
-                endVertexID=endVerticesID[0],
-                costAttribute=costAttribute
-            )
-        elif len(startVerticesID) > 1 and len(endVerticesID) > 1:
-            totals = self.transportMode.getTotalShortestPathCostManyToMany(
-                startVerticesID=startVerticesID,
-                endVerticesID=endVerticesID,
-                costAttribute=costAttribute
-            )
+        if costAttribute in self.stronglyConnectedComponents:
+            totals = self.calculateTotalsByComponent(startVerticesID, endVerticesID, costAttribute)
+        else:
+            totals = self.calculateTotals(startVerticesID, endVerticesID, costAttribute)
         Logger.getInstance().info("End cost summary calculation")
 
         costSummaryMap = self.createCostSummaryMap(totals)
@@ -730,6 +932,13 @@ class DORARouterAnalyst:
                     features.append(newFeature)
                     # print(returns)
 
+        if self.maxCost is not None:
+            Logger.getInstance().info("%s pairs not reachable within the max cost %s" % (
+                len(returns) - len(features), self.maxCost))
+        elif costAttribute in self.stronglyConnectedComponents:
+            Logger.getInstance().info("%s pairs between different strongly connected components" % (
+                len(returns) - len(features)))
+
         Logger.getInstance().info("End createCostSummaryWithAdditionalProperties")
 
         ################################################################################################################
@@ -748,13 +957,21 @@ class DORARouterAnalyst:
         }
 
 
-        filepath = self.fileActions.writeFile(folderPath=summaryFolderPath, filename=outputFilename + ".geojson",
-                                              data=totals)
-        del totals
+        if self.summaryGeometry:
+            filepath = self.fileActions.writeFile(folderPath=summaryFolderPath, filename=outputFilename + ".geojson",
+                                                  data=totals)
+            del totals
 
-        dataframeSummary = self.operations.calculateTravelTimeFromGeojsonFile(
-            travelTimeSummaryURL=filepath
-        )
+            dataframeSummary = self.operations.calculateTravelTimeFromGeojsonFile(
+                travelTimeSummaryURL=filepath
+            )
+        else:
+            filepath = None
+            del totals
+
+            dataframeSummary = self.operations.calculateTravelTimeFromDataframe(
+                pd.DataFrame([feature["properties"] for feature in features])
+            )
 
         dataframeSummary = self.operations.renameColumnsAndExtractSubSet(
             travelTimeMatrix=dataframeSummary,
@@ -771,12 +988,128 @@ class DORARouterAnalyst:
 
         dataframeSummary.to_csv(csv_path, sep=csv_separator, index=False)
 
+        if filepath is not None:
+            self.fileActions.compressOutputFile(
+                folderPath=summaryFolderPath,
+                zip_filename="summary.zip",
+                filepath=filepath
+            )
+
         self.fileActions.compressOutputFile(
             folderPath=summaryFolderPath,
-            zip_filename="summary.zip",
-            filepath=filepath
+            zip_filename="summary_csv.zip",
+            filepath=csv_path
         )
 
+        debug = False
+        if "debug" in getConfigurationProperties(section="WFS_CONFIG"):
+            debug = "True".__eq__(getConfigurationProperties(section="WFS_CONFIG")["debug"])
+
+        if not debug:
+            self.fileActions.deleteFile(folderPath=summaryFolderPath, filename=outputFilename + ".geojson")
+            self.fileActions.deleteFile(folderPath=summaryFolderPath, filename=outputFilename + ".csv")
+
+    def groupPointsByVertex(self, pointsFeaturesList, pointIdentifierKey, travelTimeProperties,
+                            getAdditionalProperties):
+        """
+        Group the points by nearest vertex, with the travel time they add to the cost between the vertices.
+
+        :param pointsFeaturesList: Point features with their nearest vertex.
+        :param pointIdentifierKey: Property identifying the points.
+        :param travelTimeProperties: Additional properties summed into the travel time of every point.
+        :param getAdditionalProperties: Function returning the additional properties of a point feature.
+        :return: Sorted vertex ids, offsets of the points of every vertex (the points of the vertex ``i`` are between
+        ``offsets[i]`` and ``offsets[i + 1]``), point ids and travel time of every point.
+        """
+        vertexIds = np.array([feature["properties"]["vertex_id"] for feature in pointsFeaturesList], dtype=np.int64)
+        order = np.argsort(vertexIds, kind="stable")
+        vertexIds, counts = np.unique(vertexIds, return_counts=True)
+        offsets = np.zeros(len(vertexIds) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        pointIds = np.empty(len(pointsFeaturesList), dtype=object)
+        travelTimes = np.empty(len(pointsFeaturesList), dtype=np.float64)
+        for position, featureIndex in enumerate(order.tolist()):
+            feature = pointsFeaturesList[featureIndex]
+            additionalProperties = getAdditionalProperties(feature)
+            pointIds[position] = feature["properties"][pointIdentifierKey]
+            travelTimes[position] = sum(additionalProperties[key] for key in travelTimeProperties)
+
+        return vertexIds, offsets, pointIds, travelTimes
+
+    @dgl_timer
+    def createCsvSummary(self, costAttribute, startPointsFeaturesList, endPointsFeaturesList, outputFolderPath,
+                         outputFilename, calculateCostChunks):
+        """
+        Write the csv summary chunk by chunk while the cost summary arrives from the transport mode. When it is
+        streamed, the memory used is bounded by the ``streaming_chunk_size`` instead of by the number of pairs. The
+        rows of every pair of points are expanded straight from the (start vertex, end vertex, cost) arrays of the
+        chunk, with the points grouped by vertex (``groupPointsByVertex``), without building any feature.
+
+        :param costAttribute: Attribute to calculate the impedance of the Shortest Path algorithm.
+        :param startPointsFeaturesList: Start point features with their nearest vertex.
+        :param endPointsFeaturesList: End point features with their nearest vertex.
+        :param outputFolderPath: Folder containing the shortest path geojson features.
+        :param outputFilename: Filename to give to the summary file.
+        :param calculateCostChunks: Function receiving the start and end vertex ids and returning an iterable of
+        (start vertex ids, end vertex ids, total costs) arrays.
+        :return: None. Store the csv summary in the ``outputFolderPath``.
+        """
+        if not startPointsFeaturesList or not endPointsFeaturesList:
+            startPointsFeaturesList = endPointsFeaturesList = []
+
+        pointIdentifierKey = getConfigurationProperties(section="WFS_CONFIG")["point_identifier"]
+        startPoints = self.groupPointsByVertex(startPointsFeaturesList, pointIdentifierKey, [
+            "startPoint_EuclideanDistanceWalkingTime", "startPoint_AVGWalkingDistanceWalkingTime"
+        ], lambda startPointFeature: self.insertAdditionalProperties(startPointFeature, endPointsFeaturesList[0]))
+        endPoints = self.groupPointsByVertex(endPointsFeaturesList, pointIdentifierKey, [
+            "endPoint_ParkingTime", "endPoint_AVGWalkingDistanceWalkingTime", "endPoint_EuclideanDistanceWalkingTime"
+        ], lambda endPointFeature: self.insertAdditionalProperties(startPointsFeaturesList[0], endPointFeature))
+        startPointCounts = np.diff(startPoints[1])
+        endPointCounts = np.diff(endPoints[1])
+
+        if not outputFolderPath.endswith(os.sep):
+            summaryFolderPath = outputFolderPath + os.sep + "summary" + os.sep
+        else:
+            summaryFolderPath = outputFolderPath + "summary" + os.sep
+
+        outputFilename = getEnglishMeaning(costAttribute) + "_" + outputFilename
+
+        csv_separator = getConfigurationProperties(section="WFS_CONFIG")["csv_separator"]
+        csv_path = os.path.join(summaryFolderPath, outputFilename + ".csv")
+
+        if not os.path.exists(summaryFolderPath):
+            os.makedirs(summaryFolderPath)
+
+        Logger.getInstance().info("Start csv cost summary")
+        pairsCounter = 0
+        chunks = calculateCostChunks(startPoints[0].tolist(), endPoints[0].tolist())
+        with open(csv_path, "w", newline="") as csvFile:
+            pd.DataFrame(columns=["ykr_from_id", "ykr_to_id", "travel_time"]).to_csv(csvFile, sep=csv_separator,
+                                                                                    index=False)
+
+            for startVerticesID, endVerticesID, totalCosts in chunks:
+                # Every (start vertex, end vertex) row becomes one row per pair of their points.
+                startVertexPositions = np.searchsorted(startPoints[0], startVerticesID)
+                endVertexPositions = np.searchsorted(endPoints[0], endVerticesID)
+                rowEndPointCounts = endPointCounts[endVertexPositions]
+                pairCounts = startPointCounts[startVertexPositions] * rowEndPointCounts
+
+                rows = np.repeat(np.arange(len(totalCosts)), pairCounts)
+                pairIndexes = np.arange(len(rows)) - np.repeat(np.cumsum(pairCounts) - pairCounts, pairCounts)
+                startPositions = startPoints[1][startVertexPositions[rows]] + pairIndexes // rowEndPointCounts[rows]
+                endPositions = endPoints[1][endVertexPositions[rows]] + pairIndexes % rowEndPointCounts[rows]
+
+                pd.DataFrame({
+                    "ykr_from_id": startPoints[2][startPositions],
+                    "ykr_to_id": endPoints[2][endPositions],
+                    "travel_time": startPoints[3][startPositions] + totalCosts[rows] + endPoints[3][endPositions]
+                }).to_csv(csvFile, sep=csv_separator, index=False, header=False)
+                pairsCounter += len(rows)
+
+        Logger.getInstance().info("End csv cost summary, %s of %s pairs reachable" % (
+            pairsCounter, len(startPointsFeaturesList) * len(endPointsFeaturesList)))
+
         self.fileActions.compressOutputFile(
             folderPath=summaryFolderPath,
             zip_filename="summary_csv.zip",
@@ -788,12 +1121,266 @@ class DORARouterAnalyst:
             debug = "True".__eq__(getConfigurationProperties(section="WFS_CONFIG")["debug"])
 
         if not debug:
-            self.fileActions.deleteFile(folderPath=summaryFolderPath, filename=outputFilename + ".geojson")
             self.fileActions.deleteFile(folderPath=summaryFolderPath, filename=outputFilename + ".csv")
 
+    def calculateTotals(self, startVerticesID, endVerticesID, costAttribute):
+        """
+        :return: Cost summary geojson of every pair of start and end vertices, calculated with the one-to-one,
+        one-to-many, many-to-one or many-to-many function of the transport mode.
+        """
+        if len(startVerticesID) == 1 and len(endVerticesID) == 1:
+            return self.transportMode.getTotalShortestPathCostOneToOne(
+                startVertexID=startVerticesID[0],
+                endVertexID=endVerticesID[0],
+                costAttribute=costAttribute
+            )
+        elif len(startVerticesID) == 1 and len(endVerticesID) > 1:
+            return self.transportMode.getTotalShortestPathCostOneToMany(
+                startVertexID=startVerticesID[0],
+                endVerticesID=endVerticesID,
+                costAttribute=costAttribute
+            )
+        elif len(startVerticesID) > 1 and len(endVerticesID) == 1:
+            return self.transportMode.getTotalShortestPathCostManyToOne(
+                startVerticesID=startVerticesID,
+                endVertexID=endVerticesID[0],
+                costAttribute=costAttribute
+            )
+        elif len(startVerticesID) > 1 and len(endVerticesID) > 1:
+            return self.transportMode.getTotalShortestPathCostManyToMany(
+                startVerticesID=startVerticesID,
+                endVerticesID=endVerticesID,
+                costAttribute=costAttribute
+            )
+        return None
+
+    def calculateTotalsByComponent(self, startVerticesID, endVerticesID, costAttribute):
+        """
+        Calculate the cost summary only between the vertices of the same strongly connected component, one
+        ``calculateTotals`` per component shared by the start and end vertices.
+
+        :return: Cost summary geojson of every reachable pair of start and end vertices.
+        """
+        totals = None
+        for componentStartVerticesID, componentEndVerticesID in self.groupVerticesByComponent(
+                startVerticesID, endVerticesID, costAttribute):
+            componentTotals = self.calculateTotals(componentStartVerticesID, componentEndVerticesID, costAttribute)
+            if totals is None:
+                totals = componentTotals
+            else:
+                totals["features"].extend(componentTotals["features"])
+
+        if totals is None:
+            totals = {"type": "FeatureCollection", "features": []}
+        return totals
+
+    def groupVerticesByComponent(self, startVerticesID, endVerticesID, costAttribute):
+        """
+        :return: List with the (start vertex ids, end vertex ids) of every strongly connected component shared by
+        the start and end vertices, a single group with all the vertices if the components are not known.
+        """
+        if costAttribute not in self.stronglyConnectedComponents:
+            return [(startVerticesID, endVerticesID)]
+
+        components = self.stronglyConnectedComponents[costAttribute]
+        startComponents = components.getComponentIds(startVerticesID)
+        endComponents = components.getComponentIds(endVerticesID)
+
+        groups = []
+        for component in np.intersect1d(startComponents[startComponents >= 0], endComponents[endComponents >= 0]):
+            groups.append(([vertexID for vertexID, vertexComponent in zip(startVerticesID, startComponents)
+                            if vertexComponent == component],
+                           [vertexID for vertexID, vertexComponent in zip(endVerticesID, endComponents)
+                            if vertexComponent == component]))
+        return groups
+
+    def calculateTotalColumns(self, startVerticesID, endVerticesID, costAttribute):
+        """
+        :return: Start vertex ids, end vertex ids and total costs arrays of every pair of start and end vertices (of
+        the same strongly connected component, when they are known), calculated with
+        ``getTotalShortestPathCostManyToManyColumns`` of the transport mode.
+        """
+        costSummary = CostSummaryAccumulator(3)
+        for componentStartVerticesID, componentEndVerticesID in self.groupVerticesByComponent(
+                startVerticesID, endVerticesID, costAttribute):
+            costSummary.add(self.transportMode.getTotalShortestPathCostManyToManyColumns(
+                startVerticesID=componentStartVerticesID,
+                endVerticesID=componentEndVerticesID,
+                costAttribute=costAttribute
+            ))
+        return costSummary.getColumns()
+
+    def getEdgeVerticesID(self, features):
+        """
+        :param features: Point features snapped by the EdgeSnapper.
+        :return: Source and target vertices of the edges the points were projected onto, without repetitions.
+        """
+        verticesID = []
+        for feature in features:
+            properties = feature["properties"]
+            if "edgeId" in properties:
+                verticesID.append(properties["sourceVertexId"])
+                verticesID.append(properties["targetVertexId"])
+            else:
+                verticesID.append(properties["vertex_id"])
+        return list(dict.fromkeys(verticesID))
+
+    def selectPartialEdgeCostSummary(self, costAttribute, startPointFeature, endPointFeature, costSummaryMap):
+        """
+        Select the cheapest combination of the start and end edge vertices, adding to the cost between the vertices
+        the fraction of the projected edges travelled from the start point and to the end point.
+
+        :return: Selected start and end vertex and a cost summary map containing only the summary of that pair, with
+        the partial edge costs included in its ``total_cost``. An empty map if the pair is not reachable.
+        """
+        startProperties = startPointFeature["properties"]
+        endProperties = endPointFeature["properties"]
+
+        if "edgeId" in startProperties:
+            startCandidates = self.snapper.getStartCandidates(startProperties, costAttribute)
+        else:
+            startCandidates = [(startProperties["vertex_id"], 0.0)]
+        if "edgeId" in endProperties:
+            endCandidates = self.snapper.getEndCandidates(endProperties, costAttribute)
+        else:
+            endCandidates = [(endProperties["vertex_id"], 0.0)]
+
+        best = None
+        if "edgeId" in startProperties and "edgeId" in endProperties:
+            sameEdgeCost = self.snapper.getSameEdgeCost(startProperties, endProperties, costAttribute)
+            if sameEdgeCost is not None:
+                best = (sameEdgeCost, startProperties["vertex_id"], startProperties["vertex_id"], None)
+
+        for startVertexID, startCost in startCandidates:
+            for endVertexID, endCost in endCandidates:
+                if startVertexID == endVertexID:
+                    vertexCost, summaryFeature = 0.0, None
+                elif startVertexID in costSummaryMap and endVertexID in costSummaryMap[startVertexID]:
+                    summaryFeature = costSummaryMap[startVertexID][endVertexID]
+                    vertexCost = summaryFeature["properties"]["total_cost"]
+                else:
+                    continue
+                totalCost = startCost + vertexCost + endCost
+                if best is None or totalCost < best[0]:
+                    best = (totalCost, startVertexID, endVertexID, summaryFeature)
+
+        if best is None or (self.maxCost is not None and best[0] > self.maxCost):
+            return startProperties["vertex_id"], endProperties["vertex_id"], {}
+
+        totalCost, startVertexID, endVertexID, summaryFeature = best
+        if summaryFeature is None:
+            summaryFeature = {
+                "type": "Feature",
+                "properties": {},
+                "geometry": {
+                    "type": "LineString",
+                    "coordinates": [startProperties["nearestVertexCoordinates"],
+                                    endProperties["nearestVertexCoordinates"]]
+                }
+            }
+        summaryFeature = dict(summaryFeature, properties=dict(summaryFeature["properties"],
+                                                               start_vertex_id=startVertexID,
+                                                               end_vertex_id=endVertexID,
+                                                               total_cost=totalCost))
+        return startVertexID, endVertexID, {startVertexID: {endVertexID: summaryFeature}}
+
+    def selectPartialEdgeShortestPath(self, costAttribute, startPointFeature, endPointFeature,
+                                      shortestPathTree=None):
+        """
+        Route counterpart of ``selectPartialEdgeCostSummary``: the pair of edge vertices is selected with the partial
+        edge costs, its shortest path is calculated and the parts of the projected edges travelled from the start
+        point and to the end point are added as the first and last features of the route.
+
+        :param shortestPathTree: Tree rooted in the start point nearest vertex, only used if that vertex is selected.
+        :return: Selected start and end vertex and shortest path geojson, None if the pair is not reachable.
+        """
+        startProperties = startPointFeature["properties"]
+        endProperties = endPointFeature["properties"]
+        totals = self.calculateTotals(self.getEdgeVerticesID([startPointFeature]),
+                                      self.getEdgeVerticesID([endPointFeature]), costAttribute)
+        startVertexId, endVertexId, costSummaryMap = self.selectPartialEdgeCostSummary(
+            costAttribute, startPointFeature, endPointFeature, self.createCostSummaryMap(totals))
+        if not costSummaryMap:
+            return startVertexId, endVertexId, None
+
+        totalCost = costSummaryMap[startVertexId][endVertexId]["properties"]["total_cost"]
+        sameEdgeCost = None
+        if "edgeId" in startProperties and "edgeId" in endProperties:
+            sameEdgeCost = self.snapper.getSameEdgeCost(startProperties, endProperties, costAttribute)
+
+        if sameEdgeCost is not None and sameEdgeCost <= totalCost:
+            shortestPath = {"type": "FeatureCollection", "features": [self.snapper.getPartialEdgeFeature(
+                startProperties["edgeId"], startProperties["edgeFraction"], endProperties["edgeFraction"],
+                sameEdgeCost, costAttribute)]}
+        else:
+            if shortestPathTree is not None and shortestPathTree.getStartVertexId() == startVertexId:
+                shortestPath = self.transportMode.getShortestPathFromTree(shortestPathTree=shortestPathTree,
+                                                                          endVertexId=endVertexId)
+            else:
+                shortestPath = self.transportMode.getShortestPath(startVertexId=startVertexId,
+                                                                  endVertexId=endVertexId,
+                                                                  cost=costAttribute)
+
+            features = list(shortestPath["features"])
+            if "edgeId" in startProperties:
+                startCost = dict(self.snapper.getStartCandidates(startProperties, costAttribute))[startVertexId]
+                vertexFraction = 1.0 if startVertexId == startProperties["targetVertexId"] else 0.0
+                features.insert(0, self.snapper.getPartialEdgeFeature(
+                    startProperties["edgeId"], startProperties["edgeFraction"], vertexFraction, startCost,
+                    costAttribute))
+            if "edgeId" in endProperties:
+                endCost = dict(self.snapper.getEndCandidates(endProperties, costAttribute))[endVertexId]
+                vertexFraction = 0.0 if endVertexId == endProperties["sourceVertexId"] else 1.0
+                features.append(self.snapper.getPartialEdgeFeature(
+                    endProperties["edgeId"], vertexFraction, endProperties["edgeFraction"], endCost,
+                    costAttribute))
+            shortestPath["features"] = features
+
+        for seq, feature in enumerate(shortestPath["features"]):
+            feature["properties"]["seq"] = seq
+        shortestPath["totalFeatures"] = len(shortestPath["features"])
+        return startVertexId, endVertexId, shortestPath
+
+    def isReachable(self, startVertexID, endVertexID, costAttribute):
+        """
+        :return: False if the strongly connected components of the impedance are known and the vertices belong to
+        different components.
+        """
+        if costAttribute not in self.stronglyConnectedComponents:
+            return True
+        return self.stronglyConnectedComponents[costAttribute].isReachable(startVertexID, endVertexID)
+
     @dgl_timer
     def getVerticesID(self, geojson, endEPSGCode):
+        self.loadGridFeatures(geojson)
+        snappedPointIds = self.loadSnappedFeatures(geojson, endEPSGCode)
 
+        if self.snapper is not None:
+            verticesID, features = self.snapFeatures(geojson, endEPSGCode)
+        else:
+            verticesID, features = self.findNearestVertices(geojson, endEPSGCode)
+
+        verticesID, features = self.dropUnsnappedFeatures(verticesID, features)
+        self.storeSnappedFeatures(features, endEPSGCode, snappedPointIds)
+        return verticesID, features
+
+    def dropUnsnappedFeatures(self, verticesID, features):
+        """
+        Remove the points without a routable vertex within the snapping max distance (vertex id -1), so that they
+        are not routed, summarized or stored in the snapping cache.
+
+        :return: Vertex id and feature of every snapped point.
+        """
+        snapped = [vertexID is not None and vertexID >= 0 for vertexID in verticesID]
+        if not all(snapped):
+            pointIdentifierKey = getConfigurationProperties(section="WFS_CONFIG")["point_identifier"]
+            Logger.getInstance().warning("Points dropped, there is no routable vertex within the max distance: %s" % (
+                sorted({str(feature["properties"][pointIdentifierKey])
+                        for feature, isSnapped in zip(features, snapped) if not isSnapped})))
+        return [vertexID for vertexID, isSnapped in zip(verticesID, snapped) if isSnapped], \
+               [feature for feature, isSnapped in zip(features, snapped) if isSnapped]
+
+    def findNearestVertices(self, geojson, endEPSGCode):
         verticesID = []
         features = []
 
@@ -817,6 +1404,151 @@ class DORARouterAnalyst:
 
         return verticesID, features
 
+    def loadGridFeatures(self, geojson):
+        """
+        Move the grid points found in the GridVertexTable to the ``nearestVerticesCache``.
+        """
+        if self.gridVertexTable is None:
+            return
+
+        pointIdentifierKey = getConfigurationProperties(section="WFS_CONFIG")["point_identifier"]
+        for feature in geojson["features"]:
+            pointId = feature["properties"][pointIdentifierKey]
+            if pointId in self.nearestVerticesCache:
+                continue
+
+            position = self.gridVertexTable.getPosition(pointId)
+            if position >= 0:
+                feature["properties"].update(self.gridVertexTable.getProperties(position))
+                self.nearestVerticesCache[pointId] = (feature["properties"]["vertex_id"], feature)
+
+    @dgl_timer
+    def createGridVertexTable(self, gridGeojsonFilename, fingerprint):
+        """
+        Snap all the points of the YKR grid and calculate the euclidean distance to their nearest vertices.
+
+        :param gridGeojsonFilename: Geojson file (Geometry type: Point) with the centroids of the grid cells.
+        :param fingerprint: Fingerprint of the edges table.
+        :return: GridVertexTable.
+        """
+        epsgCode = self.operations.extractCRSWithGeopandas(gridGeojsonFilename)
+        _, features = self.getVerticesID(self.fileActions.readJson(gridGeojsonFilename), epsgCode)
+
+        pointIdentifierKey = getConfigurationProperties(section="WFS_CONFIG")["point_identifier"]
+        gridFeatures = {}
+        for feature in features:
+            gridFeatures[feature["properties"][pointIdentifierKey]] = feature
+        gridFeatures = list(gridFeatures.values())
+
+        euclideanDistances = []
+        for feature in gridFeatures:
+            properties = feature["properties"]
+            euclideanDistances.append(self.operations.calculateEuclideanDistance(
+                startPoint=Point(latitute=properties["selectedPointCoordinates"][1],
+                                 longitude=properties["selectedPointCoordinates"][0],
+                                 epsgCode=properties["coordinatesCRS"]),
+                endPoint=Point(latitute=properties["nearestVertexCoordinates"][1],
+                               longitude=properties["nearestVertexCoordinates"][0],
+                               epsgCode=properties["coordinatesCRS"])))
+
+        return GridVertexTable.fromFeatures(gridFeatures, pointIdentifierKey, euclideanDistances, fingerprint)
+
+    def loadSnappedFeatures(self, geojson, epsgCode):
+        """
+        Move the points found in the snapping cache to the ``nearestVerticesCache``.
+
+        :return: Identifiers of the points that were already snapped, None without snapping cache.
+        """
+        if self.snappingCache is None:
+            return None
+
+        pointIdentifierKey = getConfigurationProperties(section="WFS_CONFIG")["point_identifier"]
+        snappedPointIds = set(self.nearestVerticesCache.keys())
+        for feature in geojson["features"]:
+            pointId = feature["properties"][pointIdentifierKey]
+            if pointId in snappedPointIds:
+                continue
+
+            snapping = self.snappingCache.get(pointId, feature["geometry"]["coordinates"], epsgCode)
+            if snapping is not None:
+                vertexID, properties = snapping
+                feature["properties"].update(properties)
+                self.nearestVerticesCache[pointId] = (vertexID, feature)
+                snappedPointIds.add(pointId)
+
+        Logger.getInstance().info("%s points found in the snapping cache" % len(snappedPointIds))
+        return snappedPointIds
+
+    def storeSnappedFeatures(self, features, epsgCode, snappedPointIds):
+        """
+        Store in the snapping cache the points that were not already snapped.
+        """
+        if self.snappingCache is None:
+            return
+
+        pointIdentifierKey = getConfigurationProperties(section="WFS_CONFIG")["point_identifier"]
+        newFeatures = {}
+        for feature in features:
+            pointId = feature["properties"][pointIdentifierKey]
+            if pointId not in snappedPointIds:
+                newFeatures[pointId] = feature
+
+        self.snappingCache.put(newFeatures.values(), pointIdentifierKey, epsgCode)
+
+    def snapFeatures(self, geojson, epsgCode):
+        """
+        Snap all the points of the geojson to their nearest routable vertex with a single call to the snapper.
+        The features get the same properties added by ``extractFeatureInformation``.
+
+        :param geojson: Geojson (Geometry type: Point).
+        :param epsgCode: CRS of the geojson coordinates.
+        :return: Vertex id and feature of every point.
+        """
+        pointIdentifierKey = getConfigurationProperties(section="WFS_CONFIG")["point_identifier"]
+        targetEPSGCode = self.transportMode.getEPSGCode()
+
+        newFeatures = {}
+        for feature in geojson["features"]:
+            pointId = feature["properties"][pointIdentifierKey]
+            if pointId not in self.nearestVerticesCache and pointId not in newFeatures:
+                newFeatures[pointId] = feature
+
+        if newFeatures:
+            coordinates = self.operations.transformCoordinates(
+                [feature["geometry"]["coordinates"][:2] for feature in newFeatures.values()], epsgCode, targetEPSGCode)
+            edgeProperties = [None] * len(coordinates)
+            if isinstance(self.snapper, EdgeSnapper):
+                vertexIds, vertexCoordinates, edgeProperties = self.snapper.project(coordinates)
+            else:
+                vertexIds, vertexCoordinates, _ = self.snapper.snap(coordinates)
+            coordinatesCRS = epsgCode if epsgCode.lower() == targetEPSGCode.lower() else targetEPSGCode
+
+            for (pointId, feature), selectedCoordinates, vertexID, nearestCoordinates, properties in zip(
+                    newFeatures.items(), coordinates.tolist(), vertexIds.tolist(), vertexCoordinates.tolist(),
+                    edgeProperties):
+                if properties is not None:
+                    feature["properties"].update(properties)
+                feature["properties"]["vertex_id"] = vertexID
+                feature["properties"]["selectedPointCoordinates"] = selectedCoordinates
+                feature["properties"]["nearestVertexCoordinates"] = nearestCoordinates
+                feature["properties"]["coordinatesCRS"] = coordinatesCRS
+                if vertexID >= 0:
+                    self.nearestVerticesCache[pointId] = (vertexID, feature)
+
+        verticesID = []
+        features = []
+        for feature in geojson["features"]:
+            pointId = feature["properties"][pointIdentifierKey]
+            if pointId in self.nearestVerticesCache:
+                vertexID, feature = self.nearestVerticesCache[pointId]
+            else:
+                feature = newFeatures[pointId]
+                vertexID = feature["properties"]["vertex_id"]
+            verticesID.append(vertexID)
+            features.append(feature)
+
+        return verticesID, features
+
     @dgl_timer
     def createCostSummaryMap(self, totals):
         """
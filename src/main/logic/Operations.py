@@ -150,6 +150,26 @@ class Operations:
 
         return Point(latitute=lat, longitude=lng, epsgCode=targetEPSGCode)
 
+    def transformCoordinates(self, coordinates, epsgCode, targetEPSGCode="epsg:4326"):
+        """
+        Coordinates Transform of a whole set of points from one CRS to another CRS.
+
+        :param coordinates: (number of points x 2) array of longitude/x and latitude/y.
+        :param epsgCode: CRS of the coordinates.
+        :param targetEPSGCode: CRS of the transformed coordinates.
+        :return: (number of points x 2) array.
+        """
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        if epsgCode.lower() == targetEPSGCode.lower() or len(coordinates) == 0:
+            return coordinates
+
+        inProj = Proj(init=epsgCode)
+        outProj = Proj(init=targetEPSGCode)
+
+        lng, lat = transform(inProj, outProj, coordinates[:, 0], coordinates[:, 1])
+
+        return np.column_stack([lng, lat])
+
     def extractCRSWithGeopandas(self, url):
         pointsDF = gpd.read_file(url)
         return pointsDF.crs["init"]
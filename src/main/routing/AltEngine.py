@@ -0,0 +1,61 @@
+import heapq
+
+import numpy as np
+
+from src.main.routing.DijkstraEngine import DijkstraEngine
+
+
+class AltEngine(DijkstraEngine):
+    def __init__(self, routingGraph, landmarks, bidirectionalMaxPairs=0):
+        """
+        A* search guided by the landmarks lower bounds (ALT) for the point to point shortest paths, the search only
+        settles the corridor between the start and the end vertex instead of the whole network.
+
+        The cost summaries are still calculated as in the DijkstraEngine.
+
+        :param routingGraph: Graph loaded once from the edges table.
+        :param landmarks: Landmarks calculated with ``Landmarks.select`` over the same graph.
+        :param bidirectionalMaxPairs: See DijkstraEngine.
+        """
+        super(AltEngine, self).__init__(routingGraph, bidirectionalMaxPairs)
+        self.landmarks = landmarks
+
+    def calculateShortestPath(self, startIndex, endIndex):
+        """
+        :param startIndex: Start vertex index.
+        :param endIndex: End vertex index.
+        :return: Ordered list of the edge ids of the shortest path, empty if there is no path.
+        """
+        routingGraph = self.routingGraph
+        costs = {startIndex: 0.0}
+        parents = {}
+        heuristics = {}
+        queue = [(self.landmarks.getHeuristic(startIndex, endIndex), 0.0, startIndex)]
+        while queue:
+            _, cost, vertex = heapq.heappop(queue)
+            if cost > costs[vertex]:
+                continue
+            if vertex == endIndex:
+                break
+            for arcPosition in range(routingGraph.indptr[vertex], routingGraph.indptr[vertex + 1]):
+                head = routingGraph.heads[arcPosition]
+                newCost = cost + routingGraph.weights[arcPosition]
+                if newCost < costs.get(head, np.inf):
+                    if head not in heuristics:
+                        heuristics[head] = self.landmarks.getHeuristic(head, endIndex)
+                    if np.isinf(heuristics[head]):
+                        continue
+                    costs[head] = newCost
+                    parents[head] = (vertex, arcPosition)
+                    heapq.heappush(queue, (newCost + heuristics[head], newCost, head))
+
+        if endIndex not in costs:
+            return []
+
+        edgeIds = []
+        vertex = endIndex
+        while vertex != startIndex:
+            vertex, arcPosition = parents[vertex]
+            edgeIds.append(int(routingGraph.edgeIds[arcPosition]))
+        edgeIds.reverse()
+        return edgeIds
@@ -0,0 +1,214 @@
+import heapq
+
+import numpy as np
+
+from src.main.carRoutingExceptions import OutdatedNetworkException
+from src.main.routing.RoutingGraph import RoutingGraph
+from src.main.util import Logger
+
+
+class ContractionHierarchy:
+    def __init__(self, ranks, upwardGraph, downwardGraph, fingerprint=""):
+        """
+        Contraction Hierarchy (CH) of a RoutingGraph.
+
+        Every vertex gets a rank (contraction order) and the arcs are split in two graphs that only go up in rank:
+
+        - ``upwardGraph`` keeps the arcs ``u -> v`` with ``rank(u) < rank(v)``.
+        - ``downwardGraph`` keeps the arcs ``u -> v`` with ``rank(u) > rank(v)`` stored reversed (``v -> u``), so
+          that a backward search from the target also goes up in rank.
+
+        Shortcuts have a negative edge id ``-(middle vertex index + 1)``, the middle vertex is the contracted vertex
+        that the shortcut skips.
+
+        :param ranks: Contraction order of every vertex index.
+        :param upwardGraph: RoutingGraph with the upward arcs.
+        :param downwardGraph: RoutingGraph with the reversed downward arcs.
+        :param fingerprint: Fingerprint of the network the hierarchy was built on.
+        """
+        self.ranks = ranks
+        self.upwardGraph = upwardGraph
+        self.downwardGraph = downwardGraph
+        self.fingerprint = str(fingerprint)
+
+    @staticmethod
+    def contract(routingGraph, witnessSettledLimit=500, witnessHopLimit=5, fingerprint=""):
+        """
+        Contract every vertex of the graph, the next vertex to contract is the one with the lowest edge difference
+        (shortcuts added - arcs removed) plus number of already contracted neighbours.
+
+        The contraction is a pure Python loop, a few hundred vertices per second on a road network and slower as the
+        remaining core gets denser: a regional network (i.e. the Digiroad edges of the capital region) takes hours, so
+        it is meant to run once offline with ``--contract``. Every witness search is capped by ``witnessSettledLimit``
+        and ``witnessHopLimit`` and stops when all the candidate heads are settled.
+
+        :param routingGraph: RoutingGraph to contract.
+        :param witnessSettledLimit: Maximum settled vertices of every witness search, when a witness path is not
+        found within the limit the shortcut is added (correct but not minimal).
+        :param witnessHopLimit: Maximum arcs of every witness path, a longer witness path is not found and the shortcut
+        is added.
+        :param fingerprint: Fingerprint of the network of the routing graph.
+        :return: New ContractionHierarchy.
+        """
+        vertexCount = routingGraph.getVertexCount()
+        outArcs = [{} for _ in range(vertexCount)]
+        inArcs = [{} for _ in range(vertexCount)]
+
+        tails = np.repeat(np.arange(vertexCount, dtype=np.int64), np.diff(routingGraph.indptr))
+        for tail, head, weight, edgeId in zip(tails.tolist(), routingGraph.heads.tolist(),
+                                              routingGraph.weights.tolist(), routingGraph.edgeIds.tolist()):
+            if tail != head:
+                outArcs[tail][head] = (weight, edgeId)
+                inArcs[head][tail] = (weight, edgeId)
+
+        def witnessSearch(source, excludedVertex, targets, maxCost):
+            costs = {source: 0.0}
+            hops = {source: 0}
+            queue = [(0.0, source)]
+            settled = 0
+            remainingTargets = len(targets)
+            while queue and settled < witnessSettledLimit and remainingTargets > 0:
+                cost, vertex = heapq.heappop(queue)
+                if cost > costs[vertex]:
+                    continue
+                if cost > maxCost:
+                    break
+                settled += 1
+                if vertex in targets:
+                    remainingTargets -= 1
+                if hops[vertex] >= witnessHopLimit:
+                    continue
+                for head, (weight, _) in outArcs[vertex].items():
+                    if head == excludedVertex:
+                        continue
+                    newCost = cost + weight
+                    if newCost < costs.get(head, np.inf):
+                        costs[head] = newCost
+                        hops[head] = hops[vertex] + 1
+                        heapq.heappush(queue, (newCost, head))
+            return costs
+
+        def findShortcuts(vertex):
+            shortcuts = []
+            for tail, (inWeight, _) in inArcs[vertex].items():
+                candidates = {head: inWeight + outWeight
+                              for head, (outWeight, _) in outArcs[vertex].items() if head != tail}
+                if not candidates:
+                    continue
+                witnessCosts = witnessSearch(tail, vertex, candidates, max(candidates.values()))
+                for head, cost in candidates.items():
+                    if witnessCosts.get(head, np.inf) > cost:
+                        shortcuts.append((tail, head, cost))
+            return shortcuts
+
+        contractedNeighbours = np.zeros(vertexCount, dtype=np.int64)
+
+        def priority(vertex, shortcuts):
+            edgeDifference = len(shortcuts) - len(inArcs[vertex]) - len(outArcs[vertex])
+            return edgeDifference + contractedNeighbours[vertex]
+
+        queue = [(priority(vertex, findShortcuts(vertex)), vertex) for vertex in range(vertexCount)]
+        heapq.heapify(queue)
+
+        ranks = np.zeros(vertexCount, dtype=np.int64)
+        upwardArcs = []
+        downwardArcs = []
+        rank = 0
+        while queue:
+            _, vertex = heapq.heappop(queue)
+            # Lazy update: the priority could be outdated by the previous contractions.
+            shortcuts = findShortcuts(vertex)
+            currentPriority = priority(vertex, shortcuts)
+            if queue and currentPriority > queue[0][0]:
+                heapq.heappush(queue, (currentPriority, vertex))
+                continue
+
+            ranks[vertex] = rank
+            rank += 1
+            if rank % 100000 == 0:
+                Logger.getInstance().info("Contracted vertices: %s/%s" % (rank, vertexCount))
+
+            for head, (weight, edgeId) in outArcs[vertex].items():
+                upwardArcs.append((vertex, head, weight, edgeId))
+            for tail, (weight, edgeId) in inArcs[vertex].items():
+                downwardArcs.append((vertex, tail, weight, edgeId))
+
+            for head in outArcs[vertex]:
+                del inArcs[head][vertex]
+                contractedNeighbours[head] += 1
+            for tail in inArcs[vertex]:
+                del outArcs[tail][vertex]
+                contractedNeighbours[tail] += 1
+            outArcs[vertex] = {}
+            inArcs[vertex] = {}
+
+            shortcutId = -(vertex + 1)
+            for tail, head, cost in shortcuts:
+                if cost < outArcs[tail].get(head, (np.inf, None))[0]:
+                    outArcs[tail][head] = (cost, shortcutId)
+                    inArcs[head][tail] = (cost, shortcutId)
+
+        return ContractionHierarchy(ranks=ranks,
+                                    upwardGraph=ContractionHierarchy.__createGraph(routingGraph, upwardArcs),
+                                    downwardGraph=ContractionHierarchy.__createGraph(routingGraph, downwardArcs),
+                                    fingerprint=fingerprint)
+
+    @staticmethod
+    def __createGraph(routingGraph, arcs):
+        arcs = np.array(arcs, dtype=np.float64).reshape(-1, 4)
+        return RoutingGraph.fromArcs(vertexIds=routingGraph.vertexIds,
+                                     tails=arcs[:, 0].astype(np.int64),
+                                     heads=arcs[:, 1].astype(np.int64),
+                                     weights=arcs[:, 2],
+                                     edgeIds=arcs[:, 3].astype(np.int64),
+                                     coordinates=routingGraph.coordinates)
+
+    def save(self, path):
+        """
+        Store the hierarchy in a ``.npz`` file, so that the contraction is only executed once.
+
+        :param path: File path.
+        """
+        coordinates = self.upwardGraph.coordinates
+        np.savez(path,
+                 ranks=self.ranks,
+                 vertexIds=self.upwardGraph.vertexIds,
+                 coordinates=coordinates if coordinates is not None else np.zeros((0, 2)),
+                 upwardIndptr=self.upwardGraph.indptr,
+                 upwardHeads=self.upwardGraph.heads,
+                 upwardWeights=self.upwardGraph.weights,
+                 upwardEdgeIds=self.upwardGraph.edgeIds,
+                 downwardIndptr=self.downwardGraph.indptr,
+                 downwardHeads=self.downwardGraph.heads,
+                 downwardWeights=self.downwardGraph.weights,
+                 downwardEdgeIds=self.downwardGraph.edgeIds,
+                 fingerprint=np.array(self.fingerprint))
+
+    @staticmethod
+    def load(path, fingerprint=None):
+        """
+        :param path: File path of a hierarchy stored with ``save``.
+        :param fingerprint: Current fingerprint of the network, it must be the stored one.
+        :return: ContractionHierarchy.
+        """
+        with np.load(path) as data:
+            storedFingerprint = str(data["fingerprint"]) if "fingerprint" in data else ""
+            if fingerprint is not None and storedFingerprint != str(fingerprint):
+                raise OutdatedNetworkException("The contraction hierarchy %s was built on a different network" % path)
+
+            vertexIds = data["vertexIds"]
+            coordinates = data["coordinates"] if len(data["coordinates"]) == len(vertexIds) else None
+            upwardGraph = RoutingGraph(vertexIds=vertexIds,
+                                       indptr=data["upwardIndptr"],
+                                       heads=data["upwardHeads"],
+                                       weights=data["upwardWeights"],
+                                       edgeIds=data["upwardEdgeIds"],
+                                       coordinates=coordinates)
+            downwardGraph = RoutingGraph(vertexIds=vertexIds,
+                                         indptr=data["downwardIndptr"],
+                                         heads=data["downwardHeads"],
+                                         weights=data["downwardWeights"],
+                                         edgeIds=data["downwardEdgeIds"],
+                                         coordinates=coordinates)
+            return ContractionHierarchy(ranks=data["ranks"], upwardGraph=upwardGraph, downwardGraph=downwardGraph,
+                                        fingerprint=storedFingerprint)
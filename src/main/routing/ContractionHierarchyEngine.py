@@ -0,0 +1,176 @@
+import heapq
+import threading
+
+import numpy as np
+
+from src.main.routing.ContractionHierarchy import ContractionHierarchy
+
+
+class ContractionHierarchyEngine:
+    def __init__(self, contractionHierarchy):
+        """
+        Query a ContractionHierarchy: every search only goes up in rank, so each one settles a few hundred vertices
+        instead of the whole graph.
+
+        :param contractionHierarchy: ContractionHierarchy built with ``ContractionHierarchy.contract``.
+        """
+        self.contractionHierarchy = contractionHierarchy
+        self.routingGraph = contractionHierarchy.upwardGraph
+        self.reverseEngine = None
+        self.buckets = None
+        self.bucketsLock = threading.Lock()
+
+    def getReverseEngine(self):
+        """
+        The hierarchy of the reverse graph is the same hierarchy with the upward and downward graphs swapped.
+
+        :return: Engine of the same type over the reverse graph.
+        """
+        if self.reverseEngine is None:
+            self.reverseEngine = type(self)(ContractionHierarchy(ranks=self.contractionHierarchy.ranks,
+                                                                 upwardGraph=self.contractionHierarchy.downwardGraph,
+                                                                 downwardGraph=self.contractionHierarchy.upwardGraph,
+                                                                 fingerprint=self.contractionHierarchy.fingerprint))
+        return self.reverseEngine
+
+    def calculateCosts(self, startIndexes, endIndexes, maxCost=np.inf):
+        """
+        Bucket based many-to-many: one backward upward search per end vertex fills the buckets of the vertices it
+        settles, then one forward upward search per start vertex scans the buckets.
+
+        :param startIndexes: Start vertex indexes.
+        :param endIndexes: End vertex indexes.
+        :param maxCost: The upward searches are stopped at this cost, the pairs over it are reported as unreachable.
+        :return: (len(startIndexes) x len(endIndexes)) cost matrix, ``numpy.inf`` for the unreachable pairs.
+        """
+        costs = np.full((len(startIndexes), len(endIndexes)), np.inf)
+        buckets = self.getBuckets(endIndexes, maxCost)
+
+        for row, startIndex in enumerate(startIndexes):
+            forwardCosts, _ = self._upwardSearch(self.contractionHierarchy.upwardGraph, startIndex, maxCost)
+            rowCosts = costs[row]
+            for vertex, forwardCost in forwardCosts.items():
+                for column, backwardCost in buckets.get(vertex, ()):
+                    if forwardCost + backwardCost < rowCosts[column]:
+                        rowCosts[column] = forwardCost + backwardCost
+
+        costs[costs > maxCost] = np.inf
+        return costs
+
+    def getBuckets(self, endIndexes, maxCost=np.inf):
+        """
+        Buckets of the backward upward searches from the end vertices. The buckets of the last ``endIndexes`` are
+        reused, i.e. by every block of start vertices of a cost summary.
+
+        :param endIndexes: End vertex indexes.
+        :param maxCost: The backward searches are stopped at this cost.
+        :return: Dictionary vertex -> list of (end vertex column, cost from the vertex to the end vertex).
+        """
+        endIndexes = np.asarray(endIndexes, dtype=np.int64)
+        with self.bucketsLock:
+            if self.buckets is not None and self.buckets[1] == maxCost and np.array_equal(self.buckets[0], endIndexes):
+                return self.buckets[2]
+
+            buckets = {}
+            for column, endIndex in enumerate(endIndexes.tolist()):
+                backwardCosts, _ = self._upwardSearch(self.contractionHierarchy.downwardGraph, endIndex, maxCost)
+                for vertex, cost in backwardCosts.items():
+                    buckets.setdefault(vertex, []).append((column, cost))
+
+            self.buckets = (endIndexes, maxCost, buckets)
+            return buckets
+
+    def calculateShortestPath(self, startIndex, endIndex):
+        """
+        :param startIndex: Start vertex index.
+        :param endIndex: End vertex index.
+        :return: Ordered list of the edge ids of the shortest path, empty if there is no path.
+        """
+        upwardGraph = self.contractionHierarchy.upwardGraph
+        downwardGraph = self.contractionHierarchy.downwardGraph
+
+        forwardCosts, forwardParents = self._upwardSearch(upwardGraph, startIndex)
+        backwardCosts, backwardParents = self._upwardSearch(downwardGraph, endIndex)
+
+        meetingVertex = None
+        meetingCost = np.inf
+        for vertex, forwardCost in forwardCosts.items():
+            cost = forwardCost + backwardCosts.get(vertex, np.inf)
+            if cost < meetingCost:
+                meetingVertex = vertex
+                meetingCost = cost
+
+        if meetingVertex is None:
+            return []
+
+        arcs = []
+        vertex = meetingVertex
+        while vertex != startIndex:
+            tail, arcPosition = forwardParents[vertex]
+            arcs.append((tail, vertex, upwardGraph.edgeIds[arcPosition]))
+            vertex = tail
+        arcs.reverse()
+
+        vertex = meetingVertex
+        while vertex != endIndex:
+            # The arc (head -> vertex) of the downward graph is the original arc (vertex -> head).
+            head, arcPosition = backwardParents[vertex]
+            arcs.append((vertex, head, downwardGraph.edgeIds[arcPosition]))
+            vertex = head
+
+        edgeIds = []
+        for tail, head, edgeId in arcs:
+            edgeIds.extend(self.__unpackArc(tail, head, edgeId))
+        return edgeIds
+
+    def _upwardSearch(self, graph, startIndex, maxCost=np.inf):
+        """
+        Dijkstra over one of the upward graphs, up to ``maxCost``.
+
+        :return: Dictionaries vertex -> cost and vertex -> (previous vertex, arc position).
+        """
+        costs = {startIndex: 0.0}
+        parents = {}
+        queue = [(0.0, startIndex)]
+        settled = set()
+        while queue:
+            cost, vertex = heapq.heappop(queue)
+            if vertex in settled:
+                continue
+            settled.add(vertex)
+            for arcPosition in range(graph.indptr[vertex], graph.indptr[vertex + 1]):
+                head = graph.heads[arcPosition]
+                newCost = cost + graph.weights[arcPosition]
+                if newCost < costs.get(head, np.inf) and newCost <= maxCost:
+                    costs[head] = newCost
+                    parents[head] = (vertex, arcPosition)
+                    heapq.heappush(queue, (newCost, head))
+        return costs, parents
+
+    def __unpackArc(self, tailIndex, headIndex, edgeId):
+        """
+        Replace the shortcuts by the original edges they skip.
+
+        :return: Ordered list of the original edge ids of the arc (tail -> head).
+        """
+        edgeIds = []
+        stack = [(tailIndex, headIndex, edgeId)]
+        while stack:
+            tail, head, edgeId = stack.pop()
+            if edgeId >= 0:
+                edgeIds.append(int(edgeId))
+                continue
+            middle = -edgeId - 1
+            # The second half is pushed first, so that the first half is unpacked first.
+            stack.append((middle, head, self.__getArcEdgeId(middle, head)))
+            stack.append((tail, middle, self.__getArcEdgeId(tail, middle)))
+        return edgeIds
+
+    def __getArcEdgeId(self, tailIndex, headIndex):
+        if self.contractionHierarchy.ranks[tailIndex] < self.contractionHierarchy.ranks[headIndex]:
+            graph = self.contractionHierarchy.upwardGraph
+            arcPosition = graph.getArcPosition(tailIndex, headIndex)
+        else:
+            graph = self.contractionHierarchy.downwardGraph
+            arcPosition = graph.getArcPosition(headIndex, tailIndex)
+        return graph.edgeIds[arcPosition]
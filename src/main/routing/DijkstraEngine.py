@@ -0,0 +1,131 @@
+import heapq
+
+import numpy as np
+from scipy.sparse.csgraph import dijkstra
+
+from src.main.routing.RoutingGraph import RoutingGraph
+from src.main.routing.ShortestPathTree import ShortestPathTree
+
+sharedEngines = {}
+
+
+def calculateCostsWithSharedGraph(graphPathPrefix, startIndexes, endIndexes, bidirectionalMaxPairs=0,
+                                  maxCost=np.inf, reverseGraphPathPrefix=None):
+    """
+    Process pool job: memory-map once per worker process the graph stored with ``RoutingGraph.save`` (the pages are
+    shared by all the workers) and calculate the costs of a block of start vertices.
+
+    :param graphPathPrefix: Path and prefix of the stored graph.
+    :param startIndexes: Start vertex indexes.
+    :param endIndexes: End vertex indexes.
+    :param bidirectionalMaxPairs: See DijkstraEngine.
+    :param maxCost: See ``DijkstraEngine.calculateCosts``.
+    :param reverseGraphPathPrefix: Path and prefix of the stored reverse graph, used by the bidirectional searches.
+    :return: (len(startIndexes) x len(endIndexes)) cost matrix.
+    """
+    if graphPathPrefix not in sharedEngines:
+        routingGraph = RoutingGraph.load(graphPathPrefix, reversePathPrefix=reverseGraphPathPrefix)
+        sharedEngines[graphPathPrefix] = DijkstraEngine(routingGraph, bidirectionalMaxPairs)
+    return sharedEngines[graphPathPrefix].calculateCosts(startIndexes, endIndexes, maxCost)
+
+
+class DijkstraEngine:
+    def __init__(self, routingGraph, bidirectionalMaxPairs=0):
+        """
+        In-process one-to-all Dijkstra over a RoutingGraph.
+
+        :param routingGraph: Graph loaded once from the edges table.
+        :param bidirectionalMaxPairs: Requests with up to this number of (start, end) pairs are calculated with one
+        bidirectional Dijkstra per pair instead of one one-to-all Dijkstra per start vertex.
+        """
+        self.routingGraph = routingGraph
+        self.bidirectionalMaxPairs = bidirectionalMaxPairs
+        self.reverseEngine = None
+
+    def getReverseEngine(self):
+        """
+        :return: Engine over the reverse graph, the cost from ``a`` to ``b`` in the reverse engine is the cost from
+        ``b`` to ``a`` in this one.
+        """
+        if self.reverseEngine is None:
+            self.reverseEngine = DijkstraEngine(self.routingGraph.getReverseGraph(), self.bidirectionalMaxPairs)
+        return self.reverseEngine
+
+    def calculateCosts(self, startIndexes, endIndexes, maxCost=np.inf):
+        """
+        Run one Dijkstra per start vertex over the whole graph and keep the costs to the end vertices.
+
+        :param startIndexes: Start vertex indexes.
+        :param endIndexes: End vertex indexes.
+        :param maxCost: The searches are stopped at this cost, the pairs over it are reported as unreachable.
+        :return: (len(startIndexes) x len(endIndexes)) cost matrix, ``numpy.inf`` for the unreachable pairs.
+        """
+        startIndexes = np.asarray(startIndexes, dtype=np.int64)
+        endIndexes = np.asarray(endIndexes, dtype=np.int64)
+
+        if len(startIndexes) == 0 or len(endIndexes) == 0:
+            return np.full((len(startIndexes), len(endIndexes)), np.inf)
+
+        if len(startIndexes) * len(endIndexes) <= self.bidirectionalMaxPairs:
+            return np.array([[self.calculateCost(startIndex, endIndex, maxCost) for endIndex in endIndexes]
+                             for startIndex in startIndexes], dtype=np.float64)
+
+        costs = dijkstra(self.routingGraph.getSparseMatrix(), directed=True, indices=startIndexes, limit=maxCost)
+        return costs[:, endIndexes]
+
+    def calculateCost(self, startIndex, endIndex, maxCost=np.inf):
+        """
+        Bidirectional Dijkstra: search forward from the start vertex and backward (over the reverse arcs) from the
+        end vertex at the same time, and stop when both searches can not improve the best meeting found.
+
+        :param startIndex: Start vertex index.
+        :param endIndex: End vertex index.
+        :param maxCost: Neither search goes beyond this cost.
+        :return: Cost of the shortest path, ``numpy.inf`` if there is no path (with a cost up to ``maxCost``).
+        """
+        graphs = (self.routingGraph, self.routingGraph.getReverseGraph())
+        costs = ({startIndex: 0.0}, {endIndex: 0.0})
+        queues = ([(0.0, startIndex)], [(0.0, endIndex)])
+        settled = (set(), set())
+        bestCost = 0.0 if startIndex == endIndex else np.inf
+
+        while queues[0] and queues[1] and queues[0][0][0] + queues[1][0][0] < bestCost:
+            direction = 0 if queues[0][0][0] <= queues[1][0][0] else 1
+            cost, vertex = heapq.heappop(queues[direction])
+            if vertex in settled[direction]:
+                continue
+            settled[direction].add(vertex)
+
+            graph = graphs[direction]
+            directionCosts = costs[direction]
+            otherCosts = costs[1 - direction]
+            for arcPosition in range(graph.indptr[vertex], graph.indptr[vertex + 1]):
+                head = graph.heads[arcPosition]
+                newCost = cost + graph.weights[arcPosition]
+                if newCost < directionCosts.get(head, np.inf) and newCost <= maxCost:
+                    directionCosts[head] = newCost
+                    heapq.heappush(queues[direction], (newCost, head))
+                    if head in otherCosts:
+                        bestCost = min(bestCost, newCost + otherCosts[head])
+
+        return bestCost if bestCost <= maxCost else np.inf
+
+    def calculateShortestPathTree(self, startIndex):
+        """
+        Run one Dijkstra from the start vertex keeping the predecessors, so that the path to any other vertex
+        can be extracted without searching again.
+
+        :param startIndex: Start vertex index.
+        :return: ShortestPathTree.
+        """
+        costs, predecessors = dijkstra(self.routingGraph.getSparseMatrix(), directed=True, indices=startIndex,
+                                       return_predecessors=True)
+        return ShortestPathTree(self.routingGraph, startIndex, costs, predecessors)
+
+    def calculateShortestPath(self, startIndex, endIndex):
+        """
+        :param startIndex: Start vertex index.
+        :param endIndex: End vertex index.
+        :return: Ordered list of the edge ids of the shortest path, empty if there is no path.
+        """
+        return self.calculateShortestPathTree(startIndex).getEdgeIds(endIndex)
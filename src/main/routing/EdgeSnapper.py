@@ -0,0 +1,195 @@
+import threading
+
+import numpy as np
+import shapely
+from shapely.ops import substring
+
+from src.main.util import getConfigurationProperties, getCRSUnitsPerMeter, dgl_timer, Logger
+
+
+class EdgeSnapper:
+    def __init__(self, edgeIds, sources, targets, geometries, transportMode=None, epsgCode=None):
+        """
+        Projection of the points onto their nearest routable edge, found with a single vectorized query over an
+        STRtree of the edge geometries. Every point gets the edge, the position along it (``edgeFraction``, 0 at the
+        source vertex and 1 at the target vertex) and the projected point, so that the cost from the point to both
+        edge vertices is a fraction of the edge cost instead of a walk to the nearest vertex.
+
+        :param edgeIds: Id of every routable edge.
+        :param sources: Source vertex id of every edge.
+        :param targets: Target vertex id of every edge.
+        :param geometries: Shapely LineString of every edge, in the CRS of the transport mode.
+        :param transportMode: PostGIS transport mode used to load the edge costs of every impedance.
+        :param epsgCode: CRS of the geometries, used to convert ``max_distance`` (``SNAPPING`` configuration section,
+        in meters) to its units at every point. If not given its units are meters.
+        """
+        self.edgeIds = np.asarray(edgeIds, dtype=np.int64)
+        self.sources = np.asarray(sources, dtype=np.int64)
+        self.targets = np.asarray(targets, dtype=np.int64)
+        self.geometries = np.asarray(geometries, dtype=object)
+        self.transportMode = transportMode
+        self.epsgCode = epsgCode
+        self.maxDistance = float(getConfigurationProperties(section="SNAPPING")["max_distance"])
+        self.tree = shapely.STRtree(self.geometries)
+        self.edgeOrder = np.argsort(self.edgeIds, kind="stable")
+        self.edgeCosts = {}
+        self.edgeCostsLock = threading.Lock()
+
+    @staticmethod
+    @dgl_timer
+    def fromTransportMode(transportMode):
+        """
+        Load the routable edges of the transport mode (``getRoutableEdgesSQL``).
+
+        :param transportMode: PostGIS transport mode (i.e. BicycleTransportMode) defining the table and the filters.
+        :return: New EdgeSnapper.
+        """
+        rows = transportMode.serviceProvider.executeReturningRows(transportMode.getRoutableEdgesSQL())
+        Logger.getInstance().info("Routable edges loaded: %s" % len(rows))
+        return EdgeSnapper(edgeIds=[row[0] for row in rows],
+                           sources=[row[1] for row in rows],
+                           targets=[row[2] for row in rows],
+                           geometries=shapely.from_wkb([bytes(row[3]) for row in rows]),
+                           transportMode=transportMode,
+                           epsgCode=transportMode.getEPSGCode())
+
+    @dgl_timer
+    def project(self, coordinates):
+        """
+        :param coordinates: (number of points x 2) coordinates, in the CRS of the transport mode.
+        :return: Ids of the edge vertex nearer to the projected point, projected coordinates and edge properties
+        (``edgeId``, ``edgeFraction``, ``sourceVertexId`` and ``targetVertexId``) of every point. The id is -1 (and
+        the properties None) if there is no routable edge within ``max_distance``.
+        """
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        vertexIds = np.full(len(coordinates), -1, dtype=np.int64)
+        projectedCoordinates = np.full((len(coordinates), 2), np.nan)
+        edgeProperties = [None] * len(coordinates)
+        if len(coordinates) == 0:
+            return vertexIds, projectedCoordinates, edgeProperties
+
+        maxDistances = np.full(len(coordinates), self.maxDistance)
+        if self.epsgCode is not None:
+            maxDistances *= getCRSUnitsPerMeter(coordinates, self.epsgCode)
+
+        # The tree takes a single bound, the points with a smaller bound are checked afterwards.
+        points = shapely.points(coordinates)
+        (pointIndexes, edgeIndexes), distances = self.tree.query_nearest(points, max_distance=maxDistances.max(),
+                                                                         return_distance=True, all_matches=False)
+        withinMaxDistance = distances <= maxDistances[pointIndexes]
+        pointIndexes = pointIndexes[withinMaxDistance]
+        edgeIndexes = edgeIndexes[withinMaxDistance]
+
+        edges = self.geometries[edgeIndexes]
+        fractions = shapely.line_locate_point(edges, points[pointIndexes], normalized=True)
+        projectedCoordinates[pointIndexes] = shapely.get_coordinates(
+            shapely.line_interpolate_point(edges, fractions, normalized=True))
+        vertexIds[pointIndexes] = np.where(fractions <= 0.5, self.sources[edgeIndexes], self.targets[edgeIndexes])
+
+        for pointIndex, edgeIndex, fraction in zip(pointIndexes.tolist(), edgeIndexes.tolist(), fractions.tolist()):
+            edgeProperties[pointIndex] = {
+                "edgeId": int(self.edgeIds[edgeIndex]),
+                "edgeFraction": fraction,
+                "sourceVertexId": int(self.sources[edgeIndex]),
+                "targetVertexId": int(self.targets[edgeIndex])
+            }
+
+        return vertexIds, projectedCoordinates, edgeProperties
+
+    def snap(self, coordinates):
+        """
+        :param coordinates: (number of points x 2) coordinates, in the CRS of the transport mode.
+        :return: Ids of the edge vertex nearer to the projected point, projected coordinates and distance from every
+        point to its nearest routable edge.
+        """
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        vertexIds, projectedCoordinates, _ = self.project(coordinates)
+        return vertexIds, projectedCoordinates, np.linalg.norm(coordinates - projectedCoordinates, axis=1)
+
+    def getEdgeCosts(self, costAttribute):
+        """
+        Retrieve the cost and reverse cost of every edge, the costs are read from the database only the first time.
+
+        :param costAttribute: Impedance/cost attribute.
+        :return: Dictionary of (cost, reverse cost) by edge id, negative or NaN if the direction is not routable.
+        """
+        with self.edgeCostsLock:
+            if costAttribute not in self.edgeCosts:
+                edges = np.array(self.transportMode.serviceProvider.executeReturningRows(
+                    self.transportMode.getRoutingEdgesSQL(costAttribute)), dtype=np.float64).reshape(-1, 5)
+                self.edgeCosts[costAttribute] = {
+                    int(edgeId): (cost, reverseCost) for edgeId, cost, reverseCost in zip(
+                        edges[:, 0].tolist(), edges[:, 3].tolist(), edges[:, 4].tolist())
+                }
+            return self.edgeCosts[costAttribute]
+
+    def getStartCandidates(self, properties, costAttribute):
+        """
+        :param properties: Properties of a projected start point.
+        :param costAttribute: Impedance/cost attribute.
+        :return: List of (vertex id, cost from the point to the vertex) along the projected edge.
+        """
+        cost, reverseCost = self.getEdgeCosts(costAttribute).get(properties["edgeId"], (np.nan, np.nan))
+        fraction = properties["edgeFraction"]
+        candidates = []
+        if cost >= 0:
+            candidates.append((properties["targetVertexId"], (1 - fraction) * cost))
+        if reverseCost >= 0:
+            candidates.append((properties["sourceVertexId"], fraction * reverseCost))
+        return candidates
+
+    def getEndCandidates(self, properties, costAttribute):
+        """
+        :param properties: Properties of a projected end point.
+        :param costAttribute: Impedance/cost attribute.
+        :return: List of (vertex id, cost from the vertex to the point) along the projected edge.
+        """
+        cost, reverseCost = self.getEdgeCosts(costAttribute).get(properties["edgeId"], (np.nan, np.nan))
+        fraction = properties["edgeFraction"]
+        candidates = []
+        if cost >= 0:
+            candidates.append((properties["sourceVertexId"], fraction * cost))
+        if reverseCost >= 0:
+            candidates.append((properties["targetVertexId"], (1 - fraction) * reverseCost))
+        return candidates
+
+    def getPartialEdgeFeature(self, edgeId, fromFraction, toFraction, cost, costAttribute):
+        """
+        :param edgeId: Projected edge.
+        :param fromFraction: Position along the edge where the partial edge starts.
+        :param toFraction: Position along the edge where the partial edge ends, lower than ``fromFraction`` if it is
+        travelled against the edge direction.
+        :param cost: Cost of the partial edge.
+        :param costAttribute: Impedance/cost attribute, the property keeping the cost.
+        :return: LineString feature of the part of the edge travelled between both positions.
+        """
+        position = self.edgeOrder[np.searchsorted(self.edgeIds, edgeId, sorter=self.edgeOrder)]
+        geometry = substring(self.geometries[position], fromFraction, toFraction, normalized=True)
+        return {
+            "type": "Feature",
+            "properties": {
+                "id": int(edgeId),
+                "edgeFraction": [fromFraction, toFraction],
+                costAttribute: cost
+            },
+            "geometry": {
+                "type": "LineString",
+                "coordinates": shapely.get_coordinates(geometry).tolist()
+            }
+        }
+
+    def getSameEdgeCost(self, startProperties, endProperties, costAttribute):
+        """
+        :return: Cost of going directly along the edge when both points are projected onto the same edge, None
+        otherwise.
+        """
+        if startProperties["edgeId"] != endProperties["edgeId"]:
+            return None
+
+        cost, reverseCost = self.getEdgeCosts(costAttribute).get(startProperties["edgeId"], (np.nan, np.nan))
+        difference = endProperties["edgeFraction"] - startProperties["edgeFraction"]
+        if difference >= 0 and cost >= 0:
+            return difference * cost
+        if difference <= 0 and reverseCost >= 0:
+            return -difference * reverseCost
+        return None
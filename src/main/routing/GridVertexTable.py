@@ -0,0 +1,150 @@
+import os
+
+import numpy as np
+
+
+class GridVertexTable:
+    def __init__(self, gridIds, vertexIds, selectedCoordinates, nearestCoordinates, euclideanDistances,
+                 coordinatesCRS, fingerprint, edgeIds=None, edgeFractions=None, sourceVertexIds=None,
+                 targetVertexIds=None):
+        """
+        Nearest routable vertex of every cell of the YKR grid, calculated once per transport mode with the
+        ``--grid_vertices`` command, so that the grid points are resolved by array lookups instead of snapping them.
+
+        :param gridIds: YKR_ID of every grid cell.
+        :param vertexIds: Nearest routable vertex of every grid cell.
+        :param selectedCoordinates: (number of cells x 2) coordinates of the cell centroids, in ``coordinatesCRS``.
+        :param nearestCoordinates: (number of cells x 2) coordinates of the nearest vertices, in ``coordinatesCRS``.
+        :param euclideanDistances: Euclidean distance (in meters) between every centroid and its nearest vertex.
+        :param coordinatesCRS: CRS of the coordinates, the one of the transport mode.
+        :param fingerprint: Fingerprint of the edges table when the table was calculated.
+        :param edgeIds: Optional edge onto which every grid cell was projected (EdgeSnapper), -1 for the cells
+        without it.
+        :param edgeFractions: Position of the projected point along the edge of every grid cell.
+        :param sourceVertexIds: Source vertex of the edge of every grid cell.
+        :param targetVertexIds: Target vertex of the edge of every grid cell.
+        """
+        self.gridIds = np.asarray(gridIds, dtype=np.int64)
+        self.vertexIds = np.asarray(vertexIds, dtype=np.int64)
+        self.selectedCoordinates = np.asarray(selectedCoordinates, dtype=np.float64).reshape(-1, 2)
+        self.nearestCoordinates = np.asarray(nearestCoordinates, dtype=np.float64).reshape(-1, 2)
+        self.euclideanDistances = np.asarray(euclideanDistances, dtype=np.float64)
+        self.coordinatesCRS = str(coordinatesCRS)
+        self.fingerprint = str(fingerprint)
+        cellCount = len(self.gridIds)
+        self.edgeIds = np.full(cellCount, -1, dtype=np.int64) if edgeIds is None else \
+            np.asarray(edgeIds, dtype=np.int64)
+        self.edgeFractions = np.full(cellCount, np.nan) if edgeFractions is None else \
+            np.asarray(edgeFractions, dtype=np.float64)
+        self.sourceVertexIds = np.full(cellCount, -1, dtype=np.int64) if sourceVertexIds is None else \
+            np.asarray(sourceVertexIds, dtype=np.int64)
+        self.targetVertexIds = np.full(cellCount, -1, dtype=np.int64) if targetVertexIds is None else \
+            np.asarray(targetVertexIds, dtype=np.int64)
+
+        # Position of every YKR_ID, the ids of the grid are dense enough to index them directly.
+        self.minGridId = int(self.gridIds.min()) if len(self.gridIds) > 0 else 0
+        maxGridId = int(self.gridIds.max()) if len(self.gridIds) > 0 else -1
+        self.positions = np.full(maxGridId - self.minGridId + 1, -1, dtype=np.int32)
+        self.positions[self.gridIds - self.minGridId] = np.arange(len(self.gridIds), dtype=np.int32)
+
+    @staticmethod
+    def fromFeatures(features, pointIdentifierKey, euclideanDistances, fingerprint):
+        """
+        :param features: Grid point features with the properties added by the snapping, including the edge
+        projection of the EdgeSnapper.
+        :param pointIdentifierKey: Property containing the YKR_ID.
+        :param euclideanDistances: Euclidean distance between every point and its nearest vertex.
+        :param fingerprint: Fingerprint of the edges table.
+        :return: New GridVertexTable.
+        """
+        return GridVertexTable(
+            gridIds=[feature["properties"][pointIdentifierKey] for feature in features],
+            vertexIds=[feature["properties"]["vertex_id"] for feature in features],
+            selectedCoordinates=[feature["properties"]["selectedPointCoordinates"] for feature in features],
+            nearestCoordinates=[feature["properties"]["nearestVertexCoordinates"] for feature in features],
+            euclideanDistances=euclideanDistances,
+            coordinatesCRS=features[0]["properties"]["coordinatesCRS"] if features else "",
+            fingerprint=fingerprint,
+            edgeIds=[feature["properties"].get("edgeId", -1) for feature in features],
+            edgeFractions=[feature["properties"].get("edgeFraction", np.nan) for feature in features],
+            sourceVertexIds=[feature["properties"].get("sourceVertexId", -1) for feature in features],
+            targetVertexIds=[feature["properties"].get("targetVertexId", -1) for feature in features]
+        )
+
+    @staticmethod
+    def getPath(transportMode, folder, snappingMode="vertex"):
+        """
+        :param transportMode: Transport mode of the table.
+        :param folder: Folder of the grid vertex tables.
+        :param snappingMode: Snapping mode used to build the table, see ``SnappingCache.getSnappingMode``.
+        :return: Path of the table of the transport mode and snapping mode.
+        """
+        return os.path.join(folder, "%s_%s_grid.npz" % (transportMode.getRoutableVerticesTableName(), snappingMode))
+
+    def getPosition(self, gridId):
+        """
+        :param gridId: YKR_ID.
+        :return: Position of the grid cell in the table arrays, -1 if the id is not part of the grid.
+        """
+        try:
+            position = int(gridId) - self.minGridId
+        except (TypeError, ValueError):
+            return -1
+        if position < 0 or position >= len(self.positions):
+            return -1
+        return int(self.positions[position])
+
+    def getProperties(self, position):
+        """
+        :param position: Position returned by ``getPosition``.
+        :return: Properties added to the point feature by the snapping.
+        """
+        properties = {
+            "vertex_id": int(self.vertexIds[position]),
+            "selectedPointCoordinates": self.selectedCoordinates[position].tolist(),
+            "nearestVertexCoordinates": self.nearestCoordinates[position].tolist(),
+            "coordinatesCRS": self.coordinatesCRS,
+            "euclideanDistanceToNearestVertex": float(self.euclideanDistances[position])
+        }
+        if self.edgeIds[position] >= 0:
+            properties["edgeId"] = int(self.edgeIds[position])
+            properties["edgeFraction"] = float(self.edgeFractions[position])
+            properties["sourceVertexId"] = int(self.sourceVertexIds[position])
+            properties["targetVertexId"] = int(self.targetVertexIds[position])
+        return properties
+
+    def save(self, path):
+        """
+        :param path: Path of the ``.npz`` file.
+        """
+        np.savez(path,
+                 gridIds=self.gridIds,
+                 vertexIds=self.vertexIds,
+                 selectedCoordinates=self.selectedCoordinates,
+                 nearestCoordinates=self.nearestCoordinates,
+                 euclideanDistances=self.euclideanDistances,
+                 coordinatesCRS=np.array(self.coordinatesCRS),
+                 fingerprint=np.array(self.fingerprint),
+                 edgeIds=self.edgeIds,
+                 edgeFractions=self.edgeFractions,
+                 sourceVertexIds=self.sourceVertexIds,
+                 targetVertexIds=self.targetVertexIds)
+
+    @staticmethod
+    def load(path):
+        """
+        :param path: Path of the ``.npz`` file written by ``save``.
+        :return: Stored GridVertexTable.
+        """
+        with np.load(path) as data:
+            return GridVertexTable(gridIds=data["gridIds"],
+                                   vertexIds=data["vertexIds"],
+                                   selectedCoordinates=data["selectedCoordinates"],
+                                   nearestCoordinates=data["nearestCoordinates"],
+                                   euclideanDistances=data["euclideanDistances"],
+                                   coordinatesCRS=data["coordinatesCRS"],
+                                   fingerprint=data["fingerprint"],
+                                   edgeIds=data["edgeIds"],
+                                   edgeFractions=data["edgeFractions"],
+                                   sourceVertexIds=data["sourceVertexIds"],
+                                   targetVertexIds=data["targetVertexIds"])
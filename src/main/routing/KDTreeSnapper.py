@@ -0,0 +1,68 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+from src.main.util import getConfigurationProperties, getCRSUnitsPerMeter, dgl_timer, Logger
+
+
+class KDTreeSnapper:
+    def __init__(self, vertexIds, coordinates, epsgCode=None):
+        """
+        Nearest routable vertex lookups over a KD-tree of the vertex coordinates, a whole set of points is snapped
+        with one vectorized query instead of one database query per point.
+
+        The lookups are limited to ``max_distance`` (``SNAPPING`` configuration section, in meters), converted to the
+        units of the CRS at every point (see ``getCRSUnitsPerMeter``).
+
+        :param vertexIds: Id of every routable vertex.
+        :param coordinates: (number of vertices x 2) coordinates of the vertices, in the CRS of the transport mode.
+        :param epsgCode: CRS of the coordinates, if not given its units are meters.
+        """
+        self.vertexIds = np.asarray(vertexIds, dtype=np.int64)
+        self.coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        self.epsgCode = epsgCode
+        self.maxDistance = float(getConfigurationProperties(section="SNAPPING")["max_distance"])
+        self.tree = cKDTree(self.coordinates)
+
+    @staticmethod
+    @dgl_timer
+    def fromTransportMode(transportMode, components=()):
+        """
+        Load the routable vertices of the transport mode (``getRoutableVerticesSQL``).
+
+        :param transportMode: PostGIS transport mode (i.e. BicycleTransportMode) defining the table and the filters.
+        :param components: StronglyConnectedComponents of the impedances, only the vertices of the largest component
+        of every one of them are kept.
+        :return: New KDTreeSnapper.
+        """
+        vertices = np.array(transportMode.serviceProvider.executeReturningRows(transportMode.getRoutableVerticesSQL()),
+                            dtype=np.float64).reshape(-1, 3)
+        for stronglyConnectedComponents in components:
+            vertices = vertices[np.isin(vertices[:, 0].astype(np.int64),
+                                        stronglyConnectedComponents.getLargestComponentVertexIds())]
+        Logger.getInstance().info("Routable vertices loaded: %s" % len(vertices))
+        return KDTreeSnapper(vertexIds=vertices[:, 0], coordinates=vertices[:, 1:],
+                             epsgCode=transportMode.getEPSGCode())
+
+    def snap(self, coordinates):
+        """
+        :param coordinates: (number of points x 2) coordinates, in the CRS of the transport mode.
+        :return: Ids, coordinates and distances of the nearest routable vertex of every point, the id is -1 (and the
+        coordinates and distance NaN) if there is no routable vertex within ``max_distance``.
+        """
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        if len(coordinates) == 0:
+            return np.empty(0, dtype=np.int64), np.empty((0, 2)), np.empty(0)
+
+        maxDistances = np.full(len(coordinates), self.maxDistance)
+        if self.epsgCode is not None:
+            maxDistances *= getCRSUnitsPerMeter(coordinates, self.epsgCode)
+
+        # The tree takes a single bound, the points with a smaller bound are checked afterwards. The missing neighbours
+        # get the index len(self.vertexIds).
+        distances, indexes = self.tree.query(coordinates, distance_upper_bound=maxDistances.max())
+        snapped = (indexes < len(self.vertexIds)) & (distances <= maxDistances)
+        indexes = np.where(snapped, indexes, 0)
+
+        vertexIds = np.where(snapped, self.vertexIds[indexes], -1)
+        vertexCoordinates = np.where(snapped[:, np.newaxis], self.coordinates[indexes], np.nan)
+        return vertexIds, vertexCoordinates, np.where(snapped, distances, np.nan)
@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+from scipy.sparse.csgraph import dijkstra
+
+from src.main.carRoutingExceptions import OutdatedNetworkException
+
+
+class Landmarks:
+    def __init__(self, landmarkIndexes, forwardCosts, backwardCosts, vertexIds, fingerprint=""):
+        """
+        Landmark distance tables used by the ALT (A*, Landmarks, Triangle inequality) heuristic.
+
+        :param landmarkIndexes: Vertex index of every landmark.
+        :param forwardCosts: (number of vertices x number of landmarks) cost from every landmark to every vertex.
+        :param backwardCosts: (number of vertices x number of landmarks) cost from every vertex to every landmark.
+        :param vertexIds: Vertex id of every vertex index of the routing graph the tables were built on.
+        :param fingerprint: Fingerprint of the network the tables were built on.
+        """
+        self.landmarkIndexes = landmarkIndexes
+        self.forwardCosts = forwardCosts
+        self.backwardCosts = backwardCosts
+        self.vertexIds = vertexIds
+        self.fingerprint = str(fingerprint)
+
+    @staticmethod
+    def select(routingGraph, landmarkCount=16, fingerprint=""):
+        """
+        Farthest landmark selection: every new landmark is the vertex with the highest cost to/from the landmarks
+        already selected, so that the landmarks end up in the border of the network.
+
+        :param routingGraph: RoutingGraph.
+        :param landmarkCount: Number of landmarks.
+        :param fingerprint: Fingerprint of the network of the routing graph.
+        :return: New Landmarks.
+        """
+        vertexCount = routingGraph.getVertexCount()
+        landmarkCount = min(landmarkCount, vertexCount)
+        matrix = routingGraph.getSparseMatrix()
+        reverseMatrix = routingGraph.getReverseGraph().getSparseMatrix()
+
+        random = np.random.RandomState(0)
+        landmarkIndexes = []
+        forwardCosts = []
+        backwardCosts = []
+        candidateCosts = dijkstra(matrix, directed=True, indices=random.randint(vertexCount))
+        for _ in range(landmarkCount):
+            candidateCosts = np.where(np.isfinite(candidateCosts), candidateCosts, -1)
+            candidateCosts[landmarkIndexes] = -1
+            if candidateCosts.max() > 0:
+                landmarkIndex = int(np.argmax(candidateCosts))
+            else:
+                # Disconnected part of the network, any vertex that is not a landmark yet.
+                landmarkIndex = int(random.choice(np.setdiff1d(np.arange(vertexCount), landmarkIndexes)))
+
+            landmarkIndexes.append(landmarkIndex)
+            forwardCosts.append(dijkstra(matrix, directed=True, indices=landmarkIndex))
+            backwardCosts.append(dijkstra(reverseMatrix, directed=True, indices=landmarkIndex))
+            candidateCosts = np.min(np.array(forwardCosts) + np.array(backwardCosts), axis=0)
+
+        return Landmarks(landmarkIndexes=np.array(landmarkIndexes, dtype=np.int64),
+                         forwardCosts=np.array(forwardCosts).reshape(-1, vertexCount).T.copy(),
+                         backwardCosts=np.array(backwardCosts).reshape(-1, vertexCount).T.copy(),
+                         vertexIds=routingGraph.vertexIds,
+                         fingerprint=fingerprint)
+
+    def getHeuristic(self, vertexIndex, endIndex):
+        """
+        Lower bound of the cost from ``vertexIndex`` to ``endIndex`` given by the triangle inequality:
+        ``d(v, t) >= d(L, t) - d(L, v)`` and ``d(v, t) >= d(v, L) - d(t, L)``.
+
+        :param vertexIndex: Vertex index.
+        :param endIndex: End vertex index.
+        :return: Lower bound, ``numpy.inf`` if the end vertex can not be reached from the vertex.
+        """
+        bounds = np.fmax(self.forwardCosts[endIndex] - self.forwardCosts[vertexIndex],
+                         self.backwardCosts[vertexIndex] - self.backwardCosts[endIndex])
+        # inf - inf (no information from that landmark) is NaN and ignored by fmax.
+        return np.fmax.reduce(bounds, initial=0.0)
+
+    def save(self, pathPrefix):
+        """
+        Store the landmark tables as ``.npy`` files: ``<pathPrefix>_landmarks.npy``, ``<pathPrefix>_forward.npy``
+        and ``<pathPrefix>_backward.npy``, along with the vertex ids and fingerprint of the network in
+        ``<pathPrefix>_network.npz``.
+
+        :param pathPrefix: Path and prefix of the files.
+        """
+        np.save(pathPrefix + "_landmarks.npy", self.landmarkIndexes)
+        np.save(pathPrefix + "_forward.npy", self.forwardCosts)
+        np.save(pathPrefix + "_backward.npy", self.backwardCosts)
+        np.savez(pathPrefix + "_network.npz", vertexIds=self.vertexIds, fingerprint=np.array(self.fingerprint))
+
+    @staticmethod
+    def exists(pathPrefix):
+        return all(os.path.exists(pathPrefix + suffix)
+                   for suffix in ("_landmarks.npy", "_forward.npy", "_backward.npy", "_network.npz"))
+
+    @staticmethod
+    def load(pathPrefix, routingGraph=None, fingerprint=None):
+        """
+        The tables are indexed by vertex index, so they can only be used with the routing graph they were built on.
+
+        :param pathPrefix: Path and prefix of the files stored with ``save``.
+        :param routingGraph: Current routing graph, its vertex ids must be the stored ones.
+        :param fingerprint: Current fingerprint of the network, it must be the stored one.
+        :return: Landmarks, the tables are memory-mapped.
+        """
+        with np.load(pathPrefix + "_network.npz") as data:
+            vertexIds = data["vertexIds"]
+            storedFingerprint = str(data["fingerprint"])
+
+        if (fingerprint is not None and storedFingerprint != str(fingerprint)) or \
+                (routingGraph is not None and not np.array_equal(vertexIds, routingGraph.vertexIds)):
+            raise OutdatedNetworkException("The landmarks %s were selected on a different network" % pathPrefix)
+
+        return Landmarks(landmarkIndexes=np.load(pathPrefix + "_landmarks.npy"),
+                         forwardCosts=np.load(pathPrefix + "_forward.npy", mmap_mode="r"),
+                         backwardCosts=np.load(pathPrefix + "_backward.npy", mmap_mode="r"),
+                         vertexIds=vertexIds,
+                         fingerprint=storedFingerprint)
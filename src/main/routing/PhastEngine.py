@@ -0,0 +1,119 @@
+import threading
+
+import numpy as np
+
+from src.main.routing.ContractionHierarchyEngine import ContractionHierarchyEngine
+
+
+class PhastEngine(ContractionHierarchyEngine):
+    def __init__(self, contractionHierarchy):
+        """
+        One-to-all costs over a ContractionHierarchy with PHAST: a small upward search from every start vertex followed
+        by a linear sweep of the downward arcs in descending rank order.
+
+        The sweep is executed level by level (the vertices of a level only depend on vertices of the previous levels),
+        so that every level is one NumPy operation for a whole block of start vertices. When only a subset of end
+        vertices is requested, the sweep is restricted to the vertices they depend on (RPHAST).
+
+        The shortest paths are calculated as in the ContractionHierarchyEngine.
+
+        :param contractionHierarchy: ContractionHierarchy built with ``ContractionHierarchy.contract``.
+        """
+        super(PhastEngine, self).__init__(contractionHierarchy)
+        self.sweepLevels = self.__createSweepLevels()
+        self.restrictedSweep = None
+        self.restrictedSweepLock = threading.Lock()
+
+    def __createSweepLevels(self):
+        """
+        Level 0 are the vertices without downward arcs, the level of any other vertex is one more than the highest
+        level of the vertices it is reached from.
+
+        :return: List with the vertex indexes of every level (starting from level 1).
+        """
+        downwardGraph = self.contractionHierarchy.downwardGraph
+        indptr = downwardGraph.indptr.tolist()
+        heads = downwardGraph.heads.tolist()
+
+        levels = [0] * downwardGraph.getVertexCount()
+        for vertex in np.argsort(-self.contractionHierarchy.ranks).tolist():
+            for arcPosition in range(indptr[vertex], indptr[vertex + 1]):
+                levels[vertex] = max(levels[vertex], levels[heads[arcPosition]] + 1)
+
+        levels = np.array(levels, dtype=np.int64)
+        order = np.argsort(levels, kind="stable")
+        levelStarts = np.searchsorted(levels[order], np.arange(1, levels.max(initial=0) + 2))
+        return [order[levelStarts[i]:levelStarts[i + 1]] for i in range(len(levelStarts) - 1)]
+
+    def getSweepLevels(self, endIndexes):
+        """
+        RPHAST target selection: keep only the vertices from where the end vertices can be reached going down in rank.
+        The selection of the last ``endIndexes`` is reused, i.e. by every block of start vertices of a cost summary.
+
+        :param endIndexes: End vertex indexes.
+        :return: Sweep levels restricted to the end vertices.
+        """
+        return self.getRestrictedSweep(endIndexes)[0]
+
+    def getRestrictedSweep(self, endIndexes):
+        """
+        :param endIndexes: End vertex indexes.
+        :return: Sweep levels restricted to the end vertices, indexes of the selected vertices and position of every
+        vertex among the selected ones (-1 if it is not selected).
+        """
+        endIndexes = np.asarray(endIndexes, dtype=np.int64)
+        with self.restrictedSweepLock:
+            if self.restrictedSweep is not None and np.array_equal(self.restrictedSweep[0], endIndexes):
+                return self.restrictedSweep[1]
+
+            downwardGraph = self.contractionHierarchy.downwardGraph
+            selected = np.zeros(downwardGraph.getVertexCount(), dtype=bool)
+            frontier = np.unique(endIndexes)
+            while len(frontier) > 0:
+                selected[frontier] = True
+                arcPositions, _ = downwardGraph.getArcPositions(frontier)
+                frontier = np.unique(downwardGraph.heads[arcPositions])
+                frontier = frontier[~selected[frontier]]
+
+            sweepLevels = [levelVertices[selected[levelVertices]] for levelVertices in self.sweepLevels]
+            selectedIndexes = np.flatnonzero(selected)
+            localIndexes = np.full(downwardGraph.getVertexCount(), -1, dtype=np.int64)
+            localIndexes[selectedIndexes] = np.arange(len(selectedIndexes))
+
+            self.restrictedSweep = (endIndexes, (sweepLevels, selectedIndexes, localIndexes))
+            return self.restrictedSweep[1]
+
+    def calculateCosts(self, startIndexes, endIndexes, maxCost=np.inf):
+        """
+        The cost matrix of the sweep only has a row per selected vertex (RPHAST), not per vertex of the graph.
+
+        :param startIndexes: Start vertex indexes, all of them are swept at once.
+        :param endIndexes: End vertex indexes.
+        :param maxCost: The upward searches are stopped at this cost, the pairs over it are reported as unreachable.
+        :return: (len(startIndexes) x len(endIndexes)) cost matrix, ``numpy.inf`` for the unreachable pairs.
+        """
+        downwardGraph = self.contractionHierarchy.downwardGraph
+        sweepLevels, selectedIndexes, localIndexes = self.getRestrictedSweep(endIndexes)
+        costs = np.full((len(selectedIndexes), len(startIndexes)), np.inf)
+
+        for column, startIndex in enumerate(startIndexes):
+            forwardCosts, _ = self._upwardSearch(self.contractionHierarchy.upwardGraph, startIndex, maxCost)
+            vertices = localIndexes[np.fromiter(forwardCosts.keys(), dtype=np.int64, count=len(forwardCosts))]
+            vertexCosts = np.fromiter(forwardCosts.values(), dtype=np.float64, count=len(forwardCosts))
+            # The vertices settled by the upward search outside the selection do not reach any end vertex.
+            costs[vertices[vertices >= 0], column] = vertexCosts[vertices >= 0]
+
+        if len(startIndexes) > 0:
+            for levelVertices in sweepLevels:
+                if len(levelVertices) == 0:
+                    continue
+                arcPositions, arcCounts = downwardGraph.getArcPositions(levelVertices)
+                arcCosts = costs[localIndexes[downwardGraph.heads[arcPositions]]] + \
+                    downwardGraph.weights[arcPositions, None]
+                arcStarts = np.cumsum(arcCounts) - arcCounts
+                levelRows = localIndexes[levelVertices]
+                costs[levelRows] = np.minimum(costs[levelRows], np.minimum.reduceat(arcCosts, arcStarts, axis=0))
+
+        costs = costs[localIndexes[np.asarray(endIndexes, dtype=np.int64)]].T
+        costs[costs > maxCost] = np.inf
+        return costs
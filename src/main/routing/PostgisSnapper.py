@@ -0,0 +1,122 @@
+import threading
+
+import numpy as np
+
+from src.main.util import getConfigurationProperties, getCRSUnitsPerMeter, dgl_timer, Logger
+
+
+class PostgisSnapper:
+    def __init__(self, transportMode):
+        """
+        Nearest routable vertex lookups of a whole set of points with a single query: the points are sent as a
+        VALUES list and every point gets its nearest routable vertex with a KNN ``LEFT JOIN LATERAL``.
+
+        When the routable vertices table of the transport mode has been created (``createRoutableVerticesTable``),
+        every lookup is a pure ``<->`` KNN over its GiST index, otherwise the vertices are filtered with the edges
+        table. Both lookups are limited to ``max_distance`` (``SNAPPING`` configuration section, in meters), converted
+        to the units of the network SRID at every point (see ``getCRSUnitsPerMeter``).
+
+        :param transportMode: PostGIS transport mode (i.e. BicycleTransportMode) defining the table and the filters.
+        """
+        self.transportMode = transportMode
+        self.serviceProvider = transportMode.serviceProvider
+        self.tableName = transportMode.tableName
+        self.maxDistance = float(getConfigurationProperties(section="SNAPPING")["max_distance"])
+        self.routableVerticesTable = None
+        self.routableVerticesTableLock = threading.Lock()
+
+    @dgl_timer
+    def createRoutableVerticesTable(self):
+        """
+        Store the routable vertices of the transport mode in their own table, with a GiST index over the geometry.
+        Run it again after the edges table changes.
+        """
+        routableVerticesTableName = self.transportMode.getRoutableVerticesTableName()
+        self.serviceProvider.executeStatements([
+            "DROP TABLE IF EXISTS %s" % routableVerticesTableName,
+            "CREATE TABLE %s AS "
+            "SELECT "
+            "v.id,"
+            "v.the_geom "
+            "FROM table_name_vertices_pgr AS v "
+            "WHERE v.id IN (SELECT id FROM (%s) AS routable)".replace("table_name", self.tableName) % (
+                routableVerticesTableName, self.transportMode.getRoutableVerticesSQL()),
+            "ALTER TABLE %s ADD PRIMARY KEY (id)" % routableVerticesTableName,
+            "CREATE INDEX %s_the_geom_idx ON %s USING GIST (the_geom)" % (routableVerticesTableName,
+                                                                          routableVerticesTableName),
+            "ANALYZE %s" % routableVerticesTableName
+        ])
+        Logger.getInstance().info("Routable vertices table created: %s" % routableVerticesTableName)
+
+    def hasRoutableVerticesTable(self):
+        """
+        :return: True if the routable vertices table of the transport mode exists, it is checked only once.
+        """
+        with self.routableVerticesTableLock:
+            if self.routableVerticesTable is None:
+                rows = self.serviceProvider.executeReturningRows(
+                    "SELECT to_regclass('%s') IS NOT NULL" % self.transportMode.getRoutableVerticesTableName())
+                self.routableVerticesTable = bool(rows[0][0])
+                if not self.routableVerticesTable:
+                    Logger.getInstance().warning(
+                        "Routable vertices table not found: %s, filtering the vertices with the edges table" % (
+                            self.transportMode.getRoutableVerticesTableName()))
+            return self.routableVerticesTable
+
+    def getNearestRoutableVerticesSQL(self, coordinates):
+        """
+        :param coordinates: List of [x, y] coordinates, in the CRS of the transport mode.
+        :return: SQL sentence retrieving the point index, id, x, y and distance of the nearest routable vertex of
+        every point within ``max_distance``.
+        """
+        epsgCode = self.transportMode.getEPSGCode()
+        maxDistances = self.maxDistance * getCRSUnitsPerMeter(coordinates, epsgCode)
+
+        if self.hasRoutableVerticesTable():
+            nearestVertexSQL = "SELECT " \
+                               "vertices.id, vertices.the_geom " \
+                               "FROM %s AS vertices " \
+                               "WHERE ST_DWithin(vertices.the_geom, p.geom, p.max_distance) " \
+                               "ORDER BY vertices.the_geom <-> p.geom " \
+                               "LIMIT 1" % self.transportMode.getRoutableVerticesTableName()
+        else:
+            nearestVertexSQL = "SELECT " \
+                               "vertices.id, vertices.the_geom " \
+                               "FROM table_name_vertices_pgr AS vertices " \
+                               "WHERE ST_DWithin(vertices.the_geom, p.geom, p.max_distance) " \
+                               "AND vertices.id IN (SELECT id FROM (%s) AS routable) " \
+                               "ORDER BY vertices.the_geom <-> p.geom " \
+                               "LIMIT 1".replace("table_name", self.tableName) % (
+                                   self.transportMode.getRoutableVerticesSQL())
+
+        return "SELECT " \
+               "p.point_index," \
+               "v.id," \
+               "ST_X(v.the_geom)," \
+               "ST_Y(v.the_geom)," \
+               "ST_Distance(v.the_geom, p.geom) " \
+               "FROM (" \
+               "SELECT point_index, ST_SetSRID(ST_MakePoint(x, y), %s) AS geom, max_distance " \
+               "FROM (VALUES %s) AS points(point_index, x, y, max_distance)) AS p " \
+               "LEFT JOIN LATERAL (%s) AS v ON true " \
+               "ORDER BY p.point_index" % (
+                   epsgCode.split(":")[1],
+                   ",".join("(%s,%s,%s,%s)" % (index, x, y, maxDistance)
+                            for index, ((x, y), maxDistance) in enumerate(zip(coordinates, maxDistances.tolist()))),
+                   nearestVertexSQL)
+
+    @dgl_timer
+    def snap(self, coordinates):
+        """
+        :param coordinates: (number of points x 2) coordinates, in the CRS of the transport mode.
+        :return: Ids, coordinates and distances of the nearest routable vertex of every point, the id is -1 (and the
+        coordinates NaN) if there is no routable vertex within ``max_distance``.
+        """
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        if len(coordinates) == 0:
+            return np.empty(0, dtype=np.int64), np.empty((0, 2)), np.empty(0)
+
+        rows = np.array(self.serviceProvider.executeReturningRows(
+            self.getNearestRoutableVerticesSQL(coordinates.tolist())), dtype=np.float64).reshape(-1, 5)
+        vertexIds = np.where(np.isnan(rows[:, 1]), -1, rows[:, 1]).astype(np.int64)
+        return vertexIds, rows[:, 2:4], rows[:, 4]
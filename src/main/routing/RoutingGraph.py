@@ -0,0 +1,224 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from src.main.util import Logger
+
+
+class RoutingGraph:
+    def __init__(self, vertexIds, indptr, heads, weights, edgeIds, coordinates=None):
+        """
+        Directed routing graph stored as Compressed Sparse Row (CSR) arrays.
+
+        The arcs leaving the vertex with index ``i`` are stored between ``indptr[i]`` and ``indptr[i + 1]``, sorted by
+        head vertex index. Parallel arcs are already reduced to the cheapest one.
+
+        :param vertexIds: Sorted pgRouting vertex ids, the position of each id is its vertex index.
+        :param indptr: CSR row pointers (length = number of vertices + 1).
+        :param heads: Head vertex index of each arc.
+        :param weights: Cost of each arc.
+        :param edgeIds: Id of the edge (row of the edges table) that originated each arc.
+        :param coordinates: Optional (number of vertices x 2) array with the vertices coordinates.
+        """
+        self.vertexIds = vertexIds
+        self.indptr = indptr
+        self.heads = heads
+        self.weights = weights
+        self.edgeIds = edgeIds
+        self.coordinates = coordinates
+        self.__sparseMatrix = None
+        self.__reverseGraph = None
+
+    @staticmethod
+    def fromEdges(edgeIds, sources, targets, costs, reverseCosts, vertexIds=None, coordinates=None):
+        """
+        Build the graph from the rows of a pgRouting edges query. As pgRouting does, a negative (or null) cost means
+        that the edge can not be traversed in that direction.
+
+        :param edgeIds: Edges id.
+        :param sources: Edges source vertex id.
+        :param targets: Edges target vertex id.
+        :param costs: Cost to go from source to target.
+        :param reverseCosts: Cost to go from target to source.
+        :param vertexIds: Optional list of vertex ids, e.g. all the rows from the table_name_vertices_pgr. The arcs
+        of the edges whose source or target is not in the list are dropped.
+        :param coordinates: Optional coordinates of the given ``vertexIds``.
+        :return: New RoutingGraph.
+        """
+        edgeIds = np.asarray(edgeIds, dtype=np.int64)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        costs = np.asarray(costs, dtype=np.float64)
+        reverseCosts = np.asarray(reverseCosts, dtype=np.float64)
+
+        if vertexIds is None:
+            vertexIds = np.unique(np.concatenate((sources, targets)))
+            coordinates = None
+        else:
+            vertexIds = np.asarray(vertexIds, dtype=np.int64)
+            order = np.argsort(vertexIds)
+            vertexIds = vertexIds[order]
+            if coordinates is not None:
+                coordinates = np.asarray(coordinates, dtype=np.float64)[order]
+
+        forward = costs >= 0  # NaN (null cost) comparisons are False too
+        backward = reverseCosts >= 0
+
+        tails = np.concatenate((sources[forward], targets[backward]))
+        heads = np.concatenate((targets[forward], sources[backward]))
+        weights = np.concatenate((costs[forward], reverseCosts[backward]))
+        arcEdgeIds = np.concatenate((edgeIds[forward], edgeIds[backward]))
+
+        tailIds = tails
+        headIds = heads
+        tails = np.minimum(np.searchsorted(vertexIds, tailIds), max(len(vertexIds) - 1, 0))
+        heads = np.minimum(np.searchsorted(vertexIds, headIds), max(len(vertexIds) - 1, 0))
+        if len(vertexIds) > 0:
+            known = (vertexIds[tails] == tailIds) & (vertexIds[heads] == headIds)
+        else:
+            known = np.zeros(len(tails), dtype=bool)
+        if not np.all(known):
+            # The given vertexIds do not contain every source/target, those arcs can not be indexed.
+            Logger.getInstance().warning("%s arcs dropped, their source or target vertex is not in the vertex ids" %
+                                         np.count_nonzero(~known))
+            tails = tails[known]
+            heads = heads[known]
+            weights = weights[known]
+            arcEdgeIds = arcEdgeIds[known]
+
+        return RoutingGraph.fromArcs(vertexIds, tails, heads, weights, arcEdgeIds, coordinates)
+
+    @staticmethod
+    def fromArcs(vertexIds, tails, heads, weights, edgeIds, coordinates=None):
+        """
+        Build the CSR arrays from a list of arcs given by vertex index.
+
+        :param vertexIds: Sorted vertex ids.
+        :param tails: Tail vertex index of each arc.
+        :param heads: Head vertex index of each arc.
+        :param weights: Cost of each arc.
+        :param edgeIds: Edge id of each arc.
+        :param coordinates: Optional vertices coordinates.
+        :return: New RoutingGraph.
+        """
+        order = np.lexsort((weights, heads, tails))
+        tails = tails[order]
+        heads = heads[order]
+        weights = weights[order]
+        edgeIds = edgeIds[order]
+
+        # After sorting, the first arc of every (tail, head) pair is the cheapest one.
+        firstOfPair = np.ones(len(tails), dtype=bool)
+        firstOfPair[1:] = (tails[1:] != tails[:-1]) | (heads[1:] != heads[:-1])
+        tails = tails[firstOfPair]
+
+        indptr = np.zeros(len(vertexIds) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tails, minlength=len(vertexIds)), out=indptr[1:])
+
+        return RoutingGraph(vertexIds=vertexIds,
+                            indptr=indptr,
+                            heads=heads[firstOfPair],
+                            weights=weights[firstOfPair],
+                            edgeIds=edgeIds[firstOfPair],
+                            coordinates=coordinates)
+
+    def getVertexCount(self):
+        return len(self.vertexIds)
+
+    def getArcCount(self):
+        return len(self.heads)
+
+    def getVertexIndexes(self, vertexIds):
+        """
+        Translate pgRouting vertex ids into vertex indexes.
+
+        :param vertexIds: Vertex ids.
+        :return: Array of vertex indexes, -1 for the ids that are not part of the graph.
+        """
+        vertexIds = np.asarray(vertexIds, dtype=np.int64)
+        indexes = np.searchsorted(self.vertexIds, vertexIds)
+        indexes[indexes >= len(self.vertexIds)] = 0
+        found = self.vertexIds[indexes] == vertexIds if len(self.vertexIds) > 0 else np.zeros(len(indexes), bool)
+        return np.where(found, indexes, -1)
+
+    def getArcPosition(self, tailIndex, headIndex):
+        """
+        :param tailIndex: Tail vertex index.
+        :param headIndex: Head vertex index.
+        :return: Position of the arc (tail, head) in the CSR arrays or -1 if the arc does not exist.
+        """
+        start = self.indptr[tailIndex]
+        end = self.indptr[tailIndex + 1]
+        position = start + np.searchsorted(self.heads[start:end], headIndex)
+        if position < end and self.heads[position] == headIndex:
+            return position
+        return -1
+
+    def getArcPositions(self, tailIndexes):
+        """
+        :param tailIndexes: Tail vertex indexes.
+        :return: Positions in the CSR arrays of all the arcs leaving the given vertices (grouped by tail, in the same
+        order) and the number of arcs of every tail.
+        """
+        tailIndexes = np.asarray(tailIndexes, dtype=np.int64)
+        counts = self.indptr[tailIndexes + 1] - self.indptr[tailIndexes]
+        offsets = np.repeat(self.indptr[tailIndexes] - np.cumsum(counts) + counts, counts)
+        return offsets + np.arange(counts.sum()), counts
+
+    def getSparseMatrix(self):
+        """
+        :return: The graph as a scipy sparse matrix, explicit zeros are kept as zero cost arcs.
+        """
+        if self.__sparseMatrix is None:
+            self.__sparseMatrix = csr_matrix((self.weights, self.heads, self.indptr),
+                                             shape=(self.getVertexCount(), self.getVertexCount()))
+        return self.__sparseMatrix
+
+    def save(self, pathPrefix, reversePathPrefix=None):
+        """
+        Store the CSR arrays as ``.npy`` files, so that other processes can memory-map the graph instead of copying
+        it. The indexes are stored with the scipy index type (int32) when possible, so that scipy does not copy them.
+
+        :param pathPrefix: Path and prefix of the files.
+        :param reversePathPrefix: Optional path and prefix to store the reverse graph as well, so that the processes
+        that load it do not build their own copy of the reverse arcs.
+        """
+        indexType = np.int32 if self.getArcCount() < np.iinfo(np.int32).max else np.int64
+        np.save(pathPrefix + "_vertex_ids.npy", self.vertexIds)
+        np.save(pathPrefix + "_indptr.npy", self.indptr.astype(indexType))
+        np.save(pathPrefix + "_heads.npy", self.heads.astype(indexType))
+        np.save(pathPrefix + "_weights.npy", self.weights.astype(np.float64))
+        np.save(pathPrefix + "_edge_ids.npy", self.edgeIds)
+        if reversePathPrefix is not None:
+            self.getReverseGraph().save(reversePathPrefix)
+
+    @staticmethod
+    def load(pathPrefix, mmapMode="r", reversePathPrefix=None):
+        """
+        :param pathPrefix: Path and prefix of the files stored with ``save``.
+        :param mmapMode: ``numpy.load`` memory-map mode, None to read the arrays into memory.
+        :param reversePathPrefix: Optional path and prefix of the stored reverse graph, it is loaded the same way and
+        returned by ``getReverseGraph``.
+        :return: RoutingGraph without coordinates.
+        """
+        routingGraph = RoutingGraph(vertexIds=np.load(pathPrefix + "_vertex_ids.npy", mmap_mode=mmapMode),
+                                    indptr=np.load(pathPrefix + "_indptr.npy", mmap_mode=mmapMode),
+                                    heads=np.load(pathPrefix + "_heads.npy", mmap_mode=mmapMode),
+                                    weights=np.load(pathPrefix + "_weights.npy", mmap_mode=mmapMode),
+                                    edgeIds=np.load(pathPrefix + "_edge_ids.npy", mmap_mode=mmapMode))
+        if reversePathPrefix is not None:
+            reverseGraph = RoutingGraph.load(reversePathPrefix, mmapMode)
+            reverseGraph.__reverseGraph = routingGraph
+            routingGraph.__reverseGraph = reverseGraph
+        return routingGraph
+
+    def getReverseGraph(self):
+        """
+        Graph with all the arcs reversed, used to search backwards from the target vertices.
+
+        :return: Reversed RoutingGraph sharing the same vertex indexes.
+        """
+        if self.__reverseGraph is None:
+            tails = np.repeat(np.arange(self.getVertexCount(), dtype=np.int64), np.diff(self.indptr))
+            self.__reverseGraph = RoutingGraph.fromArcs(self.vertexIds, self.heads, tails, self.weights,
+                                                        self.edgeIds, self.coordinates)
+        return self.__reverseGraph
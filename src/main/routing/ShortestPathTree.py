@@ -0,0 +1,45 @@
+import numpy as np
+
+
+class ShortestPathTree:
+    def __init__(self, routingGraph, startIndex, costs, predecessors):
+        """
+        Result of a one-to-all search, every shortest path from ``startIndex`` can be read from it.
+
+        :param routingGraph: Graph where the search was executed.
+        :param startIndex: Start vertex index (root of the tree).
+        :param costs: Cost from the root to every vertex, ``numpy.inf`` if the vertex is unreachable.
+        :param predecessors: Previous vertex index in the path from the root, negative for the root and the
+        unreachable vertices.
+        """
+        self.routingGraph = routingGraph
+        self.startIndex = startIndex
+        self.costs = costs
+        self.predecessors = predecessors
+
+    def getStartVertexId(self):
+        return self.routingGraph.vertexIds[self.startIndex]
+
+    def getCost(self, endIndex):
+        return self.costs[endIndex]
+
+    def getEdgeIds(self, endIndex):
+        """
+        Walk the tree backwards from ``endIndex`` to the root.
+
+        :param endIndex: End vertex index.
+        :return: Ordered list of the edge ids from the root to ``endIndex``, empty if it is unreachable.
+        """
+        if endIndex < 0 or not np.isfinite(self.costs[endIndex]):
+            return []
+
+        edgeIds = []
+        currentIndex = endIndex
+        while currentIndex != self.startIndex:
+            previousIndex = self.predecessors[currentIndex]
+            arcPosition = self.routingGraph.getArcPosition(previousIndex, currentIndex)
+            edgeIds.append(int(self.routingGraph.edgeIds[arcPosition]))
+            currentIndex = previousIndex
+
+        edgeIds.reverse()
+        return edgeIds
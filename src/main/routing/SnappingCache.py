@@ -0,0 +1,155 @@
+import os
+import sqlite3
+import threading
+
+from src.main.util import dgl_timer, Logger
+
+
+class SnappingCache:
+    def __init__(self, path, fingerprint):
+        """
+        SQLite file keeping the nearest routable vertex of every point already snapped, so that the next executions
+        over the same points (i.e. the YKR grid centroids) skip the snapping.
+
+        The rows are stored with the fingerprint of the network, the rows of any other fingerprint are deleted when
+        the cache is opened. The points snapped with the EdgeSnapper keep their edge projection as well
+        (``edgeId``, ``edgeFraction``, ``sourceVertexId`` and ``targetVertexId``).
+
+        :param path: Path of the SQLite file.
+        :param fingerprint: Fingerprint of the edges table, see ``getFingerprintSQL``.
+        """
+        self.path = path
+        self.fingerprint = fingerprint
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS snapped_points ("
+                                    "fingerprint TEXT, "
+                                    "point_id TEXT, "
+                                    "x REAL, "
+                                    "y REAL, "
+                                    "epsg_code TEXT, "
+                                    "vertex_id INTEGER, "
+                                    "selected_x REAL, "
+                                    "selected_y REAL, "
+                                    "nearest_x REAL, "
+                                    "nearest_y REAL, "
+                                    "coordinates_crs TEXT, "
+                                    "edge_id INTEGER, "
+                                    "edge_fraction REAL, "
+                                    "source_vertex_id INTEGER, "
+                                    "target_vertex_id INTEGER, "
+                                    "PRIMARY KEY (fingerprint, point_id, x, y, epsg_code))")
+            deleted = self.connection.execute("DELETE FROM snapped_points WHERE fingerprint <> ?",
+                                              (fingerprint,)).rowcount
+            self.connection.commit()
+        if deleted > 0:
+            Logger.getInstance().info("The network changed, %s snapped points removed from %s" % (deleted, path))
+
+    @staticmethod
+    def getFingerprintSQL(transportMode):
+        """
+        :param transportMode: PostGIS transport mode (i.e. BicycleTransportMode) defining the table.
+        :return: SQL sentence retrieving the row count, max id and a checksum of the topology of the edges table.
+        """
+        return "SELECT " \
+               "count(*)," \
+               "max(id)," \
+               "sum(hashtext(id || ':' || source || ':' || target)) " \
+               "FROM table_name".replace("table_name", transportMode.tableName)
+
+    @staticmethod
+    def getFingerprint(transportMode):
+        """
+        :param transportMode: PostGIS transport mode (i.e. BicycleTransportMode) defining the table.
+        :return: Fingerprint of the current edges table.
+        """
+        rows = transportMode.serviceProvider.executeReturningRows(SnappingCache.getFingerprintSQL(transportMode))
+        return "_".join(map(str, rows[0]))
+
+    @staticmethod
+    def getSnappingMode(snapper, stronglyConnected=False):
+        """
+        :param snapper: Snapper of the execution (i.e. KDTreeSnapper), None for the nearest vertex queries.
+        :param stronglyConnected: True if the vertices are restricted to the largest strongly connected components.
+        :return: Name of the snapping mode, the points snapped in different modes are not interchangeable.
+        """
+        snappingMode = "vertex" if snapper is None else type(snapper).__name__.replace("Snapper", "").lower()
+        if stronglyConnected:
+            snappingMode += "_scc"
+        return snappingMode
+
+    @staticmethod
+    @dgl_timer
+    def fromTransportMode(transportMode, cacheFolder, snappingMode="vertex"):
+        """
+        :param transportMode: PostGIS transport mode (i.e. BicycleTransportMode) defining the table and the filters.
+        :param cacheFolder: Folder of the SQLite files, one per transport mode and snapping mode.
+        :param snappingMode: Snapping mode, see ``getSnappingMode``.
+        :return: SnappingCache of the current network of the transport mode.
+        """
+        fingerprint = SnappingCache.getFingerprint(transportMode)
+
+        if not os.path.exists(cacheFolder):
+            os.makedirs(cacheFolder)
+        path = os.path.join(cacheFolder, "%s_%s_snapping.sqlite" % (transportMode.getRoutableVerticesTableName(),
+                                                                     snappingMode))
+        return SnappingCache(path, fingerprint)
+
+    def get(self, pointId, coordinates, epsgCode):
+        """
+        :param pointId: Point identifier.
+        :param coordinates: Original coordinates of the point.
+        :param epsgCode: CRS of the coordinates.
+        :return: Vertex id and the properties added to the point feature when it was snapped, None if the point is
+        not in the cache.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT vertex_id, selected_x, selected_y, nearest_x, nearest_y, coordinates_crs, "
+                "edge_id, edge_fraction, source_vertex_id, target_vertex_id "
+                "FROM snapped_points "
+                "WHERE fingerprint = ? AND point_id = ? AND x = ? AND y = ? AND epsg_code = ?",
+                (self.fingerprint, str(pointId), coordinates[0], coordinates[1], epsgCode)).fetchone()
+
+        if row is None:
+            return None
+
+        properties = {
+            "vertex_id": row[0],
+            "selectedPointCoordinates": [row[1], row[2]],
+            "nearestVertexCoordinates": [row[3], row[4]],
+            "coordinatesCRS": row[5]
+        }
+        if row[6] is not None:
+            properties["edgeId"] = row[6]
+            properties["edgeFraction"] = row[7]
+            properties["sourceVertexId"] = row[8]
+            properties["targetVertexId"] = row[9]
+        return row[0], properties
+
+    def put(self, features, pointIdentifierKey, epsgCode):
+        """
+        Store the snapping of the given features, the points without a routable vertex (vertex id -1) are skipped.
+
+        :param features: Point features with the properties added by the snapping.
+        :param pointIdentifierKey: Property identifying the points.
+        :param epsgCode: CRS of the original coordinates.
+        """
+        rows = []
+        for feature in features:
+            properties = feature["properties"]
+            if not properties["vertex_id"] >= 0:
+                continue
+            coordinates = feature["geometry"]["coordinates"]
+            rows.append((self.fingerprint, str(properties[pointIdentifierKey]), coordinates[0], coordinates[1],
+                         epsgCode, properties["vertex_id"],
+                         properties["selectedPointCoordinates"][0], properties["selectedPointCoordinates"][1],
+                         properties["nearestVertexCoordinates"][0], properties["nearestVertexCoordinates"][1],
+                         properties["coordinatesCRS"], properties.get("edgeId"), properties.get("edgeFraction"),
+                         properties.get("sourceVertexId"), properties.get("targetVertexId")))
+
+        with self.lock:
+            self.connection.executemany("INSERT OR REPLACE INTO snapped_points "
+                                        "VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)", rows)
+            self.connection.commit()
@@ -0,0 +1,81 @@
+import numpy as np
+from scipy.sparse.csgraph import connected_components
+
+from src.main.routing.RoutingGraph import RoutingGraph
+from src.main.util import dgl_timer, Logger
+
+
+class StronglyConnectedComponents:
+    def __init__(self, vertexIds, labels):
+        """
+        Strongly connected components of the directed routing graph of one impedance: every vertex reaches (and is
+        reached from) all the vertices of its own component only, so the pairs of vertices of different components
+        are unreachable without running any search.
+
+        :param vertexIds: Sorted vertex ids.
+        :param labels: Component of every vertex.
+        """
+        self.vertexIds = np.asarray(vertexIds, dtype=np.int64)
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.largestLabel = int(np.argmax(np.bincount(self.labels))) if len(self.labels) > 0 else -1
+
+    @staticmethod
+    def fromRoutingGraph(routingGraph):
+        """
+        :param routingGraph: RoutingGraph of the impedance.
+        :return: New StronglyConnectedComponents.
+        """
+        _, labels = connected_components(routingGraph.getSparseMatrix(), directed=True, connection="strong")
+        return StronglyConnectedComponents(routingGraph.vertexIds, labels)
+
+    @staticmethod
+    @dgl_timer
+    def fromTransportMode(transportMode, costAttribute):
+        """
+        Load the routable edges of the transport mode (``getRoutingEdgesSQL``) and label their vertices.
+
+        :param transportMode: PostGIS transport mode (i.e. BicycleTransportMode) defining the table and the filters.
+        :param costAttribute: Impedance/cost attribute, the arcs with a negative or null cost are not traversable.
+        :return: New StronglyConnectedComponents.
+        """
+        edges = np.array(transportMode.serviceProvider.executeReturningRows(
+            transportMode.getRoutingEdgesSQL(costAttribute)), dtype=np.float64).reshape(-1, 5)
+        routingGraph = RoutingGraph.fromEdges(edgeIds=edges[:, 0],
+                                              sources=edges[:, 1],
+                                              targets=edges[:, 2],
+                                              costs=edges[:, 3],
+                                              reverseCosts=edges[:, 4])
+        components = StronglyConnectedComponents.fromRoutingGraph(routingGraph)
+        Logger.getInstance().info("%s: %s strongly connected components, %s of %s vertices in the largest one" % (
+            costAttribute, components.getComponentCount(), len(components.getLargestComponentVertexIds()),
+            len(components.vertexIds)))
+        return components
+
+    def getComponentCount(self):
+        return len(np.unique(self.labels))
+
+    def getComponentIds(self, vertexIds):
+        """
+        :param vertexIds: Vertex ids.
+        :return: Component of every vertex, -1 for the vertices that are not part of the routing graph.
+        """
+        vertexIds = np.asarray(vertexIds, dtype=np.int64).reshape(-1)
+        if len(self.vertexIds) == 0:
+            return np.full(len(vertexIds), -1, dtype=np.int64)
+
+        positions = np.minimum(np.searchsorted(self.vertexIds, vertexIds), len(self.vertexIds) - 1)
+        found = self.vertexIds[positions] == vertexIds
+        return np.where(found, self.labels[positions], -1)
+
+    def getLargestComponentVertexIds(self):
+        """
+        :return: Vertex ids of the component with more vertices.
+        """
+        return self.vertexIds[self.labels == self.largestLabel]
+
+    def isReachable(self, startVertexId, endVertexId):
+        """
+        :return: True if both vertices belong to the same component.
+        """
+        startComponent, endComponent = self.getComponentIds([startVertexId, endVertexId])
+        return startComponent >= 0 and startComponent == endComponent
@@ -8,6 +8,12 @@ class AbstractTransportMode:
     def getShortestPath(self, startVertexId, endVertexId, cost):
         raise NotImplementedError("Should have implemented this")
 
+    def getShortestPathTree(self, startVertexId, cost):
+        raise NotImplementedError("Should have implemented this")
+
+    def getShortestPathFromTree(self, shortestPathTree, endVertexId):
+        raise NotImplementedError("Should have implemented this")
+
     def getTotalShortestPathCostOneToOne(self, startVertexID, endVertexID, costAttribute):
         raise NotImplementedError("Should have implemented this")
 
@@ -18,4 +24,19 @@ class AbstractTransportMode:
         raise NotImplementedError("Should have implemented this")
 
     def getTotalShortestPathCostManyToMany(self, startVerticesID=[], endVerticesID=[], costAttribute=None):
+        raise NotImplementedError("Should have implemented this")
+
+    def getRoutingEdgesSQL(self, costAttribute):
+        raise NotImplementedError("Should have implemented this")
+
+    def getRoutingEdgesAttributesSQL(self):
+        raise NotImplementedError("Should have implemented this")
+
+    def getRoutableVerticesSQL(self):
+        raise NotImplementedError("Should have implemented this")
+
+    def getRoutableEdgesSQL(self):
+        raise NotImplementedError("Should have implemented this")
+
+    def getRoutableVerticesTableName(self):
         raise NotImplementedError("Should have implemented this")
\ No newline at end of file
@@ -0,0 +1,66 @@
+import os
+
+from src.main.carRoutingExceptions import OutdatedNetworkException
+from src.main.routing.AltEngine import AltEngine
+from src.main.routing.Landmarks import Landmarks
+from src.main.transportMode.InMemoryTransportMode import InMemoryTransportMode
+from src.main.util import getConfigurationProperties, dgl_timer, Logger
+
+
+class AltTransportMode(InMemoryTransportMode):
+    def __init__(self, transportMode, processes=False, maxCost=None):
+        """
+        In-memory transport mode calculating every route with A* and the landmarks lower bounds (ALT).
+
+        The landmark tables are built offline with the ``--landmarks`` command and stored as ``.npy`` files in the
+        ``graphs_folder`` of the ``IN_MEMORY_ROUTING`` configuration section. The landmarks selected on a different
+        network (the edges table or its costs changed) are selected again.
+
+        :param transportMode: PostGIS transport mode (i.e. PrivateCarTransportMode) defining the table and the filters.
+        :param processes: See InMemoryTransportMode.
+        :param maxCost: See InMemoryTransportMode.
+        """
+        super(AltTransportMode, self).__init__(transportMode, processes, maxCost)
+        self.graphsFolder = getConfigurationProperties(section="IN_MEMORY_ROUTING")["graphs_folder"]
+
+    def getLandmarksPathPrefix(self, costAttribute):
+        return os.path.join(self.graphsFolder, "%s_%s" % (self.tableName, costAttribute))
+
+    def createRoutingEngine(self, costAttribute):
+        routingGraph = self.getRoutingGraph(costAttribute)
+        fingerprint = self.getNetworkFingerprint(costAttribute)
+        landmarksPathPrefix = self.getLandmarksPathPrefix(costAttribute)
+        landmarks = None
+        if not Landmarks.exists(landmarksPathPrefix):
+            Logger.getInstance().warning(
+                "Landmarks not found: %s, selecting the landmarks..." % landmarksPathPrefix)
+        else:
+            try:
+                landmarks = Landmarks.load(landmarksPathPrefix, routingGraph, fingerprint)
+            except OutdatedNetworkException as e:
+                Logger.getInstance().warning("%s, selecting the landmarks again..." % e)
+
+        if landmarks is None:
+            landmarks = self.selectLandmarks(costAttribute, fingerprint)
+
+        return AltEngine(routingGraph, landmarks, bidirectionalMaxPairs=self.bidirectionalMaxPairs)
+
+    @dgl_timer
+    def selectLandmarks(self, costAttribute, fingerprint=None):
+        """
+        Select the landmarks of the given impedance/cost attribute and store their cost tables in the
+        ``graphs_folder``.
+
+        :param costAttribute: Impedance/cost to measure the weight of the route.
+        :param fingerprint: Current fingerprint of the network, queried if not given.
+        :return: Landmarks.
+        """
+        if fingerprint is None:
+            fingerprint = self.getNetworkFingerprint(costAttribute)
+        landmarks = Landmarks.select(self.getRoutingGraph(costAttribute), fingerprint=fingerprint)
+
+        if not os.path.exists(self.graphsFolder):
+            os.makedirs(self.graphsFolder)
+        landmarks.save(self.getLandmarksPathPrefix(costAttribute))
+
+        return landmarks
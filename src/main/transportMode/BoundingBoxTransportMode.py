@@ -0,0 +1,232 @@
+import numpy as np
+from joblib import Parallel, delayed
+
+from src.main.transportMode.AbstractTransportMode import AbstractTransportMode
+from src.main.util import getConfigurationProperties, dgl_timer, parallel_job_print, Logger, GPD_CRS
+
+
+class BoundingBoxTransportMode(AbstractTransportMode):
+    def __init__(self, transportMode, stronglyConnectedComponents=None):
+        """
+        Restrict the edges given to pgRouting to the bounding box of the requested vertices, expanded by ``buffer``
+        (``BOUNDING_BOX_ROUTING`` configuration section), so that pgRouting does not build the whole regional network
+        for every query.
+
+        When a route or any pair of the cost summary is not found inside the box, the buffer is doubled and the query
+        is executed again, up to ``max_retries`` times, and finally with the whole network. The pairs of vertices of
+        different strongly connected components are unreachable in the whole network too, so they are not waited for.
+        Without the components every unreachable pair makes its block run all the retries.
+
+        A path found inside the box is accepted even if the shortest path of the whole network leaves the box, so the
+        costs can be overestimated when the buffer is smaller than the detours of the network (i.e. around bays or
+        along motorways).
+
+        :param transportMode: PostGIS transport mode (i.e. BicycleTransportMode) defining the table and the filters.
+        :param stronglyConnectedComponents: StronglyConnectedComponents by impedance/cost attribute.
+        """
+        self.transportMode = transportMode
+        self.stronglyConnectedComponents = stronglyConnectedComponents if stronglyConnectedComponents else {}
+        self.serviceProvider = transportMode.serviceProvider
+        self.tableName = transportMode.tableName
+        config = getConfigurationProperties(section="BOUNDING_BOX_ROUTING")
+        self.buffer = float(config["buffer"])
+        self.maxRetries = int(config["max_retries"])
+
+    def getNearestVertexFromAPoint(self, coordinates):
+        return self.transportMode.getNearestVertexFromAPoint(coordinates)
+
+    def getNearestRoutableVertexFromAPoint(self, coordinates, radius=500):
+        return self.transportMode.getNearestRoutableVertexFromAPoint(coordinates, radius)
+
+    def getBoundingBoxEdgesSQL(self, costAttribute, verticesID, buffer):
+        """
+        :param costAttribute: Impedance/cost to measure the weight of the route.
+        :param verticesID: Vertices that must be contained into the bounding box.
+        :param buffer: Distance (in the units of the table SRID) to expand the bounding box.
+        :return: Edges query of the transport mode, only with the edges intersecting the expanded bounding box.
+        """
+        return self.transportMode.getRoutingEdgesSQL(costAttribute) + \
+               " WHERE the_geom && (" \
+               "SELECT ST_Expand(ST_Extent(v.the_geom), %s) " \
+               "FROM table_name_vertices_pgr AS v " \
+               "WHERE v.id IN (%s))".replace("table_name", self.tableName) % (
+                   buffer, ",".join(map(str, verticesID)))
+
+    def executeInBoundingBox(self, createSQL, costAttribute, verticesID, expectedFeatures):
+        """
+        Execute the query with a growing bounding box until it retrieves the expected number of features.
+
+        :param createSQL: Function creating the query from a given edges query.
+        :param costAttribute: Impedance/cost to measure the weight of the route.
+        :param verticesID: Vertices that must be contained into the bounding box.
+        :param expectedFeatures: Number of features of a complete result.
+        :return: Geojson.
+        """
+        buffer = self.buffer
+        for retry in range(self.maxRetries + 1):
+            geojson = self.serviceProvider.execute(
+                createSQL(self.getBoundingBoxEdgesSQL(costAttribute, verticesID, buffer)))
+            if len(geojson["features"]) >= expectedFeatures:
+                return geojson
+
+            Logger.getInstance().info("Incomplete result with a buffer of %s, retrying with %s" % (buffer, buffer * 2))
+            buffer = buffer * 2
+
+        Logger.getInstance().warning("Incomplete result inside the bounding box, using the whole network")
+        return self.serviceProvider.execute(createSQL(self.transportMode.getRoutingEdgesSQL(costAttribute)))
+
+    def getShortestPath(self, startVertexId, endVertexId, cost):
+        """
+        From a pair of vertices (startVertexId, endVertexId) and based on the "cost" attribute,
+        retrieve the shortest path with pgr_dijkstra over the edges of the bounding box of both vertices.
+
+        :param startVertexId: Start vertex from the requested path.
+        :param endVertexId: End vertex from the requested path.
+        :param cost: Attribute to calculate the cost of the shortest path
+        :return: Geojson (Geometry type: LineString) containing the segment features of the shortest path.
+        """
+
+        def createSQL(edgesSQL):
+            return "SELECT " \
+                   "r.seq AS seq, " \
+                   "a.* " \
+                   "FROM " \
+                   "pgr_dijkstra('%s', %s, %s, true, true) AS r, " \
+                   "(%s) AS a " \
+                   "WHERE " \
+                   "r.id2 = a.id " \
+                   "ORDER BY r.seq" % (edgesSQL, startVertexId, endVertexId,
+                                       self.transportMode.getRoutingEdgesAttributesSQL())
+
+        return self.executeInBoundingBox(createSQL, cost, [startVertexId, endVertexId],
+                                         self.getReachablePairCount([startVertexId], [endVertexId], cost))
+
+    def getTotalShortestPathCostOneToOne(self, startVertexID, endVertexID, costAttribute):
+        Logger.getInstance().info("Start getTotalShortestPathCostOneToOne")
+        geojson = self.calculateCostSummary([startVertexID], [endVertexID], costAttribute)
+        Logger.getInstance().info("End getTotalShortestPathCostOneToOne")
+        return geojson
+
+    def getTotalShortestPathCostManyToOne(self, startVerticesID=[], endVertexID=None, costAttribute=None):
+        Logger.getInstance().info("Start getTotalShortestPathCostManyToOne")
+        geojson = self.calculateCostSummary(startVerticesID, [endVertexID], costAttribute)
+        Logger.getInstance().info("End getTotalShortestPathCostManyToOne")
+        return geojson
+
+    def getTotalShortestPathCostOneToMany(self, startVertexID=None, endVerticesID=[], costAttribute=None):
+        Logger.getInstance().info("Start getTotalShortestPathCostOneToMany")
+        geojson = self.calculateCostSummary([startVertexID], endVerticesID, costAttribute)
+        Logger.getInstance().info("End getTotalShortestPathCostOneToMany")
+        return geojson
+
+    @dgl_timer
+    def getTotalShortestPathCostManyToMany(self, startVerticesID=[], endVerticesID=[], costAttribute=None):
+        """
+        Split the start and end vertices in blocks of ``max_vertices_blocks``, every pair of blocks is calculated
+        in parallel inside its own bounding box.
+
+        :param startVerticesID: Set of initial vertexes to calculate the shortest path.
+        :param endVerticesID: Set of ending vertexes to calculate the shortest path.
+        :param costAttribute: Impedance/cost to measure the weight of the route.
+        :return: Shortest path summary json.
+        """
+        blockSize = int(getConfigurationProperties(section="PARALLELIZATION")["max_vertices_blocks"])
+        startBlocks = [startVerticesID[bottomLimit:bottomLimit + blockSize]
+                       for bottomLimit in range(0, len(startVerticesID), blockSize)]
+        endBlocks = [endVerticesID[bottomLimit:bottomLimit + blockSize]
+                     for bottomLimit in range(0, len(endVerticesID), blockSize)]
+
+        with Parallel(n_jobs=int(getConfigurationProperties(section="PARALLELIZATION")["jobs"]),
+                      backend="threading",
+                      verbose=int(getConfigurationProperties(section="PARALLELIZATION")["verbose"])) as parallel:
+            parallel._print = parallel_job_print
+            returns = parallel(delayed(self.calculateCostSummary)(startBlock, endBlock, costAttribute)
+                               for startBlock in startBlocks for endBlock in endBlocks)
+
+        features = []
+        for geojson in returns:
+            for feature in geojson["features"]:
+                feature["id"] = str(len(features))
+                features.append(feature)
+
+        return {
+            "type": "FeatureCollection",
+            "features": features,
+            "crs": {
+                "properties": {
+                    "name": "urn:ogc:def:crs:%s" % (GPD_CRS.PSEUDO_MERCATOR["init"].replace(":", "::"))
+                },
+                "type": "name"
+            }
+        }
+
+    def calculateCostSummary(self, startVerticesID, endVerticesID, costAttribute):
+        """
+        pgr_dijkstraCost over the edges of the bounding box of the start and end vertices.
+
+        :return: Geojson with the same features returned by the transport mode.
+        """
+        startVerticesID = set(startVerticesID)
+        endVerticesID = set(endVerticesID)
+        expectedFeatures = self.getReachablePairCount(startVerticesID, endVerticesID, costAttribute)
+
+        def createSQL(edgesSQL):
+            return "SELECT " \
+                   "s.id AS start_vertex_id," \
+                   "e.id  AS end_vertex_id," \
+                   "r.agg_cost as total_cost," \
+                   "ST_MakeLine(s.the_geom, e.the_geom) AS geom " \
+                   "FROM(" \
+                   "SELECT * " \
+                   "FROM pgr_dijkstraCost('%s', ARRAY[%s], ARRAY[%s], true)) as r," \
+                   "table_name_vertices_pgr AS s," \
+                   "table_name_vertices_pgr AS e " \
+                   "WHERE " \
+                   "s.id = r.start_vid " \
+                   "and e.id = r.end_vid ".replace("table_name", self.tableName) % (
+                       edgesSQL, ",".join(map(str, startVerticesID)), ",".join(map(str, endVerticesID)))
+
+        return self.executeInBoundingBox(createSQL, costAttribute, startVerticesID | endVerticesID,
+                                         expectedFeatures)
+
+    def getReachablePairCount(self, startVerticesID, endVerticesID, costAttribute):
+        """
+        :param startVerticesID: Set of start vertices.
+        :param endVerticesID: Set of end vertices.
+        :param costAttribute: Impedance/cost to measure the weight of the route.
+        :return: Number of pairs of different vertices of the same strongly connected component, all the pairs of
+        different vertices if the components of the impedance are not known.
+        """
+        startVerticesID = np.unique(np.asarray(list(startVerticesID), dtype=np.int64))
+        endVerticesID = np.unique(np.asarray(list(endVerticesID), dtype=np.int64))
+        components = self.stronglyConnectedComponents.get(costAttribute)
+        if components is None:
+            return len(startVerticesID) * len(endVerticesID) - len(np.intersect1d(startVerticesID, endVerticesID))
+
+        startComponents = components.getComponentIds(startVerticesID)
+        endComponents = components.getComponentIds(endVerticesID)
+        startComponents = startComponents[startComponents >= 0]
+        endComponents = endComponents[endComponents >= 0]
+        labels = np.union1d(startComponents, endComponents)
+        pairCount = np.dot(np.bincount(np.searchsorted(labels, startComponents), minlength=len(labels)),
+                           np.bincount(np.searchsorted(labels, endComponents), minlength=len(labels)))
+        sameVertices = np.intersect1d(startVerticesID, endVerticesID)
+        return int(pairCount) - int(np.count_nonzero(components.getComponentIds(sameVertices) >= 0))
+
+    def getRoutingEdgesSQL(self, costAttribute):
+        return self.transportMode.getRoutingEdgesSQL(costAttribute)
+
+    def getRoutingEdgesAttributesSQL(self):
+        return self.transportMode.getRoutingEdgesAttributesSQL()
+
+    def getRoutableVerticesSQL(self):
+        return self.transportMode.getRoutableVerticesSQL()
+
+    def getRoutableEdgesSQL(self):
+        return self.transportMode.getRoutableEdgesSQL()
+
+    def getRoutableVerticesTableName(self):
+        return self.transportMode.getRoutableVerticesTableName()
+
+    def getEPSGCode(self):
+        return self.transportMode.getEPSGCode()
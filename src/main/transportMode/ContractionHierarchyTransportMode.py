@@ -0,0 +1,71 @@
+import os
+
+from src.main.carRoutingExceptions import OutdatedNetworkException
+from src.main.routing.ContractionHierarchy import ContractionHierarchy
+from src.main.routing.ContractionHierarchyEngine import ContractionHierarchyEngine
+from src.main.routing.PhastEngine import PhastEngine
+from src.main.transportMode.InMemoryTransportMode import InMemoryTransportMode
+from src.main.util import getConfigurationProperties, dgl_timer, Logger
+
+
+class ContractionHierarchyTransportMode(InMemoryTransportMode):
+    def __init__(self, transportMode, phast=False, maxCost=None):
+        """
+        In-memory transport mode answering the routes and cost summaries with a Contraction Hierarchy per
+        impedance/cost attribute.
+
+        The hierarchies are built offline with the ``--contract`` command and stored in the ``graphs_folder`` of the
+        ``IN_MEMORY_ROUTING`` configuration section. The hierarchies built on a different network (the edges table or
+        its costs changed) are contracted again.
+
+        :param transportMode: PostGIS transport mode (i.e. PrivateCarTransportMode) defining the table and the filters.
+        :param phast: Calculate the cost summaries with PHAST sweeps (one block of start vertices at once) instead of
+        the bucket many-to-many, recommended when the start and end points are the whole YKR grid.
+        :param maxCost: See InMemoryTransportMode.
+        """
+        super(ContractionHierarchyTransportMode, self).__init__(transportMode, maxCost=maxCost)
+        self.phast = phast
+        self.graphsFolder = getConfigurationProperties(section="IN_MEMORY_ROUTING")["graphs_folder"]
+
+    def getContractionHierarchyPath(self, costAttribute):
+        return os.path.join(self.graphsFolder, "%s_%s_ch.npz" % (self.tableName, costAttribute))
+
+    def createRoutingEngine(self, costAttribute):
+        fingerprint = self.getNetworkFingerprint(costAttribute)
+        contractionHierarchyPath = self.getContractionHierarchyPath(costAttribute)
+        contractionHierarchy = None
+        if not os.path.exists(contractionHierarchyPath):
+            Logger.getInstance().warning(
+                "Contraction hierarchy not found: %s, contracting the network..." % contractionHierarchyPath)
+        else:
+            try:
+                contractionHierarchy = ContractionHierarchy.load(contractionHierarchyPath, fingerprint)
+            except OutdatedNetworkException as e:
+                Logger.getInstance().warning("%s, contracting the network again..." % e)
+
+        if contractionHierarchy is None:
+            contractionHierarchy = self.contract(costAttribute, fingerprint)
+
+        if self.phast:
+            return PhastEngine(contractionHierarchy)
+        return ContractionHierarchyEngine(contractionHierarchy)
+
+    @dgl_timer
+    def contract(self, costAttribute, fingerprint=None):
+        """
+        Build the Contraction Hierarchy of the given impedance/cost attribute and store it in the ``graphs_folder``.
+
+        :param costAttribute: Impedance/cost to measure the weight of the route.
+        :param fingerprint: Current fingerprint of the network, queried if not given.
+        :return: ContractionHierarchy.
+        """
+        if fingerprint is None:
+            fingerprint = self.getNetworkFingerprint(costAttribute)
+        contractionHierarchy = ContractionHierarchy.contract(self.getRoutingGraph(costAttribute),
+                                                             fingerprint=fingerprint)
+
+        if not os.path.exists(self.graphsFolder):
+            os.makedirs(self.graphsFolder)
+        contractionHierarchy.save(self.getContractionHierarchyPath(costAttribute))
+
+        return contractionHierarchy
@@ -0,0 +1,424 @@
+import atexit
+import os
+import tempfile
+import threading
+
+import numpy as np
+from joblib import Parallel, delayed
+
+from src.main.connection.PostgisServiceProvider import executePostgisQueryReturningDataFrame
+from src.main.routing.DijkstraEngine import DijkstraEngine, calculateCostsWithSharedGraph
+from src.main.routing.RoutingGraph import RoutingGraph
+from src.main.routing.SnappingCache import SnappingCache
+from src.main.transportMode.AbstractTransportMode import AbstractTransportMode
+from src.main.util import getConfigurationProperties, dgl_timer, parallel_job_print, Logger, GPD_CRS, \
+    FileActions
+
+
+class InMemoryTransportMode(AbstractTransportMode):
+    def __init__(self, transportMode, processes=False, maxCost=None):
+        """
+        Load the routable network of the given transport mode once into memory (CSR arrays) and calculate the
+        cost summaries in-process, instead of letting pgRouting rebuild the graph for every block of vertices.
+
+        The nearest vertex requests are still delegated to the wrapped transport mode.
+
+        :param transportMode: PostGIS transport mode (i.e. BicycleTransportMode) defining the table and the filters.
+        :param processes: Calculate the cost summaries in a pool of processes instead of threads, the workers
+        memory-map the routing graph stored once in shared memory.
+        :param maxCost: Stop the cost summary searches at this cost, the pairs over it are not included in the
+        summaries, as if they were unreachable.
+        """
+        self.transportMode = transportMode
+        self.processes = processes
+        self.maxCost = np.inf if maxCost is None else float(maxCost)
+        self.serviceProvider = transportMode.serviceProvider
+        self.tableName = transportMode.tableName
+        self.routingGraphs = {}
+        self.routingGraphsLock = threading.Lock()
+        self.routingEngines = {}
+        self.routingEnginesLock = threading.Lock()
+        self.routingEdgesFeatures = None
+        self.routingEdgesFeaturesLock = threading.Lock()
+        self.fileActions = FileActions()
+        self.sharedGraphsFolder = None
+        self.sharedGraphPathPrefixes = {}
+        self.sharedGraphsLock = threading.Lock()
+        self.bidirectionalMaxPairs = int(
+            getConfigurationProperties(section="IN_MEMORY_ROUTING")["bidirectional_max_pairs"])
+
+    def getNearestVertexFromAPoint(self, coordinates):
+        return self.transportMode.getNearestVertexFromAPoint(coordinates)
+
+    def getNearestRoutableVertexFromAPoint(self, coordinates, radius=500):
+        return self.transportMode.getNearestRoutableVertexFromAPoint(coordinates, radius)
+
+    def getShortestPath(self, startVertexId, endVertexId, cost):
+        """
+        From a pair of vertices (startVertexId, endVertexId) and based on the "cost" attribute,
+        retrieve the shortest path from the in-memory routing graph.
+
+        :param startVertexId: Start vertex from the requested path.
+        :param endVertexId: End vertex from the requested path.
+        :param cost: Attribute to calculate the cost of the shortest path
+        :return: Geojson (Geometry type: LineString) containing the segment features of the shortest path.
+        """
+        routingEngine = self.getRoutingEngine(cost)
+        startIndex, endIndex = routingEngine.routingGraph.getVertexIndexes([startVertexId, endVertexId])
+
+        edgeIds = []
+        if startIndex >= 0 and endIndex >= 0:
+            edgeIds = routingEngine.calculateShortestPath(startIndex, endIndex)
+
+        return self.createShortestPathGeojson(edgeIds)
+
+    def getShortestPathTree(self, startVertexId, cost):
+        """
+        Calculate the shortest path tree rooted in the start vertex, the paths to every end vertex are extracted
+        from it with ``getShortestPathFromTree``.
+
+        :param startVertexId: Start vertex of all the paths.
+        :param cost: Attribute to calculate the cost of the shortest paths.
+        :return: ShortestPathTree or None if the start vertex is not part of the routing graph.
+        """
+        routingGraph = self.getRoutingGraph(cost)
+        startIndex = routingGraph.getVertexIndexes([startVertexId])[0]
+        if startIndex < 0:
+            Logger.getInstance().warning("Vertex not contained into the routing graph: %s" % startVertexId)
+            return None
+
+        return DijkstraEngine(routingGraph).calculateShortestPathTree(startIndex)
+
+    def getShortestPathFromTree(self, shortestPathTree, endVertexId):
+        """
+        Extract the shortest path to the end vertex from an already calculated shortest path tree.
+
+        :param shortestPathTree: Tree returned by ``getShortestPathTree``.
+        :param endVertexId: End vertex from the requested path.
+        :return: Geojson (Geometry type: LineString) containing the segment features of the shortest path, with the
+        same properties returned by the ``getShortestPath`` of the wrapped transport mode.
+        """
+        edgeIds = []
+        if shortestPathTree is not None:
+            endIndex = shortestPathTree.routingGraph.getVertexIndexes([endVertexId])[0]
+            edgeIds = shortestPathTree.getEdgeIds(endIndex)
+
+        return self.createShortestPathGeojson(edgeIds)
+
+    def createShortestPathGeojson(self, edgeIds):
+        """
+        :param edgeIds: Ordered edge ids of a shortest path.
+        :return: Geojson with one feature per edge, ``seq`` gives the position of the edge in the path.
+        """
+        routingEdgesFeatures = self.getRoutingEdgesFeatures()
+
+        features = []
+        for seq, edgeId in enumerate(edgeIds):
+            edgeFeature = routingEdgesFeatures[edgeId]
+            properties = {"seq": seq}
+            properties.update(edgeFeature["properties"])
+            features.append({
+                "id": str(seq),
+                "type": "Feature",
+                "properties": properties,
+                "geometry": edgeFeature["geometry"]
+            })
+
+        return self.createGeojson(features)
+
+    def getRoutingEdgesFeatures(self):
+        """
+        Retrieve the attributes and geometry of all the edges, the edges are read from the database only the
+        first time.
+
+        :return: Dictionary of the edges geojson features by edge id.
+        """
+        with self.routingEdgesFeaturesLock:
+            if self.routingEdgesFeatures is None:
+                self.routingEdgesFeatures = self.loadRoutingEdgesFeatures()
+            return self.routingEdgesFeatures
+
+    @dgl_timer
+    def loadRoutingEdgesFeatures(self):
+        dataFrame = executePostgisQueryReturningDataFrame(self.serviceProvider,
+                                                          self.transportMode.getRoutingEdgesAttributesSQL())
+        geojson = self.fileActions.convertToGeojson(dataFrame)
+        return {feature["properties"]["id"]: feature for feature in geojson["features"]}
+
+    def getRoutingEdgesSQL(self, costAttribute):
+        return self.transportMode.getRoutingEdgesSQL(costAttribute)
+
+    def getRoutingEdgesAttributesSQL(self):
+        return self.transportMode.getRoutingEdgesAttributesSQL()
+
+    def getRoutableVerticesSQL(self):
+        return self.transportMode.getRoutableVerticesSQL()
+
+    def getRoutableEdgesSQL(self):
+        return self.transportMode.getRoutableEdgesSQL()
+
+    def getRoutableVerticesTableName(self):
+        return self.transportMode.getRoutableVerticesTableName()
+
+    def getRoutingVerticesSQL(self):
+        return "SELECT " \
+               "id," \
+               "ST_X(the_geom)," \
+               "ST_Y(the_geom) " \
+               "FROM table_name_vertices_pgr".replace("table_name", self.tableName)
+
+    def getNetworkFingerprintSQL(self, costAttribute):
+        """
+        :param costAttribute: Impedance/cost to measure the weight of the route.
+        :return: SQL sentence retrieving a checksum of the costs of the routing edges.
+        """
+        return "SELECT " \
+               "sum(hashtext(id || ':' || cost || ':' || reverse_cost)) " \
+               "FROM (%s) AS edges" % self.getRoutingEdgesSQL(costAttribute)
+
+    def getNetworkFingerprint(self, costAttribute):
+        """
+        Fingerprint of the topology of the edges table (see ``SnappingCache.getFingerprint``) and of the costs of the
+        impedance, stored with the structures built offline from the routing graph.
+
+        :param costAttribute: Impedance/cost to measure the weight of the route.
+        :return: Fingerprint of the current routing graph.
+        """
+        rows = self.serviceProvider.executeReturningRows(self.getNetworkFingerprintSQL(costAttribute))
+        return "%s_%s" % (SnappingCache.getFingerprint(self.transportMode), rows[0][0])
+
+    def getRoutingGraph(self, costAttribute):
+        """
+        Retrieve the routing graph of the given impedance, the graph is read from the database only the first time.
+
+        :param costAttribute: Impedance/cost to measure the weight of the route.
+        :return: RoutingGraph.
+        """
+        with self.routingGraphsLock:
+            if costAttribute not in self.routingGraphs:
+                self.routingGraphs[costAttribute] = self.loadRoutingGraph(costAttribute)
+            return self.routingGraphs[costAttribute]
+
+    def getRoutingEngine(self, costAttribute):
+        """
+        Retrieve the engine used to calculate the costs and shortest paths of the given impedance.
+
+        :param costAttribute: Impedance/cost to measure the weight of the route.
+        :return: Routing engine, i.e. DijkstraEngine.
+        """
+        with self.routingEnginesLock:
+            if costAttribute not in self.routingEngines:
+                self.routingEngines[costAttribute] = self.createRoutingEngine(costAttribute)
+            return self.routingEngines[costAttribute]
+
+    def createRoutingEngine(self, costAttribute):
+        return DijkstraEngine(self.getRoutingGraph(costAttribute), bidirectionalMaxPairs=self.bidirectionalMaxPairs)
+
+    @dgl_timer
+    def loadRoutingGraph(self, costAttribute):
+        edges = np.array(self.serviceProvider.executeReturningRows(self.getRoutingEdgesSQL(costAttribute)),
+                         dtype=np.float64).reshape(-1, 5)
+        vertices = np.array(self.serviceProvider.executeReturningRows(self.getRoutingVerticesSQL()),
+                            dtype=np.float64).reshape(-1, 3)
+
+        routingGraph = RoutingGraph.fromEdges(edgeIds=edges[:, 0],
+                                              sources=edges[:, 1],
+                                              targets=edges[:, 2],
+                                              costs=edges[:, 3],
+                                              reverseCosts=edges[:, 4],
+                                              vertexIds=vertices[:, 0],
+                                              coordinates=vertices[:, 1:])
+
+        Logger.getInstance().info("Routing graph %s loaded: %s vertices, %s arcs" % (
+            costAttribute, routingGraph.getVertexCount(), routingGraph.getArcCount()))
+
+        return routingGraph
+
+    def getTotalShortestPathCostOneToOne(self, startVertexID, endVertexID, costAttribute):
+        """
+        Calculate in-process the total routing cost for a pair of points.
+
+        :param startVertexID: Initial Vertex to calculate the shortest path.
+        :param endVertexID: Last Vertex to calculate the shortest path.
+        :param costAttribute: Impedance/cost to measure the weight of the route.
+        :return: Shortest path summary json.
+        """
+        Logger.getInstance().info("Start getTotalShortestPathCostOneToOne")
+        geojson = self.calculateCostSummary([startVertexID], [endVertexID], costAttribute)
+        Logger.getInstance().info("End getTotalShortestPathCostOneToOne")
+        return geojson
+
+    def getTotalShortestPathCostManyToOne(self, startVerticesID=[], endVertexID=None, costAttribute=None):
+        """
+        Calculate in-process the total routing cost from a set of point to a single point.
+
+        :param startVerticesID: Set of initial vertexes to calculate the shortest path.
+        :param endVertexID: Last Vertex to calculate the shortest path.
+        :param costAttribute: Impedance/cost to measure the weight of the route.
+        :return: Shortest path summary json.
+        """
+        Logger.getInstance().info("Start getTotalShortestPathCostManyToOne")
+        geojson = self.calculateCostSummary(startVerticesID, [endVertexID], costAttribute)
+        Logger.getInstance().info("End getTotalShortestPathCostManyToOne")
+        return geojson
+
+    def getTotalShortestPathCostOneToMany(self, startVertexID=None, endVerticesID=[], costAttribute=None):
+        """
+        Calculate in-process the total routing cost from a single point to a set of points.
+
+        :param startVertexID: Initial vertexes to calculate the shortest path.
+        :param endVerticesID: Set of ending vertexes to calculate the shortest path.
+        :param costAttribute: Impedance/cost to measure the weight of the route.
+        :return: Shortest path summary json.
+        """
+        Logger.getInstance().info("Start getTotalShortestPathCostOneToMany")
+        geojson = self.calculateCostSummary([startVertexID], endVerticesID, costAttribute)
+        Logger.getInstance().info("End getTotalShortestPathCostOneToMany")
+        return geojson
+
+    @dgl_timer
+    def getTotalShortestPathCostManyToMany(self, startVerticesID=[], endVerticesID=[], costAttribute=None):
+        """
+        Calculate in-process the total routing cost between a set of points and another set of points.
+
+        :param startVerticesID: Set of initial vertexes to calculate the shortest path.
+        :param endVerticesID: Set of ending vertexes to calculate the shortest path.
+        :param costAttribute: Impedance/cost to measure the weight of the route.
+        :return: Shortest path summary json.
+        """
+        return self.calculateCostSummary(startVerticesID, endVerticesID, costAttribute)
+
+    def calculateCostSummary(self, startVerticesID, endVerticesID, costAttribute):
+        """
+        Calculate the costs with the routing engine (i.e. one one-to-all Dijkstra per start vertex), the start
+        vertices are split in blocks of ``max_vertices_blocks`` and the blocks are executed in parallel.
+
+        When there are fewer end than start vertices (i.e. all the YKR cells to a few hospitals), the searches start
+        from the end vertices over the reverse graph, so that one search per end vertex is executed instead of one
+        per start vertex.
+
+        With ``maxCost`` every search is stopped at that cost and the pairs over it are left out of the summary.
+
+        :return: Geojson with the same features returned by the pgr_dijkstraCost queries.
+        """
+        routingEngine = self.getRoutingEngine(costAttribute)
+        routingGraph = routingEngine.routingGraph
+
+        startIndexes = self.getRoutableVertexIndexes(routingGraph, startVerticesID)
+        endIndexes = self.getRoutableVertexIndexes(routingGraph, endVerticesID)
+
+        reverseSearch = len(endIndexes) < len(startIndexes)
+        if reverseSearch:
+            routingEngine = routingEngine.getReverseEngine()
+            searchIndexes, targetIndexes = endIndexes, startIndexes
+        else:
+            searchIndexes, targetIndexes = startIndexes, endIndexes
+
+        blockSize = int(getConfigurationProperties(section="PARALLELIZATION")["max_vertices_blocks"])
+        blocks = [searchIndexes[bottomLimit:bottomLimit + blockSize]
+                  for bottomLimit in range(0, len(searchIndexes), blockSize)]
+
+        with Parallel(n_jobs=int(getConfigurationProperties(section="PARALLELIZATION")["jobs"]),
+                      backend="loky" if self.processes else "threading",
+                      verbose=int(getConfigurationProperties(section="PARALLELIZATION")["verbose"])) as parallel:
+            parallel._print = parallel_job_print
+            if self.processes:
+                graphPathPrefix, reverseGraphPathPrefix = self.getSharedGraphPathPrefixes(costAttribute,
+                                                                                          reverseSearch)
+                returns = parallel(delayed(calculateCostsWithSharedGraph)(graphPathPrefix, block, targetIndexes,
+                                                                          self.bidirectionalMaxPairs, self.maxCost,
+                                                                          reverseGraphPathPrefix)
+                                   for block in blocks)
+            else:
+                returns = parallel(delayed(routingEngine.calculateCosts)(block, targetIndexes, self.maxCost)
+                                   for block in blocks)
+
+        if reverseSearch:
+            # (end x start) blocks of the reverse graph transposed into the (start x end) costs.
+            costs = np.vstack([np.empty((0, len(startIndexes)))] + returns).T
+            return self.createGeojson(self.createCostSummaryFeatures(routingGraph, startIndexes, endIndexes, costs))
+
+        features = []
+        for block, costs in zip(blocks, returns):
+            features.extend(self.createCostSummaryFeatures(routingGraph, block, endIndexes, costs, len(features)))
+
+        return self.createGeojson(features)
+
+    def getSharedGraphPathPrefixes(self, costAttribute, reverse=False):
+        """
+        Store once the routing graph and its reverse graph for the worker processes, in shared memory (``/dev/shm``)
+        when it is available. The folder is deleted when the application ends.
+
+        :param costAttribute: Impedance/cost to measure the weight of the route.
+        :param reverse: Return the reverse graph first.
+        :return: Path prefixes to load the graph and its reverse graph with ``RoutingGraph.load``.
+        """
+        with self.sharedGraphsLock:
+            if costAttribute not in self.sharedGraphPathPrefixes:
+                if self.sharedGraphsFolder is None:
+                    self.sharedGraphsFolder = tempfile.mkdtemp(
+                        prefix="dora_graphs_", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+                    atexit.register(self.fileActions.deleteFolder, self.sharedGraphsFolder)
+
+                pathPrefix = os.path.join(self.sharedGraphsFolder, "%s_%s" % (self.tableName, costAttribute))
+                self.getRoutingGraph(costAttribute).save(pathPrefix, reversePathPrefix=pathPrefix + "_reverse")
+                self.sharedGraphPathPrefixes[costAttribute] = (pathPrefix, pathPrefix + "_reverse")
+
+            pathPrefixes = self.sharedGraphPathPrefixes[costAttribute]
+            return pathPrefixes[::-1] if reverse else pathPrefixes
+
+    def getRoutableVertexIndexes(self, routingGraph, verticesID):
+        verticesID = np.unique(np.asarray(verticesID, dtype=np.int64))
+        indexes = routingGraph.getVertexIndexes(verticesID)
+        if np.any(indexes < 0):
+            Logger.getInstance().warning("Vertices not contained into the routing graph: %s" % (
+                verticesID[indexes < 0].tolist()))
+        return indexes[indexes >= 0]
+
+    def createCostSummaryFeatures(self, routingGraph, startIndexes, endIndexes, costs, firstFeatureId=0):
+        """
+        Create one LineString feature (start vertex -> end vertex) per reachable pair. As pgr_dijkstraCost does,
+        the pairs with the same start and end vertex are not included.
+
+        :return: List of features.
+        """
+        reachable = np.isfinite(costs) & (startIndexes[:, np.newaxis] != endIndexes[np.newaxis, :])
+        rows, columns = np.nonzero(reachable)
+
+        startIds = routingGraph.vertexIds[startIndexes[rows]].tolist()
+        endIds = routingGraph.vertexIds[endIndexes[columns]].tolist()
+        totalCosts = costs[rows, columns].tolist()
+        startCoordinates = routingGraph.coordinates[startIndexes[rows]].tolist()
+        endCoordinates = routingGraph.coordinates[endIndexes[columns]].tolist()
+
+        features = []
+        for i in range(len(startIds)):
+            features.append({
+                "id": str(firstFeatureId + i),
+                "type": "Feature",
+                "properties": {
+                    "start_vertex_id": startIds[i],
+                    "end_vertex_id": endIds[i],
+                    "total_cost": totalCosts[i]
+                },
+                "geometry": {
+                    "type": "LineString",
+                    "coordinates": [startCoordinates[i], endCoordinates[i]]
+                }
+            })
+        return features
+
+    def createGeojson(self, features):
+        return {
+            "type": "FeatureCollection",
+            "features": features,
+            "crs": {
+                "properties": {
+                    "name": "urn:ogc:def:crs:%s" % (GPD_CRS.PSEUDO_MERCATOR["init"].replace(":", "::"))
+                },
+                "type": "name"
+            }
+        }
+
+    def getEPSGCode(self):
+        return self.transportMode.getEPSGCode()
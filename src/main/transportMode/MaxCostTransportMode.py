@@ -0,0 +1,132 @@
+from joblib import Parallel, delayed
+
+from src.main.transportMode.AbstractTransportMode import AbstractTransportMode
+from src.main.util import getConfigurationProperties, dgl_timer, parallel_job_print, Logger, GPD_CRS
+
+
+class MaxCostTransportMode(AbstractTransportMode):
+    def __init__(self, transportMode, maxCost):
+        """
+        Calculate the cost summaries with pgr_drivingDistance bounded by ``maxCost``, so that pgRouting stops every
+        search at the travel time/distance budget instead of exploring the whole network. The pairs over the budget
+        are not included in the summaries, as if they were unreachable.
+
+        The routes and the nearest vertex requests are delegated to the wrapped transport mode.
+
+        :param transportMode: Transport mode (i.e. BicycleTransportMode) defining the table and the filters.
+        :param maxCost: Maximum total cost of the pairs of the summaries, in the units of the impedance/cost attribute.
+        """
+        self.transportMode = transportMode
+        self.serviceProvider = transportMode.serviceProvider
+        self.tableName = transportMode.tableName
+        self.maxCost = float(maxCost)
+
+    def getNearestVertexFromAPoint(self, coordinates):
+        return self.transportMode.getNearestVertexFromAPoint(coordinates)
+
+    def getNearestRoutableVertexFromAPoint(self, coordinates, radius=500):
+        return self.transportMode.getNearestRoutableVertexFromAPoint(coordinates, radius)
+
+    def getShortestPath(self, startVertexId, endVertexId, cost):
+        return self.transportMode.getShortestPath(startVertexId, endVertexId, cost)
+
+    def getTotalShortestPathCostOneToOne(self, startVertexID, endVertexID, costAttribute):
+        Logger.getInstance().info("Start getTotalShortestPathCostOneToOne")
+        geojson = self.calculateCostSummary([startVertexID], [endVertexID], costAttribute)
+        Logger.getInstance().info("End getTotalShortestPathCostOneToOne")
+        return geojson
+
+    def getTotalShortestPathCostManyToOne(self, startVerticesID=[], endVertexID=None, costAttribute=None):
+        Logger.getInstance().info("Start getTotalShortestPathCostManyToOne")
+        geojson = self.calculateCostSummary(startVerticesID, [endVertexID], costAttribute)
+        Logger.getInstance().info("End getTotalShortestPathCostManyToOne")
+        return geojson
+
+    def getTotalShortestPathCostOneToMany(self, startVertexID=None, endVerticesID=[], costAttribute=None):
+        Logger.getInstance().info("Start getTotalShortestPathCostOneToMany")
+        geojson = self.calculateCostSummary([startVertexID], endVerticesID, costAttribute)
+        Logger.getInstance().info("End getTotalShortestPathCostOneToMany")
+        return geojson
+
+    @dgl_timer
+    def getTotalShortestPathCostManyToMany(self, startVerticesID=[], endVerticesID=[], costAttribute=None):
+        """
+        Split the start vertices in blocks of ``max_vertices_blocks``, the blocks are calculated in parallel.
+
+        :param startVerticesID: Set of initial vertexes to calculate the shortest path.
+        :param endVerticesID: Set of ending vertexes to calculate the shortest path.
+        :param costAttribute: Impedance/cost to measure the weight of the route.
+        :return: Shortest path summary json.
+        """
+        blockSize = int(getConfigurationProperties(section="PARALLELIZATION")["max_vertices_blocks"])
+        startBlocks = [startVerticesID[bottomLimit:bottomLimit + blockSize]
+                       for bottomLimit in range(0, len(startVerticesID), blockSize)]
+
+        with Parallel(n_jobs=int(getConfigurationProperties(section="PARALLELIZATION")["jobs"]),
+                      backend="threading",
+                      verbose=int(getConfigurationProperties(section="PARALLELIZATION")["verbose"])) as parallel:
+            parallel._print = parallel_job_print
+            returns = parallel(delayed(self.calculateCostSummary)(startBlock, endVerticesID, costAttribute)
+                               for startBlock in startBlocks)
+
+        features = []
+        for geojson in returns:
+            for feature in geojson["features"]:
+                feature["id"] = str(len(features))
+                features.append(feature)
+
+        return {
+            "type": "FeatureCollection",
+            "features": features,
+            "crs": {
+                "properties": {
+                    "name": "urn:ogc:def:crs:%s" % (GPD_CRS.PSEUDO_MERCATOR["init"].replace(":", "::"))
+                },
+                "type": "name"
+            }
+        }
+
+    def calculateCostSummary(self, startVerticesID, endVerticesID, costAttribute):
+        """
+        pgr_drivingDistance from all the start vertices at once, only the reached end vertices are kept.
+
+        :return: Geojson with the same features returned by the pgr_dijkstraCost queries.
+        """
+        sql = "SELECT " \
+              "s.id AS start_vertex_id," \
+              "e.id  AS end_vertex_id," \
+              "r.agg_cost as total_cost," \
+              "ST_MakeLine(s.the_geom, e.the_geom) AS geom " \
+              "FROM(" \
+              "SELECT * " \
+              "FROM pgr_drivingDistance('%s', ARRAY[%s], %s, true)) as r," \
+              "table_name_vertices_pgr AS s," \
+              "table_name_vertices_pgr AS e " \
+              "WHERE " \
+              "s.id = r.from_v " \
+              "and e.id = r.node " \
+              "and r.node IN (%s) " \
+              "and r.from_v <> r.node " \
+              "ORDER BY r.from_v, r.node".replace("table_name", self.tableName) % (
+                  self.transportMode.getRoutingEdgesSQL(costAttribute), ",".join(map(str, set(startVerticesID))),
+                  self.maxCost, ",".join(map(str, set(endVerticesID))))
+
+        return self.serviceProvider.execute(sql)
+
+    def getRoutingEdgesSQL(self, costAttribute):
+        return self.transportMode.getRoutingEdgesSQL(costAttribute)
+
+    def getRoutingEdgesAttributesSQL(self):
+        return self.transportMode.getRoutingEdgesAttributesSQL()
+
+    def getRoutableVerticesSQL(self):
+        return self.transportMode.getRoutableVerticesSQL()
+
+    def getRoutableEdgesSQL(self):
+        return self.transportMode.getRoutableEdgesSQL()
+
+    def getRoutableVerticesTableName(self):
+        return self.transportMode.getRoutableVerticesTableName()
+
+    def getEPSGCode(self):
+        return self.transportMode.getEPSGCode()
@@ -1,14 +1,20 @@
-from joblib import Parallel, delayed
-from src.main.connection.PostgisServiceProvider import executePostgisQueryReturningDataFrame
+import numpy as np
 from src.main.util import getConfigurationProperties, FileActions, dgl_timer, \
-    parallel_job_print, Logger
+    Logger, CostSummaryAccumulator
 
 from src.main.transportMode.AbstractTransportMode import AbstractTransportMode
 
 
 class OSMPrivateCarTransportMode(AbstractTransportMode):
-    def __init__(self, geojsonServiceProvider, epsgCode="EPSG:3857"):
+    def __init__(self, geojsonServiceProvider, epsgCode="EPSG:3857", summaryGeometry=True):
+        """
+        :param geojsonServiceProvider: PostgisServiceProvider executing the queries.
+        :param epsgCode: EPSG code of the network.
+        :param summaryGeometry: If False, the many-to-many cost summary is queried without the vertices and their
+        LineString geometries (only the vertex ids and the total cost).
+        """
         self.epsgCode = epsgCode
+        self.summaryGeometry = summaryGeometry
         self.fileActions = FileActions()
         self.serviceProvider = geojsonServiceProvider
         config = getConfigurationProperties(section="DATABASE_CONFIG")
@@ -189,9 +195,9 @@ class OSMPrivateCarTransportMode(AbstractTransportMode):
               "WHERE " \
               "r.id2 = e.id " \
               "GROUP BY e.id, e.AJOSUUNTA".replace("table_name", self.tableName) % (
-                  cost, cost, str(startVertexId), str(endVertexId))
+                  cost, cost, "$1", "$2")
 
-        geojson = self.serviceProvider.execute(sql)
+        geojson = self.serviceProvider.executePrepared(sql, ["integer", "integer"], [startVertexId, endVertexId])
         # print("End getShortestPath")
         return geojson
 
@@ -232,11 +238,11 @@ class OSMPrivateCarTransportMode(AbstractTransportMode):
               "WHERE " \
               "s.id = r.start_vid " \
               "and e.id = r.end_vid ".replace("table_name", self.tableName) \
-              % (costAttribute, costAttribute, startVertexID, endVertexID)
+              % (costAttribute, costAttribute, "$1", "$2")
         # "GROUP BY " \
         # "s.id, e.id, r.agg_cost" \
 
-        geojson = self.serviceProvider.execute(sql)
+        geojson = self.serviceProvider.executePrepared(sql, ["bigint", "bigint"], [startVertexID, endVertexID])
         Logger.getInstance().info("End getTotalShortestPathCostOneToOne")
         return geojson
 
@@ -270,18 +276,20 @@ class OSMPrivateCarTransportMode(AbstractTransportMode):
               "THEN %s " \
               "ELSE -1 " \
               "END)::double precision AS reverse_cost " \
-              "FROM table_name', ARRAY[%s], %s, true)) as r," \
+              "FROM table_name', %s, %s, true)) as r," \
               "table_name_vertices_pgr AS s," \
               "table_name_vertices_pgr AS e " \
               "WHERE " \
               "s.id = r.start_vid " \
               "and e.id = r.end_vid ".replace("table_name", self.tableName) \
-              % (costAttribute, costAttribute, ",".join(map(str, startVerticesID)), endVertexID)
+              % (costAttribute, costAttribute, "$1", "$2")
         # "GROUP BY " \
         # "s.id, e.id, r.agg_cost" \
 
 
-        geojson = self.serviceProvider.execute(sql)
+        geojson = self.serviceProvider.executePrepared(sql, ["bigint[]", "bigint"],
+                                                     [[int(vertexID) for vertexID in startVerticesID],
+                                                      int(endVertexID)])
         Logger.getInstance().info("End getTotalShortestPathCostManyToOne")
         return geojson
 
@@ -316,18 +324,20 @@ class OSMPrivateCarTransportMode(AbstractTransportMode):
               "THEN %s " \
               "ELSE -1 " \
               "END)::double precision AS reverse_cost " \
-              "FROM table_name', %s, ARRAY[%s], true)) as r," \
+              "FROM table_name', %s, %s, true)) as r," \
               "table_name_vertices_pgr AS s," \
               "table_name_vertices_pgr AS e " \
               "WHERE " \
               "s.id = r.start_vid " \
               "and e.id = r.end_vid ".replace("table_name", self.tableName) \
-              % (costAttribute, costAttribute, startVertexID, ",".join(map(str, endVerticesID)))
+              % (costAttribute, costAttribute, "$1", "$2")
         # "GROUP BY " \
         # "s.id, e.id, r.agg_cost" \
 
 
-        geojson = self.serviceProvider.execute(sql)
+        geojson = self.serviceProvider.executePrepared(sql, ["bigint", "bigint[]"],
+                                                     [int(startVertexID),
+                                                      [int(vertexID) for vertexID in endVerticesID]])
         Logger.getInstance().info("End getTotalShortestPathCostOneToMany")
         return geojson
 
@@ -398,84 +408,192 @@ class OSMPrivateCarTransportMode(AbstractTransportMode):
         :return: Shortest path summary json.
         """
 
-        startVerticesCounter = 0
-        startJump = int(getConfigurationProperties(section="PARALLELIZATION")["max_vertices_blocks"])
-
-        sqlExecutionList = []
-
-        while startVerticesCounter < len(startVerticesID):
-            if startVerticesCounter + startJump > len(startVerticesID):
-                startJump = len(startVerticesID) % startJump
-
-            startBottomLimit = startVerticesCounter
-            startUpperLimit = startVerticesCounter + startJump
-
-            startVerticesCounter = startVerticesCounter + startJump
-
-            endVerticesCounter = 0
-            endJump = int(getConfigurationProperties(section="PARALLELIZATION")["max_vertices_blocks"])
-
-            while endVerticesCounter < len(endVerticesID):
-                if endVerticesCounter + endJump > len(endVerticesID):
-                    endJump = len(endVerticesID) % endJump
-
-                endBottomLimit = endVerticesCounter
-                endUpperLimit = endVerticesCounter + endJump
-
-                endVerticesCounter = endVerticesCounter + endJump
-
-                sql = "SELECT " \
-                      "s.id AS start_vertex_id," \
-                      "e.id  AS end_vertex_id," \
-                      "r.agg_cost as total_cost," \
-                      "ST_MakeLine(s.the_geom, e.the_geom) AS geom " \
-                      "FROM(" \
-                      "SELECT * " \
-                      "FROM pgr_dijkstraCost(" \
-                      "\'SELECT id::integer, source::integer, target::integer, " \
-                      "(CASE  " \
-                      "WHEN (oneway = 1 OR oneway = 0)  " \
-                      "THEN %s " \
-                      "ELSE -1 " \
-                      "END)::double precision AS cost, " \
-                      "(CASE  " \
-                      "WHEN (oneway = 0)  " \
-                      "THEN %s " \
-                      "ELSE -1 " \
-                      "END)::double precision AS reverse_cost " \
-                      "FROM table_name', ARRAY[%s], ARRAY[%s], true)) as r," \
-                      "table_name_vertices_pgr AS s," \
-                      "table_name_vertices_pgr AS e " \
-                      "WHERE " \
-                      "s.id = r.start_vid " \
-                      "and e.id = r.end_vid ".replace("table_name", self.tableName) \
-                      % (costAttribute, costAttribute,
-                         ",".join(map(str, startVerticesID[startBottomLimit:startUpperLimit])),
-                         ",".join(map(str, endVerticesID[endBottomLimit:endUpperLimit]))
-                         )
-                # "GROUP BY " \
-                # "s.id, e.id, r.agg_cost" \
-
-                sqlExecutionList.append(sql)
-
-        dataFrame = None
-
-        with Parallel(n_jobs=int(getConfigurationProperties(section="PARALLELIZATION")["jobs"]),
-                      backend="threading",
-                      verbose=int(getConfigurationProperties(section="PARALLELIZATION")["verbose"])) as parallel:
-            parallel._print = parallel_job_print
-            returns = parallel(delayed(executePostgisQueryReturningDataFrame)(self.serviceProvider, sql)
-                               for sql in sqlExecutionList)
-
-            for newDataFrame in returns:
-                if dataFrame is not None:
-                    dataFrame = dataFrame.append(newDataFrame, ignore_index=True)
-                else:
-                    dataFrame = newDataFrame
-
-        geojson = self.fileActions.convertToGeojson(dataFrame)
+        if self.summaryGeometry:
+            sql = "SELECT " \
+                  "s.id::bigint AS start_vertex_id," \
+                  "e.id::bigint AS end_vertex_id," \
+                  "r.agg_cost::double precision AS total_cost," \
+                  "ST_X(s.the_geom)::double precision AS start_x," \
+                  "ST_Y(s.the_geom)::double precision AS start_y," \
+                  "ST_X(e.the_geom)::double precision AS end_x," \
+                  "ST_Y(e.the_geom)::double precision AS end_y " \
+                  "FROM(" \
+                  "SELECT * " \
+                  "FROM pgr_dijkstraCost(" \
+                  "\'SELECT id::integer, source::integer, target::integer, " \
+                  "(CASE  " \
+                  "WHEN (oneway = 1 OR oneway = 0)  " \
+                  "THEN %s " \
+                  "ELSE -1 " \
+                  "END)::double precision AS cost, " \
+                  "(CASE  " \
+                  "WHEN (oneway = 0)  " \
+                  "THEN %s " \
+                  "ELSE -1 " \
+                  "END)::double precision AS reverse_cost " \
+                  "FROM table_name', %s, %s, true)) as r," \
+                  "table_name_vertices_pgr AS s," \
+                  "table_name_vertices_pgr AS e " \
+                  "WHERE " \
+                  "s.id = r.start_vid " \
+                  "and e.id = r.end_vid ".replace("table_name", self.tableName) \
+                  % (costAttribute, costAttribute, "%s", "%s")
+            columnTypes = ["i8", "i8", "f8", "f8", "f8", "f8", "f8"]
+        else:
+            sql = self.getCostMatrixSQL(costAttribute)
+            columnTypes = ["i8", "i8", "f8"]
+        # "GROUP BY " \
+        # "s.id, e.id, r.agg_cost" \
+
+        geojson = self.calculateManyToManyBlocks(sql, columnTypes, startVerticesID, endVerticesID).toGeojson()
 
         return geojson
 
+    def getTotalShortestPathCostManyToManyColumns(self, startVerticesID=[], endVerticesID=[], costAttribute=None):
+        """
+        Many-to-many cost summary, without geometries, as columns instead of geojson features.
+
+        :param startVerticesID: Set of initial vertexes to calculate the shortest path.
+        :param endVerticesID: Set of ending vertexes to calculate the shortest path.
+        :param costAttribute: Impedance/cost to measure the weight of the route.
+        :return: Start vertex ids, end vertex ids and total costs arrays.
+        """
+        return self.calculateManyToManyBlocks(self.getCostMatrixSQL(costAttribute), ["i8", "i8", "f8"],
+                                              startVerticesID, endVerticesID).getColumns()
+
+    def calculateManyToManyBlocks(self, sql, columnTypes, startVerticesID, endVerticesID):
+        """
+        Run the many-to-many query in blocks of ``max_vertices_blocks`` start and end vertices, ``jobs`` blocks at a
+        time, over the vertex ids staged once per connection.
+
+        :param sql: Many-to-many query with the start and end vertices arrays left as ``%s``.
+        :param columnTypes: NumPy type of every column of the query.
+        :return: CostSummaryAccumulator with the columns of all the blocks.
+        """
+        config = getConfigurationProperties(section="PARALLELIZATION")
+        blockSize = int(config["max_vertices_blocks"])
+        blocks = [(startBottomLimit, startBottomLimit + blockSize, endBottomLimit, endBottomLimit + blockSize)
+                  for startBottomLimit in range(0, len(startVerticesID), blockSize)
+                  for endBottomLimit in range(0, len(endVerticesID), blockSize)]
+
+        returns = self.serviceProvider.executeStagedCopyReturningArrays(sql, columnTypes, startVerticesID,
+                                                                        endVerticesID, blocks, jobs=int(config["jobs"]))
+
+        costSummary = CostSummaryAccumulator(len(columnTypes))
+        for blockColumns in returns:
+            costSummary.add(blockColumns)
+
+        return costSummary
+
+    def getTotalShortestPathCostManyToManyChunks(self, startVerticesID=[], endVerticesID=[], costAttribute=None):
+        """
+        Stream the many-to-many cost summary, without geometries, in chunks of ``streaming_chunk_size`` pairs. The
+        blocks of ``max_vertices_blocks`` vertices are fetched with server-side cursors, ``jobs`` blocks at a time,
+        over the vertex ids staged once per connection.
+
+        :param startVerticesID: Set of initial vertexes to calculate the shortest path.
+        :param endVerticesID: Set of ending vertexes to calculate the shortest path.
+        :param costAttribute: Impedance/cost to measure the weight of the route.
+        :return: Generator of (start vertex ids, end vertex ids, total costs) arrays.
+        """
+        config = getConfigurationProperties(section="PARALLELIZATION")
+        blockSize = int(config["max_vertices_blocks"])
+        blocks = [(startBottomLimit, startBottomLimit + blockSize, endBottomLimit, endBottomLimit + blockSize)
+                  for startBottomLimit in range(0, len(startVerticesID), blockSize)
+                  for endBottomLimit in range(0, len(endVerticesID), blockSize)]
+
+        for rows in self.serviceProvider.executeStagedReturningRowChunks(self.getCostMatrixSQL(costAttribute),
+                                                                         startVerticesID, endVerticesID, blocks,
+                                                                         chunkSize=int(config["streaming_chunk_size"]),
+                                                                         jobs=int(config["jobs"])):
+            summary = np.array(rows, dtype=np.float64)
+            yield summary[:, 0].astype(np.int64), summary[:, 1].astype(np.int64), summary[:, 2]
+
+    def getCostMatrixSQL(self, costAttribute):
+        """
+        :param costAttribute: Impedance/cost to measure the weight of the route.
+        :return: pgr_dijkstraCost query retrieving only the start vertex id, end vertex id and total cost of every
+        pair, with the start and end vertices arrays left as ``%s``.
+        """
+        return "SELECT " \
+               "start_vid::bigint AS start_vertex_id," \
+               "end_vid::bigint AS end_vertex_id," \
+               "agg_cost::double precision AS total_cost " \
+               "FROM pgr_dijkstraCost('%s', %s, %s, true)" \
+               % (self.getRoutingEdgesSQL(costAttribute), "%s", "%s")
+
+    def getRoutingEdgesSQL(self, costAttribute):
+        """
+        Edges query given to pgRouting, the cost is -1 for the edges (or directions) that are not routable.
+
+        :param costAttribute: Impedance/cost to measure the weight of the route.
+        :return: SQL sentence retrieving id, source, target, cost and reverse_cost of every edge.
+        """
+        return "SELECT " \
+               "id::integer," \
+               "source::integer," \
+               "target::integer," \
+               "(CASE  " \
+               "WHEN (oneway = 1 OR oneway = 0)  " \
+               "THEN %s " \
+               "ELSE -1 " \
+               "END)::double precision AS cost," \
+               "(CASE " \
+               "WHEN (oneway = 0)  " \
+               "THEN %s " \
+               "ELSE -1 " \
+               "END)::double precision AS reverse_cost " \
+               "FROM table_name".replace("table_name", self.tableName) % (costAttribute, costAttribute)
+
+    def getRoutingEdgesAttributesSQL(self):
+        """
+        Attributes and geometry of every edge, with the same columns retrieved by ``getShortestPath``.
+
+        :return: SQL sentence.
+        """
+        return "SELECT " \
+               "e.id AS id, " \
+               "e.AJOSUUNTA::integer AS direction," \
+               "e.pituus AS distance," \
+               "e.digiroa_aa AS speed_limit_time," \
+               "e.kokopva_aa AS day_avg_delay_time," \
+               "e.keskpva_aa AS midday_delay_time," \
+               "e.ruuhka_aa AS rush_hour_delay_time," \
+               "ST_SnapToGrid(e.the_geom, 0.00000001) AS geom " \
+               "FROM table_name AS e".replace("table_name", self.tableName)
+
+    def getRoutableVerticesSQL(self):
+        """
+        Vertices with at least one edge that can be used by the transport mode, the same vertices considered by
+        ``getNearestRoutableVertexFromAPoint``.
+
+        :return: SQL sentence retrieving id, x and y of every routable vertex.
+        """
+        return "SELECT " \
+               "v.id," \
+               "ST_X(v.the_geom)," \
+               "ST_Y(v.the_geom) " \
+               "FROM table_name_vertices_pgr AS v " \
+               "WHERE v.id IN (" \
+               "SELECT e.source FROM table_name AS e " \
+               "UNION " \
+               "SELECT e.target FROM table_name AS e)".replace("table_name", self.tableName)
+
+    def getRoutableEdgesSQL(self):
+        """
+        Edges that can be used by the transport mode, in any direction, with their geometry.
+
+        :return: SQL sentence retrieving id, source, target and the WKB geometry of every routable edge.
+        """
+        return "SELECT " \
+               "e.id," \
+               "e.source," \
+               "e.target," \
+               "ST_AsBinary(ST_LineMerge(e.the_geom)) " \
+               "FROM table_name AS e".replace("table_name", self.tableName)
+
+    def getRoutableVerticesTableName(self):
+        return "table_name_osm_private_car_routable_vertices".replace("table_name", self.tableName)
+
     def getEPSGCode(self):
         return self.epsgCode
@@ -14,6 +14,7 @@ from src.main import carRoutingExceptions as exc
 from src.main.entities import Point
 
 from pandas.io.json import json_normalize
+from pyproj import Geod, Transformer
 
 
 def enum(**enums):
@@ -93,6 +94,26 @@ def createPointFromPointFeature(newFeaturePoint, epsgCode):
     return nearestStartPoint
 
 
+def getCRSUnitsPerMeter(coordinates, epsgCode):
+    """
+    Scale of the CRS at every point, so that a distance in meters can be compared with the distances measured in the
+    CRS units (i.e. EPSG:3857 stretches the distances by 1 / cos(latitude), about 2 at the latitude of Helsinki).
+
+    :param coordinates: (number of points x 2) coordinates, in the given CRS.
+    :param epsgCode: CRS of the coordinates.
+    :return: CRS units per meter at every point.
+    """
+    coordinates = numpy.asarray(coordinates, dtype=numpy.float64).reshape(-1, 2)
+    pointCount = len(coordinates)
+    # Every point is measured to the point one unit to its east and back, so that the arrays never have a single
+    # element (pyproj handles them as scalars).
+    transformer = Transformer.from_crs(epsgCode, "EPSG:4326", always_xy=True)
+    lng, lat = transformer.transform(numpy.tile(coordinates[:, 0], 2) + numpy.repeat([0, 1], pointCount),
+                                     numpy.tile(coordinates[:, 1], 2))
+    _, _, meters = Geod(ellps="WGS84").inv(lng, lat, numpy.roll(lng, pointCount), numpy.roll(lat, pointCount))
+    return 1 / numpy.asarray(meters, dtype=numpy.float64)[:pointCount]
+
+
 def dgl_timer(func):
     def func_wrapper(*args, **kwargs):
         timerEnabled = "True".__eq__(getConfigurationProperties(section="WFS_CONFIG")["timerEnabled"])
@@ -298,6 +319,56 @@ class FileActions:
         }
         return newJson
 
+    def convertCostArraysToGeojson(self, startVerticesID, endVerticesID, totalCosts, startCoordinates=None,
+                                   endCoordinates=None):
+        """
+        Create the cost summary geojson (same format as ``convertToGeojson``) from the columns of the summary, with
+        one LineString (start vertex -> end vertex) per pair, or without geometries if the coordinates are not given.
+
+        :param startVerticesID: Start vertex id of every pair.
+        :param endVerticesID: End vertex id of every pair.
+        :param totalCosts: Total cost of every pair.
+        :param startCoordinates: (number of pairs x 2) coordinates of the start vertices.
+        :param endCoordinates: (number of pairs x 2) coordinates of the end vertices.
+        :return: Cost summary geojson.
+        """
+        startVerticesID = numpy.asarray(startVerticesID).tolist()
+        endVerticesID = numpy.asarray(endVerticesID).tolist()
+        totalCosts = numpy.asarray(totalCosts).tolist()
+        if startCoordinates is not None:
+            startCoordinates = numpy.asarray(startCoordinates).tolist()
+            endCoordinates = numpy.asarray(endCoordinates).tolist()
+
+        features = []
+        for i in range(len(startVerticesID)):
+            geometry = None
+            if startCoordinates is not None:
+                geometry = {
+                    "type": "LineString",
+                    "coordinates": [startCoordinates[i], endCoordinates[i]]
+                }
+            features.append({
+                "id": str(i),
+                "type": "Feature",
+                "properties": {
+                    "start_vertex_id": startVerticesID[i],
+                    "end_vertex_id": endVerticesID[i],
+                    "total_cost": totalCosts[i]
+                },
+                "geometry": geometry
+            })
+
+        return {
+            "type": "FeatureCollection",
+            "features": features,
+            "crs": {
+                "properties": {
+                    "name": "urn:ogc:def:crs:%s" % (GPD_CRS.PSEUDO_MERCATOR["init"].replace(":", "::"))
+                },
+                "type": "name"
+            }
+        }
+
     def writeFile(self, folderPath, filename, data):
         if not os.path.exists(folderPath):
             os.makedirs(folderPath)
@@ -369,6 +440,45 @@ class FileActions:
                 writer.writerow(valueList)
 
 
+class CostSummaryAccumulator:
+    def __init__(self, columnsNumber):
+        """
+        Accumulate the cost summary blocks as columns (start vertex ids, end vertex ids, total costs and, optionally,
+        start x, start y, end x and end y). The blocks are only kept in a list and concatenated once, so that
+        merging any number of blocks takes linear time and memory.
+
+        :param columnsNumber: Number of columns of every block, 3 without geometries or 7 with the vertex coordinates.
+        """
+        self.columnsNumber = columnsNumber
+        self.blocks = []
+
+    def add(self, columns):
+        """
+        :param columns: List with one array per column of the block.
+        """
+        if len(columns[0]) > 0:
+            self.blocks.append(columns)
+
+    def getColumns(self):
+        """
+        :return: List with one array per column, containing the rows of all the blocks.
+        """
+        return [numpy.concatenate([block[i] for block in self.blocks] or [numpy.empty(0)])
+                for i in range(self.columnsNumber)]
+
+    def toGeojson(self):
+        """
+        :return: Cost summary geojson, with LineString geometries if the blocks contain the vertex coordinates.
+        """
+        columns = self.getColumns()
+        self.blocks = []
+        if self.columnsNumber == 7:
+            return FileActions().convertCostArraysToGeojson(columns[0], columns[1], columns[2],
+                                                            numpy.column_stack(columns[3:5]),
+                                                            numpy.column_stack(columns[5:7]))
+        return FileActions().convertCostArraysToGeojson(columns[0], columns[1], columns[2])
+
+
 def parallel_job_print(msg, msg_args):
     """ Display the message on stout or stderr depending on verbosity
     """
@@ -0,0 +1,86 @@
+import threading
+import time
+import unittest
+
+import psycopg2
+
+from src.main.connection.PostgisConnectionPool import PostgisConnectionPool
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, sql):
+        if self.connection.broken:
+            self.connection.closed = 2
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+    def fetchall(self):
+        return [(1,)]
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+class PostgisConnectionPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.createdConnections = []
+
+        def connectionFactory():
+            con = FakeConnection()
+            self.createdConnections.append(con)
+            return con
+
+        self.pool = PostgisConnectionPool(connectionFactory, size=2, healthCheckInterval=60)
+
+    def test_givenSequentialQueries_then_reuseTheSameConnection(self):
+        for _ in range(5):
+            with self.pool.connection() as con:
+                con.cursor().execute("SELECT 1")
+
+        self.assertEqual(1, len(self.createdConnections))
+
+    def test_givenMoreThreadsThanConnections_then_neverOpenMoreThanThePoolSize(self):
+        def query():
+            with self.pool.connection():
+                time.sleep(0.05)
+
+        threads = [threading.Thread(target=query) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(2, len(self.createdConnections))
+
+    def test_givenABrokenConnection_then_replaceIt(self):
+        with self.pool.connection() as con:
+            pass
+        con.broken = True
+
+        self.pool.healthCheckInterval = 0
+        with self.pool.connection() as newCon:
+            self.assertIsNot(con, newCon)
+        self.assertTrue(con.closed)
+
+    def test_givenAConnectionErrorInsideTheBlock_then_discardTheConnection(self):
+        with self.assertRaises(psycopg2.OperationalError):
+            with self.pool.connection() as con:
+                con.broken = True
+                con.cursor().execute("SELECT 1")
+
+        with self.pool.connection() as newCon:
+            self.assertIsNot(con, newCon)
@@ -1,7 +1,10 @@
 import os
+import re
+import struct
 import unittest
 
-from src.main.connection.PostgisServiceProvider import PostgisServiceProvider
+from src.main.connection.PostgisServiceProvider import PostgisServiceProvider, decodeBinaryCopy, \
+    BINARY_COPY_SIGNATURE
 from src.main.logic.Operations import Operations
 from src.main.util import FileActions
 
@@ -38,6 +41,193 @@ class PostgisServiceProviderTest(unittest.TestCase):
         print(uuid)
         self.assertIsNotNone(uuid)
 
+    def test_givenTheSameTemplate_then_prepareItOncePerConnection(self):
+        class RecordingCursor:
+            def __init__(self, statements):
+                self.statements = statements
+
+            def execute(self, sql):
+                self.statements.append(sql)
+
+        class RecordingConnection:
+            def __init__(self):
+                self.preparedStatements = set()
+                self.statements = []
+
+            def cursor(self):
+                return RecordingCursor(self.statements)
+
+        connection = RecordingConnection()
+        template = "SELECT * FROM pgr_dijkstraCost('SELECT 1', $1, $2)"
+        name = self.postgisServiceProvider.prepareStatement(connection, template, ["bigint", "bigint"])
+        self.assertEqual(name,
+                         self.postgisServiceProvider.prepareStatement(connection, template, ["bigint", "bigint"]))
+        self.assertNotEqual(name, self.postgisServiceProvider.prepareStatement(connection, template,
+                                                                               ["bigint[]", "bigint[]"]))
+
+        self.assertEqual(["PREPARE %s (bigint,bigint) AS %s" % (name, template)], connection.statements[:1])
+        self.assertEqual(2, len(connection.statements))
+
+    def test_givenABinaryCopy_then_decodeEveryColumnIntoAnArray(self):
+        rows = [(10, 20, 125.5), (10, 21, 300.0), (11, 20, 0.25)]
+        data = BINARY_COPY_SIGNATURE + struct.pack(">ii", 0, 0)
+        for startVertexId, endVertexId, totalCost in rows:
+            data += struct.pack(">hiqiqid", 3, 8, startVertexId, 8, endVertexId, 8, totalCost)
+        data += struct.pack(">h", -1)
+
+        startVerticesID, endVerticesID, totalCosts = decodeBinaryCopy(data, ["i8", "i8", "f8"])
+
+        self.assertEqual([10, 10, 11], startVerticesID.tolist())
+        self.assertEqual([20, 21, 20], endVerticesID.tolist())
+        self.assertEqual([125.5, 300.0, 0.25], totalCosts.tolist())
+
+        nullRow = BINARY_COPY_SIGNATURE + struct.pack(">ii", 0, 0) + struct.pack(">hiqiqi", 3, 8, 10, 8, 20, -1) + \
+                  struct.pack(">h", -1)
+        with self.assertRaises(ValueError):
+            decodeBinaryCopy(nullRow, ["i8", "i8", "f8"])
+
+    def streamBlocks(self, fetchRowChunks, blocks, connections):
+        class StreamingConnection:
+            def __init__(self):
+                self.closed = False
+                self.statements = []
+
+            def cursor(self):
+                return self
+
+            def execute(self, sql):
+                self.statements.append(sql)
+
+            def rollback(self):
+                pass
+
+            def commit(self):
+                pass
+
+        def runWithPooledConnection(function):
+            # Same retry as the pooled one: once again with a new connection if the connection was lost.
+            for attempt in range(2):
+                con = StreamingConnection()
+                connections.append(con)
+                try:
+                    return function(con)
+                except Exception:
+                    if attempt > 0 or not con.closed:
+                        raise
+
+        self.postgisServiceProvider.runWithPooledConnection = runWithPooledConnection
+        self.postgisServiceProvider.stageVertices = lambda con, start, end: ("start_vertices", "end_vertices")
+        self.postgisServiceProvider.fetchRowChunks = fetchRowChunks
+        return list(self.postgisServiceProvider.executeStagedReturningRowChunks(
+            "SELECT * FROM pgr_dijkstraCost('SELECT 1', %s, %s, true)", [10, 11, 12], [20, 21], blocks, chunkSize=2,
+            jobs=2))
+
+    def test_givenSeveralBlocks_then_streamAllTheirChunks(self):
+        results = {
+            0: [[(10, 20, 10.0), (10, 21, 11.0)], [(11, 20, 12.0)]],
+            2: [[(12, 20, 20.0)]]
+        }
+
+        def fetchRowChunks(con, sql, chunkSize, skippedRows=0):
+            return iter(results[int(re.findall(r"position >= (\d+)", sql)[0])])
+
+        connections = []
+        chunks = self.streamBlocks(fetchRowChunks, [(0, 2, 0, 2), (2, 4, 0, 2)], connections)
+
+        self.assertEqual(3, len(chunks))
+        self.assertEqual(sorted([(10, 20, 10.0), (10, 21, 11.0), (11, 20, 12.0), (12, 20, 20.0)]),
+                         sorted(row for rows in chunks for row in rows))
+        for con in connections:
+            self.assertEqual(["DROP TABLE start_vertices, end_vertices"], con.statements)
+
+    def test_givenALostConnection_then_streamTheRestOfTheBlockWithANewConnection(self):
+        rows = [(10, 20, 10.0), (10, 21, 11.0), (11, 20, 12.0), (11, 21, 13.0), (12, 20, 14.0)]
+
+        def fetchRowChunks(con, sql, chunkSize, skippedRows=0):
+            for bottomLimit in range(skippedRows, len(rows), chunkSize):
+                if bottomLimit >= 2 and skippedRows == 0:
+                    con.closed = True
+                    raise ValueError("connection lost")
+                yield rows[bottomLimit:bottomLimit + chunkSize]
+
+        connections = []
+        chunks = self.streamBlocks(fetchRowChunks, [(0, 3, 0, 2)], connections)
+
+        self.assertEqual(rows, [row for rows in chunks for row in rows])
+        self.assertEqual(2, len(connections))
+
+    def test_givenAFailingQuery_then_raiseItWhileStreaming(self):
+        def fetchRowChunks(con, sql, chunkSize, skippedRows=0):
+            raise ValueError("broken query")
+
+        connections = []
+        with self.assertRaises(ValueError):
+            self.streamBlocks(fetchRowChunks, [(0, 2, 0, 2)], connections)
+        self.assertEqual(1, len(connections))
+
+    def test_givenSeveralBlocks_then_stageTheVerticesOncePerConnection(self):
+        class StagingCursor:
+            def __init__(self, connection):
+                self.connection = connection
+
+            def execute(self, sql):
+                self.connection.statements.append(sql)
+
+            def fetchall(self):
+                return [("1234-abcd",)]
+
+            def copy_from(self, buffer, tableName, columns):
+                self.connection.stagedTables[tableName] = buffer.read()
+
+            def copy_expert(self, sql, buffer):
+                self.connection.statements.append(sql)
+                if self.connection.failing:
+                    raise ValueError("broken query")
+                startBottomLimit, endBottomLimit = [int(limit) for limit in re.findall(r"position >= (\d+)", sql)]
+                buffer.write(BINARY_COPY_SIGNATURE + struct.pack(">ii", 0, 0) +
+                             struct.pack(">hiqiq", 2, 8, startBottomLimit, 8, endBottomLimit) + struct.pack(">h", -1))
+
+        class StagingConnection:
+            def __init__(self):
+                self.statements = []
+                self.stagedTables = {}
+                self.closed = 0
+                self.failing = False
+
+            def cursor(self):
+                return StagingCursor(self)
+
+            def commit(self):
+                pass
+
+            def rollback(self):
+                self.statements.append("ROLLBACK")
+
+        connection = StagingConnection()
+        self.postgisServiceProvider.runWithPooledConnection = lambda function: function(connection)
+
+        blocks = [(0, 2, 0, 2), (0, 2, 2, 4), (2, 3, 0, 2), (2, 3, 2, 4)]
+        results = self.postgisServiceProvider.executeStagedCopyReturningArrays(
+            "SELECT * FROM pgr_dijkstraCost('SELECT 1', %s, %s, true)", ["i8", "i8"],
+            [10, 11, 12], [20, 21, 22, 23], blocks)
+
+        self.assertEqual([[0, 0], [0, 2], [2, 0], [2, 2]],
+                         [[int(column[0]) for column in columns] for columns in results])
+        self.assertEqual({"dora_start_vertices_1234_abcd": "0\t10\n1\t11\n2\t12\n",
+                          "dora_end_vertices_1234_abcd": "0\t20\n1\t21\n2\t22\n3\t23\n"},
+                         connection.stagedTables)
+        self.assertIn("DROP TABLE dora_start_vertices_1234_abcd, dora_end_vertices_1234_abcd",
+                      connection.statements)
+
+        connection.statements = []
+        connection.failing = True
+        with self.assertRaises(ValueError):
+            self.postgisServiceProvider.executeStagedCopyReturningArrays(
+                "SELECT * FROM pgr_dijkstraCost('SELECT 1', %s, %s, true)", ["i8", "i8"],
+                [10, 11, 12], [20, 21, 22, 23], blocks)
+        self.assertEqual(["ROLLBACK", "DROP TABLE dora_start_vertices_1234_abcd, dora_end_vertices_1234_abcd"],
+                         connection.statements[-2:])
+
     def test_bucle(self):
         arrayList = [0, 1, 2, 3, 4, 5, 6, 7, 8]
         expected = [[0, 3], [4, 7], [8, 8]]
@@ -0,0 +1,190 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+import zipfile
+
+import numpy as np
+import shapely
+from joblib import Parallel, delayed
+
+from src.main.logic.DORARouterAnalyst import DORARouterAnalyst, extractFeatureInformation
+from src.main.routing.EdgeSnapper import EdgeSnapper
+from src.main.routing.StronglyConnectedComponents import StronglyConnectedComponents
+from src.main.util import getConfigurationProperties
+
+
+class SlowSnapper:
+    def __init__(self, failures=0):
+        """
+        Snapper that takes its time and counts its calls, so that the concurrent lookups of a point overlap.
+
+        :param failures: Number of first calls that raise an error.
+        """
+        self.calls = 0
+        self.failures = failures
+        self.lock = threading.Lock()
+
+    def snap(self, coordinates):
+        with self.lock:
+            self.calls += 1
+            calls = self.calls
+        time.sleep(0.2)
+        if calls <= self.failures:
+            raise RuntimeError("Snapping failed")
+        return np.array([27]), np.array([[1.0, 2.0]]), np.array([0.5])
+
+
+class TransportMode:
+    def getEPSGCode(self):
+        return "EPSG:3857"
+
+    def getTotalShortestPathCostManyToManyColumns(self, startVerticesID, endVerticesID, costAttribute):
+        pairs = [(startVertexID, endVertexID) for startVertexID in startVerticesID for endVertexID in endVerticesID]
+        return [np.array([startVertexID for startVertexID, _ in pairs]),
+                np.array([endVertexID for _, endVertexID in pairs]),
+                np.ones(len(pairs))]
+
+
+class RoutingTransportMode:
+    def __init__(self, totalCosts):
+        """
+        :param totalCosts: Dictionary of total cost by (start vertex, end vertex).
+        """
+        self.totalCosts = totalCosts
+        self.shortestPaths = []
+
+    def getTotalShortestPathCostManyToMany(self, startVerticesID, endVerticesID, costAttribute):
+        return {"features": [{"properties": {"start_vertex_id": startVertexID,
+                                             "end_vertex_id": endVertexID,
+                                             "total_cost": self.totalCosts[(startVertexID, endVertexID)]}}
+                             for startVertexID in startVerticesID for endVertexID in endVerticesID
+                             if (startVertexID, endVertexID) in self.totalCosts]}
+
+    def getShortestPath(self, startVertexId, endVertexId, cost):
+        self.shortestPaths.append((startVertexId, endVertexId))
+        return {"type": "FeatureCollection", "features": []}
+
+
+class DORARouterAnalystTest(unittest.TestCase):
+    def setUp(self):
+        self.doraRouterAnalyst = DORARouterAnalyst(None)
+        self.pointIdentifierKey = getConfigurationProperties(section="WFS_CONFIG")["point_identifier"]
+
+    def createPointFeature(self, pointId):
+        return {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [pointId, pointId]},
+            "properties": {self.pointIdentifierKey: pointId}
+        }
+
+    def test_givenPointsProjectedOntoEdges_then_routeTheCheapestPairOfEdgeVerticesWithThePartialEdges(self):
+        # Edge 1: 10 -> 11 (both directions, cost 100), edge 2: 11 -> 12 (one way, cost 50), 1000 m long each.
+        snapper = EdgeSnapper(edgeIds=[1, 2], sources=[10, 11], targets=[11, 12],
+                              geometries=shapely.from_wkt(["LINESTRING (0 0, 1000 0)",
+                                                           "LINESTRING (1000 0, 1000 1000)"]))
+        snapper.edgeCosts["cost"] = {1: (100.0, 100.0), 2: (50.0, -1.0)}
+        vertexIds, projectedCoordinates, edgeProperties = snapper.project([[200, 30], [990, 900]])
+        startPointFeature, endPointFeature = [
+            {"properties": dict(properties, vertex_id=int(vertexId), nearestVertexCoordinates=coordinates.tolist())}
+            for vertexId, coordinates, properties in zip(vertexIds, projectedCoordinates, edgeProperties)]
+
+        transportMode = RoutingTransportMode({(10, 11): 100.0, (10, 12): 150.0, (11, 12): 50.0})
+        self.doraRouterAnalyst.transportMode = transportMode
+        self.doraRouterAnalyst.snapper = snapper
+        startVertexId, endVertexId, shortestPath = self.doraRouterAnalyst.selectPartialEdgeShortestPath(
+            "cost", startPointFeature, endPointFeature)
+
+        # Via the vertex 11: 80 to reach it from the start point and 45 from it to the end point.
+        self.assertEqual((11, 11), (startVertexId, endVertexId))
+        self.assertEqual([(11, 11)], transportMode.shortestPaths)
+        self.assertEqual([1, 2], [feature["properties"]["id"] for feature in shortestPath["features"]])
+        self.assertTrue(np.allclose([80, 45], [feature["properties"]["cost"] for feature in shortestPath["features"]]))
+        self.assertTrue(np.allclose([[200, 0], [1000, 0]], shortestPath["features"][0]["geometry"]["coordinates"]))
+        self.assertTrue(np.allclose([[1000, 0], [1000, 900]], shortestPath["features"][1]["geometry"]["coordinates"]))
+        self.assertEqual([0, 1], [feature["properties"]["seq"] for feature in shortestPath["features"]])
+
+    def test_givenUnsnappedPoints_then_dropThem(self):
+        features = [self.createPointFeature(pointId) for pointId in range(4)]
+        verticesID, features = self.doraRouterAnalyst.dropUnsnappedFeatures([10, -1, float("nan"), 20], features)
+
+        self.assertEqual([10, 20], verticesID)
+        self.assertEqual([0, 3], [feature["properties"][self.pointIdentifierKey] for feature in features])
+
+    def lookUpConcurrently(self, snapper, lookups=8):
+        self.doraRouterAnalyst.snapper = snapper
+        transportMode = TransportMode()
+
+        def lookUp():
+            try:
+                return extractFeatureInformation(self.doraRouterAnalyst, "EPSG:3857", self.createPointFeature(5),
+                                                 transportMode, self.doraRouterAnalyst.operations)
+            except RuntimeError as err:
+                return err
+
+        return Parallel(n_jobs=lookups, backend="threading")(delayed(lookUp)() for _ in range(lookups))
+
+    def test_givenConcurrentLookupsOfAPoint_then_snapItOnlyOnce(self):
+        snapper = SlowSnapper()
+        returns = self.lookUpConcurrently(snapper)
+
+        self.assertEqual(1, snapper.calls)
+        self.assertEqual([27] * len(returns), [vertexID for vertexID, _ in returns])
+        self.assertEqual({}, self.doraRouterAnalyst.nearestVerticesInFlight)
+
+    def test_givenTheSnappingOwnerFails_then_theWaitingLookupsSnapThePointAgain(self):
+        snapper = SlowSnapper(failures=1)
+        returns = self.lookUpConcurrently(snapper)
+
+        errors = [result for result in returns if isinstance(result, RuntimeError)]
+        self.assertEqual(1, len(errors))
+        self.assertEqual(2, snapper.calls)
+        self.assertEqual([27] * (len(returns) - 1), [result[0] for result in returns if result not in errors])
+        self.assertEqual({}, self.doraRouterAnalyst.nearestVerticesInFlight)
+
+    def test_givenCostSummaryChunks_then_writeARowPerPairOfPoints(self):
+        def createPointFeature(pointId, vertexID):
+            feature = self.createPointFeature(pointId)
+            feature["properties"]["vertex_id"] = vertexID
+            return feature
+
+        def calculateCostChunks(startVerticesID, endVerticesID):
+            self.assertEqual(([1, 4], [2, 3]), (startVerticesID, endVerticesID))
+            yield np.array([1, 1]), np.array([2, 3]), np.array([10.0, 20.0])
+            yield np.array([4]), np.array([2]), np.array([30.0])
+
+        self.doraRouterAnalyst.insertAdditionalProperties = lambda startPointFeature, endPointFeature: {
+            "startPoint_EuclideanDistanceWalkingTime": startPointFeature["properties"][self.pointIdentifierKey] / 100,
+            "startPoint_AVGWalkingDistanceWalkingTime": 1,
+            "endPoint_ParkingTime": 0,
+            "endPoint_AVGWalkingDistanceWalkingTime": 1,
+            "endPoint_EuclideanDistanceWalkingTime": 1
+        }
+        startPoints = [createPointFeature(100, 1), createPointFeature(200, 4), createPointFeature(300, 1)]
+        endPoints = [createPointFeature(400, 2), createPointFeature(500, 3)]
+
+        with tempfile.TemporaryDirectory() as folder:
+            self.doraRouterAnalyst.createCsvSummary("pituus", startPoints, endPoints, folder, "summary",
+                                                    calculateCostChunks)
+            with zipfile.ZipFile(os.path.join(folder, "summary", "summary_csv.zip")) as summaryZip:
+                lines = summaryZip.read(summaryZip.namelist()[0]).decode().splitlines()
+
+        separator = getConfigurationProperties(section="WFS_CONFIG")["csv_separator"]
+        self.assertEqual(separator.join(["ykr_from_id", "ykr_to_id", "travel_time"]), lines[0])
+        self.assertEqual(sorted([(100, 400, 14.0), (300, 400, 16.0), (100, 500, 24.0), (300, 500, 26.0),
+                                 (200, 400, 35.0)]),
+                         sorted((int(startId), int(endId), float(travelTime))
+                                for startId, endId, travelTime in (line.split(separator) for line in lines[1:])))
+
+    def test_givenStronglyConnectedComponents_then_calculateTheCostColumnsOnlyWithinEveryComponent(self):
+        self.doraRouterAnalyst.transportMode = TransportMode()
+        self.doraRouterAnalyst.stronglyConnectedComponents = {
+            "pituus": StronglyConnectedComponents(vertexIds=[1, 2, 3, 4], labels=[0, 0, 1, 1])
+        }
+
+        startVerticesID, endVerticesID, totalCosts = self.doraRouterAnalyst.calculateTotalColumns([1, 3], [2, 4, 5],
+                                                                                                  "pituus")
+
+        self.assertEqual([(1, 2), (3, 4)], list(zip(startVerticesID.tolist(), endVerticesID.tolist())))
+        self.assertEqual([1.0, 1.0], totalCosts.tolist())
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.main.carRoutingExceptions import OutdatedNetworkException
+from src.main.routing.AltEngine import AltEngine
+from src.main.routing.DijkstraEngine import DijkstraEngine
+from src.main.routing.Landmarks import Landmarks
+from src.main.routing.RoutingGraph import RoutingGraph
+
+
+class AltEngineTest(unittest.TestCase):
+    def setUp(self):
+        random = np.random.RandomState(11)
+        edgeCount = 400
+        self.routingGraph = RoutingGraph.fromEdges(
+            edgeIds=np.arange(1, edgeCount + 1),
+            sources=random.randint(0, 120, edgeCount),
+            targets=random.randint(0, 120, edgeCount),
+            costs=random.randint(0, 10, edgeCount).astype(float),
+            reverseCosts=np.where(random.rand(edgeCount) < 0.5, random.randint(0, 10, edgeCount), -1)
+        )
+        self.landmarks = Landmarks.select(self.routingGraph, landmarkCount=4)
+        self.vertexIndexes = np.arange(self.routingGraph.getVertexCount())
+
+    def test_givenLandmarks_then_theHeuristicIsALowerBound(self):
+        costs = DijkstraEngine(self.routingGraph).calculateCosts(self.vertexIndexes, self.vertexIndexes)
+        for vertexIndex in self.vertexIndexes[::3]:
+            for endIndex in self.vertexIndexes[::7]:
+                self.assertLessEqual(self.landmarks.getHeuristic(vertexIndex, endIndex), costs[vertexIndex, endIndex])
+
+    def test_givenLandmarks_then_theAStarPathsHaveTheDijkstraCost(self):
+        dijkstraEngine = DijkstraEngine(self.routingGraph)
+        altEngine = AltEngine(self.routingGraph, self.landmarks)
+        for startIndex in self.vertexIndexes[::5]:
+            shortestPathTree = dijkstraEngine.calculateShortestPathTree(startIndex)
+            for endIndex in self.vertexIndexes[::3]:
+                edgeIds = altEngine.calculateShortestPath(startIndex, endIndex)
+                expectedEdgeIds = shortestPathTree.getEdgeIds(endIndex)
+                self.assertEqual(len(expectedEdgeIds) == 0, len(edgeIds) == 0)
+                self.assertEqual(self.getPathCost(startIndex, expectedEdgeIds), self.getPathCost(startIndex, edgeIds))
+
+    def test_givenStoredLandmarks_then_loadTheSameTables(self):
+        with tempfile.TemporaryDirectory() as folder:
+            pathPrefix = os.path.join(folder, "edges_distance")
+            self.assertFalse(Landmarks.exists(pathPrefix))
+            self.landmarks.save(pathPrefix)
+            self.assertTrue(Landmarks.exists(pathPrefix))
+            landmarks = Landmarks.load(pathPrefix)
+            self.assertEqual(self.landmarks.landmarkIndexes.tolist(), landmarks.landmarkIndexes.tolist())
+            self.assertTrue(np.array_equal(self.landmarks.forwardCosts, landmarks.forwardCosts))
+            self.assertTrue(np.array_equal(self.landmarks.backwardCosts, landmarks.backwardCosts))
+            del landmarks
+
+    def test_givenLandmarksOfAModifiedGraph_then_refuseToLoadThem(self):
+        # The first vertex is removed from the network, the indexes of all the other vertices are shifted.
+        vertexIds = self.routingGraph.vertexIds[1:]
+        modifiedGraph = RoutingGraph.fromEdges(edgeIds=[1], sources=vertexIds[:1], targets=vertexIds[1:2], costs=[1],
+                                               reverseCosts=[-1], vertexIds=vertexIds)
+        with tempfile.TemporaryDirectory() as folder:
+            pathPrefix = os.path.join(folder, "edges_distance")
+            Landmarks.select(self.routingGraph, landmarkCount=4, fingerprint="100_120_-3_7").save(pathPrefix)
+
+            landmarks = Landmarks.load(pathPrefix, self.routingGraph, "100_120_-3_7")
+            self.assertEqual(self.routingGraph.vertexIds.tolist(), landmarks.vertexIds.tolist())
+            del landmarks
+            with self.assertRaises(OutdatedNetworkException):
+                Landmarks.load(pathPrefix, modifiedGraph, "100_120_-3_7")
+            with self.assertRaises(OutdatedNetworkException):
+                Landmarks.load(pathPrefix, self.routingGraph, "100_120_-3_8")
+
+    def getPathCost(self, startIndex, edgeIds):
+        totalCost = 0
+        vertexIndex = startIndex
+        for edgeId in edgeIds:
+            arcPositions = [position for position in range(self.routingGraph.indptr[vertexIndex],
+                                                           self.routingGraph.indptr[vertexIndex + 1])
+                            if self.routingGraph.edgeIds[position] == edgeId]
+            self.assertEqual(1, len(arcPositions))
+            totalCost += self.routingGraph.weights[arcPositions[0]]
+            vertexIndex = self.routingGraph.heads[arcPositions[0]]
+        return totalCost
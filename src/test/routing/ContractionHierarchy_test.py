@@ -0,0 +1,140 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.main.carRoutingExceptions import OutdatedNetworkException
+from src.main.routing.ContractionHierarchy import ContractionHierarchy
+from src.main.routing.ContractionHierarchyEngine import ContractionHierarchyEngine
+from src.main.routing.DijkstraEngine import DijkstraEngine
+from src.main.routing.PhastEngine import PhastEngine
+from src.main.routing.RoutingGraph import RoutingGraph
+
+
+class ContractionHierarchyTest(unittest.TestCase):
+    def setUp(self):
+        random = np.random.RandomState(7)
+        edgeCount = 400
+        self.sources = random.randint(0, 120, edgeCount)
+        self.targets = random.randint(0, 120, edgeCount)
+        self.costs = random.randint(0, 10, edgeCount).astype(float)
+        self.reverseCosts = np.where(random.rand(edgeCount) < 0.5, self.costs, -1)
+        self.routingGraph = RoutingGraph.fromEdges(
+            edgeIds=np.arange(1, edgeCount + 1),
+            sources=self.sources,
+            targets=self.targets,
+            costs=self.costs,
+            reverseCosts=self.reverseCosts
+        )
+        self.contractionHierarchy = ContractionHierarchy.contract(self.routingGraph)
+        self.vertexIndexes = np.arange(self.routingGraph.getVertexCount())
+
+    def test_givenAContractionHierarchy_then_theCostsAreEqualToDijkstra(self):
+        expectedCosts = DijkstraEngine(self.routingGraph).calculateCosts(self.vertexIndexes, self.vertexIndexes)
+        costs = ContractionHierarchyEngine(self.contractionHierarchy).calculateCosts(self.vertexIndexes,
+                                                                                    self.vertexIndexes)
+        self.assertTrue(np.array_equal(expectedCosts, costs))
+
+    def test_givenCappedWitnessSearches_then_theCostsAreStillEqualToDijkstra(self):
+        expectedCosts = DijkstraEngine(self.routingGraph).calculateCosts(self.vertexIndexes, self.vertexIndexes)
+        contractionHierarchy = ContractionHierarchy.contract(self.routingGraph, witnessSettledLimit=3,
+                                                             witnessHopLimit=1)
+        costs = ContractionHierarchyEngine(contractionHierarchy).calculateCosts(self.vertexIndexes,
+                                                                               self.vertexIndexes)
+        self.assertTrue(np.array_equal(expectedCosts, costs))
+        self.assertGreaterEqual(len(contractionHierarchy.upwardGraph.heads),
+                                len(self.contractionHierarchy.upwardGraph.heads))
+
+    def test_givenBlocksOfStartVertices_then_reuseTheBucketsOfTheEndVertices(self):
+        expectedCosts = DijkstraEngine(self.routingGraph).calculateCosts(self.vertexIndexes, self.vertexIndexes)
+        contractionHierarchyEngine = ContractionHierarchyEngine(self.contractionHierarchy)
+        buckets = contractionHierarchyEngine.getBuckets(self.vertexIndexes)
+
+        costs = np.vstack([contractionHierarchyEngine.calculateCosts(self.vertexIndexes[bottomLimit:bottomLimit + 50],
+                                                                     self.vertexIndexes)
+                           for bottomLimit in range(0, len(self.vertexIndexes), 50)])
+        self.assertTrue(np.array_equal(expectedCosts, costs))
+        self.assertIs(buckets, contractionHierarchyEngine.getBuckets(self.vertexIndexes))
+        self.assertIsNot(buckets, contractionHierarchyEngine.getBuckets(self.vertexIndexes, maxCost=6))
+
+    def test_givenAContractionHierarchy_then_thePhastCostsAreEqualToDijkstra(self):
+        expectedCosts = DijkstraEngine(self.routingGraph).calculateCosts(self.vertexIndexes, self.vertexIndexes)
+        costs = PhastEngine(self.contractionHierarchy).calculateCosts(self.vertexIndexes, self.vertexIndexes)
+        self.assertTrue(np.array_equal(expectedCosts, costs))
+
+    def test_givenASubsetOfEndVertices_then_theRestrictedPhastCostsAreEqualToDijkstra(self):
+        startIndexes = self.vertexIndexes[::4]
+        endIndexes = [7, 3, 50, 3]
+        expectedCosts = DijkstraEngine(self.routingGraph).calculateCosts(startIndexes, endIndexes)
+        phastEngine = PhastEngine(self.contractionHierarchy)
+        self.assertTrue(np.array_equal(expectedCosts, phastEngine.calculateCosts(startIndexes, endIndexes)))
+        self.assertLess(sum(len(levelVertices) for levelVertices in phastEngine.getSweepLevels(endIndexes)),
+                        sum(len(levelVertices) for levelVertices in phastEngine.sweepLevels))
+
+    def test_givenAMaxCost_then_thePairsOverItAreUnreachable(self):
+        expectedCosts = DijkstraEngine(self.routingGraph).calculateCosts(self.vertexIndexes, self.vertexIndexes)
+        expectedCosts[expectedCosts > 6] = np.inf
+        for contractionHierarchyEngine in (ContractionHierarchyEngine(self.contractionHierarchy),
+                                           PhastEngine(self.contractionHierarchy)):
+            costs = contractionHierarchyEngine.calculateCosts(self.vertexIndexes, self.vertexIndexes, maxCost=6)
+            self.assertTrue(np.array_equal(expectedCosts, costs))
+
+    def test_givenTheReverseHierarchy_then_theCostsAreTransposed(self):
+        expectedCosts = DijkstraEngine(self.routingGraph).calculateCosts(self.vertexIndexes, self.vertexIndexes)
+        for contractionHierarchyEngine in (ContractionHierarchyEngine(self.contractionHierarchy),
+                                           PhastEngine(self.contractionHierarchy)):
+            reverseEngine = contractionHierarchyEngine.getReverseEngine()
+            self.assertIsInstance(reverseEngine, type(contractionHierarchyEngine))
+            costs = reverseEngine.calculateCosts(self.vertexIndexes, self.vertexIndexes)
+            self.assertTrue(np.array_equal(expectedCosts, costs.T))
+
+    def test_givenAContractionHierarchy_then_theUnpackedPathsAreShortestPaths(self):
+        expectedCosts = DijkstraEngine(self.routingGraph).calculateCosts(self.vertexIndexes, self.vertexIndexes)
+        contractionHierarchyEngine = ContractionHierarchyEngine(self.contractionHierarchy)
+
+        for startIndex in self.vertexIndexes[::5]:
+            for endIndex in self.vertexIndexes[::3]:
+                edgeIds = contractionHierarchyEngine.calculateShortestPath(startIndex, endIndex)
+                if not np.isfinite(expectedCosts[startIndex, endIndex]):
+                    self.assertEqual([], edgeIds)
+                    continue
+
+                vertexId = self.routingGraph.vertexIds[startIndex]
+                totalCost = 0
+                for edgeId in edgeIds:
+                    edgeIndex = edgeId - 1
+                    if self.sources[edgeIndex] == vertexId and self.costs[edgeIndex] >= 0:
+                        vertexId = self.targets[edgeIndex]
+                        totalCost += self.costs[edgeIndex]
+                    else:
+                        self.assertEqual(vertexId, self.targets[edgeIndex])
+                        self.assertGreaterEqual(self.reverseCosts[edgeIndex], 0)
+                        vertexId = self.sources[edgeIndex]
+                        totalCost += self.reverseCosts[edgeIndex]
+
+                self.assertEqual(self.routingGraph.vertexIds[endIndex], vertexId)
+                self.assertEqual(expectedCosts[startIndex, endIndex], totalCost)
+
+    def test_givenAStoredContractionHierarchy_then_loadTheSameHierarchy(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "edges_distance_ch.npz")
+            self.contractionHierarchy.save(path)
+            contractionHierarchy = ContractionHierarchy.load(path)
+
+        self.assertEqual(self.contractionHierarchy.ranks.tolist(), contractionHierarchy.ranks.tolist())
+        self.assertEqual(self.contractionHierarchy.upwardGraph.edgeIds.tolist(),
+                         contractionHierarchy.upwardGraph.edgeIds.tolist())
+        self.assertEqual(self.contractionHierarchy.downwardGraph.indptr.tolist(),
+                         contractionHierarchy.downwardGraph.indptr.tolist())
+        self.assertIsNone(contractionHierarchy.upwardGraph.coordinates)
+
+    def test_givenAHierarchyOfADifferentNetwork_then_refuseToLoadIt(self):
+        contractionHierarchy = ContractionHierarchy.contract(self.routingGraph, fingerprint="400_400_-3_7")
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "edges_distance_ch.npz")
+            contractionHierarchy.save(path)
+
+            self.assertEqual("400_400_-3_7", ContractionHierarchy.load(path, "400_400_-3_7").fingerprint)
+            with self.assertRaises(OutdatedNetworkException):
+                ContractionHierarchy.load(path, "400_400_-3_8")
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.main.routing.DijkstraEngine import DijkstraEngine, calculateCostsWithSharedGraph, sharedEngines
+from src.main.routing.RoutingGraph import RoutingGraph
+
+
+class DijkstraEngineTest(unittest.TestCase):
+    def setUp(self):
+        random = np.random.RandomState(5)
+        edgeCount = 300
+        self.routingGraph = RoutingGraph.fromEdges(
+            edgeIds=np.arange(1, edgeCount + 1),
+            sources=random.randint(0, 100, edgeCount),
+            targets=random.randint(0, 100, edgeCount),
+            costs=random.randint(0, 10, edgeCount).astype(float),
+            reverseCosts=np.where(random.rand(edgeCount) < 0.5, random.randint(0, 10, edgeCount), -1)
+        )
+        self.vertexIndexes = np.arange(self.routingGraph.getVertexCount())
+
+    def test_givenAPairOfVertices_then_theBidirectionalCostIsEqualToTheOneToAllCost(self):
+        expectedCosts = DijkstraEngine(self.routingGraph).calculateCosts(self.vertexIndexes, self.vertexIndexes)
+        dijkstraEngine = DijkstraEngine(self.routingGraph)
+        for startIndex in self.vertexIndexes[::3]:
+            for endIndex in self.vertexIndexes[::2]:
+                self.assertEqual(expectedCosts[startIndex, endIndex],
+                                 dijkstraEngine.calculateCost(startIndex, endIndex))
+
+    def test_givenASmallODSet_then_useTheBidirectionalSearch(self):
+        startIndexes = [0, 5]
+        endIndexes = [9, 5, 40]
+        expectedCosts = DijkstraEngine(self.routingGraph).calculateCosts(startIndexes, endIndexes)
+        costs = DijkstraEngine(self.routingGraph, bidirectionalMaxPairs=6).calculateCosts(startIndexes, endIndexes)
+        self.assertEqual(expectedCosts.tolist(), costs.tolist())
+
+    def test_givenAMaxCost_then_thePairsOverItAreUnreachable(self):
+        expectedCosts = DijkstraEngine(self.routingGraph).calculateCosts(self.vertexIndexes, self.vertexIndexes)
+        expectedCosts[expectedCosts > 7] = np.inf
+        dijkstraEngine = DijkstraEngine(self.routingGraph)
+        self.assertEqual(expectedCosts.tolist(),
+                         dijkstraEngine.calculateCosts(self.vertexIndexes, self.vertexIndexes, maxCost=7).tolist())
+        for startIndex in self.vertexIndexes[::3]:
+            for endIndex in self.vertexIndexes[::2]:
+                self.assertEqual(expectedCosts[startIndex, endIndex],
+                                 dijkstraEngine.calculateCost(startIndex, endIndex, maxCost=7))
+
+    def test_givenTheReverseEngine_then_theCostsAreTransposed(self):
+        dijkstraEngine = DijkstraEngine(self.routingGraph)
+        startIndexes = self.vertexIndexes[::4]
+        endIndexes = self.vertexIndexes[1::9]
+        self.assertEqual(dijkstraEngine.calculateCosts(startIndexes, endIndexes).tolist(),
+                         dijkstraEngine.getReverseEngine().calculateCosts(endIndexes, startIndexes).T.tolist())
+
+    def test_givenAStoredGraph_then_theSharedGraphCostsAreEqual(self):
+        startIndexes = self.vertexIndexes[::4]
+        endIndexes = self.vertexIndexes[::3]
+        with tempfile.TemporaryDirectory() as folder:
+            pathPrefix = os.path.join(folder, "edges_distance")
+            self.routingGraph.save(pathPrefix)
+            costs = calculateCostsWithSharedGraph(pathPrefix, startIndexes, endIndexes)
+            self.assertIsInstance(sharedEngines[pathPrefix].routingGraph.heads, np.memmap)
+            del sharedEngines[pathPrefix]
+
+        self.assertEqual(DijkstraEngine(self.routingGraph).calculateCosts(startIndexes, endIndexes).tolist(),
+                         costs.tolist())
+
+    def test_givenAStoredReverseGraph_then_theSharedEngineMapsItInsteadOfReversingTheArcs(self):
+        startIndexes = self.vertexIndexes[::4]
+        endIndexes = self.vertexIndexes[::3]
+        with tempfile.TemporaryDirectory() as folder:
+            pathPrefix = os.path.join(folder, "edges_distance")
+            self.routingGraph.save(pathPrefix, reversePathPrefix=pathPrefix + "_reverse")
+            costs = calculateCostsWithSharedGraph(pathPrefix, startIndexes, endIndexes, bidirectionalMaxPairs=10 ** 6,
+                                                  reverseGraphPathPrefix=pathPrefix + "_reverse")
+            self.assertIsInstance(sharedEngines[pathPrefix].routingGraph.getReverseGraph().heads, np.memmap)
+            del sharedEngines[pathPrefix]
+
+        self.assertEqual(DijkstraEngine(self.routingGraph).calculateCosts(startIndexes, endIndexes).tolist(),
+                         costs.tolist())
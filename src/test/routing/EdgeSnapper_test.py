@@ -0,0 +1,63 @@
+import unittest
+
+import numpy as np
+import shapely
+
+from src.main.routing.EdgeSnapper import EdgeSnapper
+
+
+class EdgeSnapperTest(unittest.TestCase):
+    def setUp(self):
+        # Edge 1: 10 -> 11 (both directions), edge 2: 11 -> 12 (one way), 1000 m long each.
+        self.snapper = EdgeSnapper(edgeIds=[1, 2],
+                                   sources=[10, 11],
+                                   targets=[11, 12],
+                                   geometries=shapely.from_wkt(["LINESTRING (0 0, 1000 0)",
+                                                                "LINESTRING (1000 0, 1000 1000)"]))
+        self.snapper.edgeCosts["cost"] = {1: (100.0, 100.0), 2: (50.0, -1.0)}
+
+    def test_givenASetOfPoints_then_projectEveryPointOntoTheNearestEdge(self):
+        vertexIds, projectedCoordinates, edgeProperties = self.snapper.project([[200, 30], [990, 900]])
+
+        self.assertEqual([10, 12], vertexIds.tolist())
+        self.assertTrue(np.allclose([[200, 0], [1000, 900]], projectedCoordinates))
+        self.assertEqual(1, edgeProperties[0]["edgeId"])
+        self.assertAlmostEqual(0.2, edgeProperties[0]["edgeFraction"])
+        self.assertEqual(2, edgeProperties[1]["edgeId"])
+        self.assertAlmostEqual(0.9, edgeProperties[1]["edgeFraction"])
+
+        _, _, distances = self.snapper.snap([[200, 30], [990, 900]])
+        self.assertTrue(np.allclose([30, 10], distances))
+
+    def test_givenAPointFarFromTheNetwork_then_returnMinusOne(self):
+        vertexIds, projectedCoordinates, edgeProperties = self.snapper.project([[0, 50000]])
+
+        self.assertEqual([-1], vertexIds.tolist())
+        self.assertTrue(np.all(np.isnan(projectedCoordinates)))
+        self.assertIsNone(edgeProperties[0])
+
+    def test_givenTheCRS_then_measureTheMaxDistanceInMeters(self):
+        # About 2 EPSG:3857 units per meter at the latitude of Helsinki.
+        snapper = EdgeSnapper(edgeIds=[1], sources=[10], targets=[11],
+                              geometries=shapely.from_wkt(["LINESTRING (2775000 8435000, 2776000 8435000)"]),
+                              epsgCode="EPSG:3857")
+        vertexIds, _, edgeProperties = snapper.project([[2775000, 8450000], [2775000, 8460000]])
+
+        self.assertEqual([10, -1], vertexIds.tolist())
+        self.assertEqual(1, edgeProperties[0]["edgeId"])
+        self.assertIsNone(edgeProperties[1])
+
+    def test_givenAProjectedPoint_then_calculateThePartialEdgeCosts(self):
+        _, _, (twoWay, oneWay) = self.snapper.project([[200, 30], [990, 900]])
+
+        self.assertTrue(np.allclose([80, 20], [cost for _, cost in self.snapper.getStartCandidates(twoWay, "cost")]))
+        self.assertEqual([12], [vertexId for vertexId, _ in self.snapper.getStartCandidates(oneWay, "cost")])
+        self.assertTrue(np.allclose([5], [cost for _, cost in self.snapper.getStartCandidates(oneWay, "cost")]))
+        self.assertEqual([11], [vertexId for vertexId, _ in self.snapper.getEndCandidates(oneWay, "cost")])
+        self.assertTrue(np.allclose([45], [cost for _, cost in self.snapper.getEndCandidates(oneWay, "cost")]))
+
+    def test_givenTwoPointsOnTheSameEdge_then_calculateTheCostAlongTheEdge(self):
+        _, _, (first, second) = self.snapper.project([[1010, 100], [1010, 600]])
+
+        self.assertAlmostEqual(25, self.snapper.getSameEdgeCost(first, second, "cost"))
+        self.assertIsNone(self.snapper.getSameEdgeCost(second, first, "cost"))
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+from src.main.routing.GridVertexTable import GridVertexTable
+
+
+class GridVertexTableTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.features = []
+        for gridId, vertexId in [(5785640, 27), (5785642, 31), (5787551, 27)]:
+            self.features.append({
+                "type": "Feature",
+                "properties": {
+                    "YKR_ID": gridId,
+                    "vertex_id": vertexId,
+                    "selectedPointCoordinates": [2776505.5, 8437931.9],
+                    "nearestVertexCoordinates": [2776510.0, 8437925.0],
+                    "coordinatesCRS": "epsg:3857"
+                },
+                "geometry": {
+                    "type": "Point",
+                    "coordinates": [385986.0, 6671500.0]
+                }
+            })
+        self.gridVertexTable = GridVertexTable.fromFeatures(self.features, "YKR_ID", [4.1, 12.5, 8.0], "100_120_-3")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_givenAGridId_then_returnTheSnappedProperties(self):
+        position = self.gridVertexTable.getPosition(5785642)
+        properties = self.gridVertexTable.getProperties(position)
+
+        self.assertEqual(1, position)
+        self.assertEqual(31, properties["vertex_id"])
+        self.assertEqual([2776505.5, 8437931.9], properties["selectedPointCoordinates"])
+        self.assertEqual([2776510.0, 8437925.0], properties["nearestVertexCoordinates"])
+        self.assertEqual("epsg:3857", properties["coordinatesCRS"])
+        self.assertEqual(12.5, properties["euclideanDistanceToNearestVertex"])
+
+    def test_givenAnIdOutsideTheGrid_then_returnMinusOne(self):
+        self.assertEqual(-1, self.gridVertexTable.getPosition(5785641))
+        self.assertEqual(-1, self.gridVertexTable.getPosition(1))
+        self.assertEqual(-1, self.gridVertexTable.getPosition(9999999))
+        self.assertEqual(-1, self.gridVertexTable.getPosition("A-1"))
+        self.assertEqual(-1, self.gridVertexTable.getPosition(None))
+
+    def test_givenAStoredTable_then_loadTheSameTable(self):
+        path = os.path.join(self.folder.name, "edges_grid.npz")
+        self.gridVertexTable.save(path)
+        gridVertexTable = GridVertexTable.load(path)
+
+        self.assertEqual("100_120_-3", gridVertexTable.fingerprint)
+        for feature in self.features:
+            gridId = feature["properties"]["YKR_ID"]
+            self.assertEqual(self.gridVertexTable.getProperties(self.gridVertexTable.getPosition(gridId)),
+                             gridVertexTable.getProperties(gridVertexTable.getPosition(gridId)))
+
+    def test_givenGridPointsProjectedOntoEdges_then_keepTheEdgeProjection(self):
+        self.features[1]["properties"].update({"edgeId": 7, "edgeFraction": 0.25, "sourceVertexId": 31,
+                                               "targetVertexId": 32})
+        path = os.path.join(self.folder.name, "edges_edge_grid.npz")
+        GridVertexTable.fromFeatures(self.features, "YKR_ID", [4.1, 12.5, 8.0], "100_120_-3").save(path)
+        gridVertexTable = GridVertexTable.load(path)
+
+        properties = gridVertexTable.getProperties(gridVertexTable.getPosition(5785642))
+        for key in ["edgeId", "edgeFraction", "sourceVertexId", "targetVertexId"]:
+            self.assertEqual(self.features[1]["properties"][key], properties[key])
+        self.assertNotIn("edgeId", gridVertexTable.getProperties(gridVertexTable.getPosition(5785640)))
@@ -0,0 +1,46 @@
+import unittest
+
+import numpy as np
+
+from src.main.routing.KDTreeSnapper import KDTreeSnapper
+
+
+class KDTreeSnapperTest(unittest.TestCase):
+    def setUp(self):
+        random = np.random.RandomState(3)
+        self.vertexIds = random.choice(np.arange(1000, 5000), 200, replace=False)
+        self.coordinates = random.rand(200, 2) * 10000 + [2770000, 8430000]
+        self.snapper = KDTreeSnapper(self.vertexIds, self.coordinates)
+
+    def test_givenASetOfPoints_then_snapEveryPointToTheNearestVertex(self):
+        points = np.random.RandomState(4).rand(50, 2) * 10000 + [2770000, 8430000]
+        vertexIds, vertexCoordinates, distances = self.snapper.snap(points)
+
+        allDistances = np.linalg.norm(points[:, np.newaxis, :] - self.coordinates[np.newaxis, :, :], axis=2)
+        nearest = np.argmin(allDistances, axis=1)
+        self.assertEqual(self.vertexIds[nearest].tolist(), vertexIds.tolist())
+        self.assertEqual(self.coordinates[nearest].tolist(), vertexCoordinates.tolist())
+        self.assertTrue(np.allclose(allDistances.min(axis=1), distances))
+
+    def test_givenNoPoints_then_returnEmptyArrays(self):
+        vertexIds, vertexCoordinates, distances = self.snapper.snap([])
+        self.assertEqual(0, len(vertexIds))
+        self.assertEqual((0, 2), vertexCoordinates.shape)
+
+    def test_givenPointsFartherThanTheMaxDistance_then_leaveThemUnsnapped(self):
+        points = [[2775000, 8435000], [2775000, 8460000], [2755000, 8435000]]
+        vertexIds, vertexCoordinates, distances = self.snapper.snap(points)
+
+        self.assertNotEqual(-1, vertexIds[0])
+        self.assertEqual([-1, -1], vertexIds[1:].tolist())
+        self.assertTrue(np.isnan(vertexCoordinates[1:]).all())
+        self.assertTrue(np.isnan(distances[1:]).all())
+
+    def test_givenTheCRS_then_measureTheMaxDistanceInMeters(self):
+        # About 2 EPSG:3857 units per meter at the latitude of Helsinki.
+        snapper = KDTreeSnapper(self.vertexIds, self.coordinates, epsgCode="EPSG:3857")
+        vertexIds, _, distances = snapper.snap([[2775000, 8455000], [2775000, 8465000]])
+
+        self.assertNotEqual(-1, vertexIds[0])
+        self.assertGreater(distances[0], snapper.maxDistance)
+        self.assertEqual(-1, vertexIds[1])
@@ -0,0 +1,77 @@
+import unittest
+
+from src.main.connection.PostgisServiceProvider import PostgisServiceProvider
+from src.main.entities import Point
+from src.main.routing.PostgisSnapper import PostgisSnapper
+from src.main.transportMode.PrivateCarTransportMode import PrivateCarTransportMode
+
+
+class PostgisSnapperTest(unittest.TestCase):
+    def setUp(self):
+        self.privateCarTransportMode = PrivateCarTransportMode(PostgisServiceProvider())
+        self.postgisSnapper = PostgisSnapper(self.privateCarTransportMode)
+        self.coordinates = [[2776505.5, 8437931.9], [2780712.1, 8439361.2], [2771234.4, 8434129.6]]
+
+    def test_givenASetOfPoints_then_retrieveTheSameVerticesAsThePointQueries(self):
+        expectedVertexIds = []
+        for x, y in self.coordinates:
+            geojson = self.privateCarTransportMode.getNearestRoutableVertexFromAPoint(
+                Point(latitute=y, longitude=x, epsgCode=self.privateCarTransportMode.getEPSGCode()))
+            expectedVertexIds.append(geojson["features"][0]["properties"]["id"])
+
+        vertexIds, vertexCoordinates, distances = self.postgisSnapper.snap(self.coordinates)
+        self.assertEqual(expectedVertexIds, vertexIds.tolist())
+        self.assertEqual((3, 2), vertexCoordinates.shape)
+
+    def test_givenTheRoutableVerticesTable_then_retrieveTheSameVertices(self):
+        expectedVertexIds, _, _ = self.postgisSnapper.snap(self.coordinates)
+
+        self.postgisSnapper.createRoutableVerticesTable()
+        postgisSnapper = PostgisSnapper(self.privateCarTransportMode)
+        self.assertTrue(postgisSnapper.hasRoutableVerticesTable())
+
+        vertexIds, _, _ = postgisSnapper.snap(self.coordinates)
+        self.assertEqual(expectedVertexIds.tolist(), vertexIds.tolist())
+
+
+class PostgisSnapperSQLTest(unittest.TestCase):
+    def setUp(self):
+        class ServiceProvider:
+            routableVerticesTable = False
+
+            def executeReturningRows(self, sql):
+                return [[self.routableVerticesTable]]
+
+        class TransportMode:
+            serviceProvider = ServiceProvider()
+            tableName = "edges"
+
+            def getEPSGCode(self):
+                return "EPSG:3857"
+
+            def getRoutableVerticesSQL(self):
+                return "SELECT id FROM routable_vertices_sql"
+
+            def getRoutableVerticesTableName(self):
+                return "edges_routable_vertices"
+
+        self.transportMode = TransportMode()
+        # Helsinki, where one meter is about two EPSG:3857 units.
+        self.coordinates = [[2776505.5, 8437931.9]]
+
+    def test_givenNoRoutableVerticesTable_then_boundTheLookupsByTheMaxDistanceInMeters(self):
+        postgisSnapper = PostgisSnapper(self.transportMode)
+        sql = postgisSnapper.getNearestRoutableVerticesSQL(self.coordinates)
+
+        self.assertIn("FROM edges_vertices_pgr AS vertices WHERE ST_DWithin(vertices.the_geom, p.geom, p.max_distance)",
+                      sql)
+        maxDistance = float(sql.split("(VALUES (0,2776505.5,8437931.9,")[1].split(")")[0])
+        self.assertAlmostEqual(2 * postgisSnapper.maxDistance, maxDistance, delta=0.01 * maxDistance)
+
+    def test_givenTheRoutableVerticesTable_then_boundTheLookupsByTheMaxDistanceInMeters(self):
+        self.transportMode.serviceProvider.routableVerticesTable = True
+        sql = PostgisSnapper(self.transportMode).getNearestRoutableVerticesSQL(self.coordinates)
+
+        self.assertIn("FROM edges_routable_vertices AS vertices "
+                      "WHERE ST_DWithin(vertices.the_geom, p.geom, p.max_distance)", sql)
+        self.assertNotIn("routable_vertices_sql", sql)
@@ -0,0 +1,75 @@
+import unittest
+
+import numpy as np
+
+from src.main.routing.DijkstraEngine import DijkstraEngine
+from src.main.routing.RoutingGraph import RoutingGraph
+
+
+class RoutingGraphTest(unittest.TestCase):
+    def setUp(self):
+        #  10 --(1)--> 20 --(2)--> 30
+        #   \<--(4)---------------/ (edge 3 is two-way, cost 4 both directions)
+        #  20 <--(1)-- 40, edge 4 is not routable (-1 in both directions)
+        self.routingGraph = RoutingGraph.fromEdges(
+            edgeIds=[1, 2, 3, 4, 5],
+            sources=[10, 20, 10, 20, 40],
+            targets=[20, 30, 30, 50, 20],
+            costs=[1, 2, 4, -1, 1],
+            reverseCosts=[-1, -1, 4, -1, -1],
+            vertexIds=[50, 40, 30, 20, 10],
+            coordinates=[[5, 5], [4, 4], [3, 3], [2, 2], [1, 1]]
+        )
+
+    def test_givenEdgesRows_then_buildTheCSRArrays(self):
+        self.assertEqual([10, 20, 30, 40, 50], self.routingGraph.vertexIds.tolist())
+        self.assertEqual([1, 1], self.routingGraph.coordinates[0].tolist())
+        self.assertEqual(5, self.routingGraph.getArcCount())
+        self.assertEqual([0, 2, 3, 4, 5, 5], self.routingGraph.indptr.tolist())
+        self.assertEqual([1, 2, 2, 0, 1], self.routingGraph.heads.tolist())
+        self.assertEqual([1, 3, 2, 3, 5], self.routingGraph.edgeIds.tolist())
+
+    def test_givenParallelEdges_then_keepTheCheapestArc(self):
+        routingGraph = RoutingGraph.fromEdges(edgeIds=[1, 2], sources=[1, 1], targets=[2, 2],
+                                              costs=[5, 3], reverseCosts=[-1, 7])
+        self.assertEqual(2, routingGraph.getArcCount())
+        self.assertEqual(2, routingGraph.edgeIds[routingGraph.getArcPosition(0, 1)])
+        self.assertEqual(3, routingGraph.weights[routingGraph.getArcPosition(0, 1)])
+        self.assertEqual(-1, routingGraph.getArcPosition(1, 1))
+
+    def test_givenEdgesWithUnknownVertices_then_dropTheirArcs(self):
+        # Vertex 25 (between 20 and 30) and 99 (after the last id) are not in the vertex ids.
+        routingGraph = RoutingGraph.fromEdges(edgeIds=[1, 2, 3], sources=[10, 20, 10], targets=[20, 25, 99],
+                                              costs=[1, 1, 1], reverseCosts=[-1, -1, -1], vertexIds=[10, 20, 30])
+        self.assertEqual(1, routingGraph.getArcCount())
+        self.assertEqual([1], routingGraph.edgeIds.tolist())
+        self.assertEqual([0, 1, 1, 1], routingGraph.indptr.tolist())
+
+    def test_givenVertexIds_then_retrieveTheirIndexes(self):
+        self.assertEqual([4, -1, 0, -1], self.routingGraph.getVertexIndexes([50, 60, 10, 1]).tolist())
+
+    def test_givenAGraph_then_reverseAllTheArcs(self):
+        reverseGraph = self.routingGraph.getReverseGraph()
+        self.assertEqual(self.routingGraph.getArcCount(), reverseGraph.getArcCount())
+        self.assertNotEqual(-1, reverseGraph.getArcPosition(1, 0))
+        self.assertEqual(-1, reverseGraph.getArcPosition(0, 1))
+
+    def test_givenASetOfVertices_then_calculateTheOneToAllCosts(self):
+        dijkstraEngine = DijkstraEngine(self.routingGraph)
+        costs = dijkstraEngine.calculateCosts([0, 3, 4], [0, 1, 2])
+
+        expected = np.array([[0, 1, 3],
+                             [7, 1, 3],
+                             [np.inf, np.inf, np.inf]])
+        np.testing.assert_array_equal(expected, costs)
+
+    def test_givenAShortestPathTree_then_extractThePathToEveryVertex(self):
+        dijkstraEngine = DijkstraEngine(self.routingGraph)
+        shortestPathTree = dijkstraEngine.calculateShortestPathTree(3)
+
+        self.assertEqual(40, shortestPathTree.getStartVertexId())
+        self.assertEqual([5, 2, 3], shortestPathTree.getEdgeIds(0))
+        self.assertEqual(7, shortestPathTree.getCost(0))
+        self.assertEqual([5], shortestPathTree.getEdgeIds(1))
+        self.assertEqual([], shortestPathTree.getEdgeIds(3))
+        self.assertEqual([], shortestPathTree.getEdgeIds(4))
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+
+from src.main.routing.KDTreeSnapper import KDTreeSnapper
+from src.main.routing.SnappingCache import SnappingCache
+
+
+class SnappingCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "edges_snapping.sqlite")
+        self.feature = {
+            "type": "Feature",
+            "properties": {
+                "YKR_ID": 5785640,
+                "vertex_id": 27,
+                "selectedPointCoordinates": [2776505.5, 8437931.9],
+                "nearestVertexCoordinates": [2776510.0, 8437925.0],
+                "coordinatesCRS": "epsg:3857"
+            },
+            "geometry": {
+                "type": "Point",
+                "coordinates": [385986.0, 6671500.0]
+            }
+        }
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_givenASnappedPoint_then_retrieveItInTheNextExecution(self):
+        SnappingCache(self.path, "100_120_-3").put([self.feature], "YKR_ID", "epsg:3067")
+
+        vertexID, properties = SnappingCache(self.path, "100_120_-3").get(5785640, [385986.0, 6671500.0],
+                                                                          "epsg:3067")
+        self.assertEqual(27, vertexID)
+        for key in properties:
+            self.assertEqual(self.feature["properties"][key], properties[key])
+
+    def test_givenADifferentPoint_then_returnNone(self):
+        snappingCache = SnappingCache(self.path, "100_120_-3")
+        snappingCache.put([self.feature], "YKR_ID", "epsg:3067")
+
+        self.assertIsNone(snappingCache.get(5785641, [385986.0, 6671500.0], "epsg:3067"))
+        self.assertIsNone(snappingCache.get(5785640, [385986.0, 6671750.0], "epsg:3067"))
+        self.assertIsNone(snappingCache.get(5785640, [385986.0, 6671500.0], "epsg:3857"))
+
+    def test_givenANewNetworkFingerprint_then_discardTheSnappedPoints(self):
+        SnappingCache(self.path, "100_120_-3").put([self.feature], "YKR_ID", "epsg:3067")
+
+        self.assertIsNone(SnappingCache(self.path, "101_121_8").get(5785640, [385986.0, 6671500.0], "epsg:3067"))
+        self.assertIsNone(SnappingCache(self.path, "100_120_-3").get(5785640, [385986.0, 6671500.0], "epsg:3067"))
+
+    def test_givenAPointProjectedOntoAnEdge_then_retrieveTheEdgeProjection(self):
+        self.feature["properties"].update({"edgeId": 7, "edgeFraction": 0.25, "sourceVertexId": 27,
+                                           "targetVertexId": 28})
+        SnappingCache(self.path, "100_120_-3").put([self.feature], "YKR_ID", "epsg:3067")
+
+        _, properties = SnappingCache(self.path, "100_120_-3").get(5785640, [385986.0, 6671500.0], "epsg:3067")
+        for key in ["edgeId", "edgeFraction", "sourceVertexId", "targetVertexId"]:
+            self.assertEqual(self.feature["properties"][key], properties[key])
+
+    def test_givenAnUnsnappedPoint_then_doNotStoreIt(self):
+        self.feature["properties"]["vertex_id"] = -1
+        snappingCache = SnappingCache(self.path, "100_120_-3")
+        snappingCache.put([self.feature], "YKR_ID", "epsg:3067")
+
+        self.assertIsNone(snappingCache.get(5785640, [385986.0, 6671500.0], "epsg:3067"))
+
+    def test_givenDifferentSnappingModes_then_useDifferentNames(self):
+        self.assertEqual("vertex", SnappingCache.getSnappingMode(None))
+        self.assertEqual("kdtree_scc", SnappingCache.getSnappingMode(KDTreeSnapper([1], [[0, 0]]), True))
@@ -0,0 +1,34 @@
+import unittest
+
+from src.main.routing.RoutingGraph import RoutingGraph
+from src.main.routing.StronglyConnectedComponents import StronglyConnectedComponents
+
+
+class StronglyConnectedComponentsTest(unittest.TestCase):
+    def setUp(self):
+        # 10 <-> 11 <-> 12 <-> 10 is the main network, 12 -> 13 is a one way dead end and 20 <-> 21 an island.
+        routingGraph = RoutingGraph.fromEdges(edgeIds=[1, 2, 3, 4, 5],
+                                              sources=[10, 11, 12, 12, 20],
+                                              targets=[11, 12, 10, 13, 21],
+                                              costs=[1, 1, 1, 1, 1],
+                                              reverseCosts=[1, 1, 1, -1, 1])
+        self.components = StronglyConnectedComponents.fromRoutingGraph(routingGraph)
+
+    def test_givenADirectedNetwork_then_labelTheStronglyConnectedComponents(self):
+        self.assertEqual(3, self.components.getComponentCount())
+        self.assertEqual([10, 11, 12], self.components.getLargestComponentVertexIds().tolist())
+
+        componentIds = self.components.getComponentIds([10, 12, 13, 20, 21])
+        self.assertEqual(componentIds[0], componentIds[1])
+        self.assertNotEqual(componentIds[0], componentIds[2])
+        self.assertNotEqual(componentIds[0], componentIds[3])
+        self.assertEqual(componentIds[3], componentIds[4])
+
+    def test_givenAnUnknownVertex_then_returnMinusOne(self):
+        self.assertEqual([-1, -1, -1], self.components.getComponentIds([1, 15, 99]).tolist())
+
+    def test_givenTwoVertices_then_checkTheyAreReachable(self):
+        self.assertTrue(self.components.isReachable(10, 12))
+        self.assertFalse(self.components.isReachable(12, 13))
+        self.assertFalse(self.components.isReachable(10, 20))
+        self.assertFalse(self.components.isReachable(10, 99))
@@ -0,0 +1,41 @@
+import tempfile
+import unittest
+
+from src.main.routing.Landmarks import Landmarks
+from src.main.routing.RoutingGraph import RoutingGraph
+from src.main.transportMode.AltTransportMode import AltTransportMode
+from src.main.util import CostAttributes
+
+
+class AltTransportModeTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.routingGraph = RoutingGraph.fromEdges(edgeIds=[1, 2, 3], sources=[10, 20, 30], targets=[20, 30, 40],
+                                                   costs=[1, 2, 3], reverseCosts=[1, 2, 3])
+
+        class TransportMode:
+            serviceProvider = None
+            tableName = "edges"
+
+        self.altTransportMode = AltTransportMode(TransportMode())
+        self.altTransportMode.graphsFolder = self.folder.name
+        self.altTransportMode.getRoutingGraph = lambda costAttribute: self.routingGraph
+        self.altTransportMode.getNetworkFingerprint = lambda costAttribute: "4_3_-7_12"
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_givenLandmarksOfAModifiedGraph_then_selectTheLandmarksAgain(self):
+        # Landmarks of a previous version of the network, without the vertex 10.
+        previousGraph = RoutingGraph.fromEdges(edgeIds=[2, 3], sources=[20, 30], targets=[30, 40], costs=[2, 3],
+                                               reverseCosts=[2, 3])
+        pathPrefix = self.altTransportMode.getLandmarksPathPrefix(CostAttributes.DISTANCE)
+        Landmarks.select(previousGraph, landmarkCount=2, fingerprint="3_3_-5_9").save(pathPrefix)
+
+        altEngine = self.altTransportMode.createRoutingEngine(CostAttributes.DISTANCE)
+
+        self.assertEqual([10, 20, 30, 40], altEngine.landmarks.vertexIds.tolist())
+        self.assertEqual((4, 4), altEngine.landmarks.forwardCosts.shape)
+        self.assertLessEqual(altEngine.landmarks.getHeuristic(0, 3), 6)
+        del altEngine
+        self.assertEqual("4_3_-7_12", Landmarks.load(pathPrefix, self.routingGraph, "4_3_-7_12").fingerprint)
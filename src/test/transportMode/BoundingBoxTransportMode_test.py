@@ -0,0 +1,83 @@
+import unittest
+
+from src.main.connection.PostgisServiceProvider import PostgisServiceProvider
+from src.main.routing.StronglyConnectedComponents import StronglyConnectedComponents
+from src.main.transportMode.BoundingBoxTransportMode import BoundingBoxTransportMode
+from src.main.transportMode.PrivateCarTransportMode import PrivateCarTransportMode
+from src.main.util import CostAttributes
+
+
+class BoundingBoxTransportModeTest(unittest.TestCase):
+    def setUp(self):
+        postgisServiceProvider = PostgisServiceProvider()
+        self.privateCarTransportMode = PrivateCarTransportMode(postgisServiceProvider)
+        self.boundingBoxTransportMode = BoundingBoxTransportMode(self.privateCarTransportMode)
+        self.verticesID = [99080, 78618, 45174, 46020, 44823, 110372, 140220, 78317, 106993, 127209, 33861, 49020]
+
+    def test_givenAPairOfVertex_then_retrieveTheSameShortestPathEdges(self):
+        expectedShortestPath = self.privateCarTransportMode.getShortestPath(startVertexId=59227,
+                                                                            endVertexId=2692,
+                                                                            cost=CostAttributes.DISTANCE)
+        shortestPath = self.boundingBoxTransportMode.getShortestPath(startVertexId=59227,
+                                                                     endVertexId=2692,
+                                                                     cost=CostAttributes.DISTANCE)
+        self.assertEqual(sorted(feature["properties"]["id"] for feature in expectedShortestPath["features"]),
+                         sorted(feature["properties"]["id"] for feature in shortestPath["features"]))
+
+    def test_givenASetOfVertexesVsASetOfVertexes_then_retrieveTheSameCostSummary(self):
+        expectedSummary = self.privateCarTransportMode.getTotalShortestPathCostManyToMany(
+            startVerticesID=self.verticesID,
+            endVerticesID=self.verticesID,
+            costAttribute=CostAttributes.DISTANCE
+        )
+        summary = self.boundingBoxTransportMode.getTotalShortestPathCostManyToMany(
+            startVerticesID=self.verticesID,
+            endVerticesID=self.verticesID,
+            costAttribute=CostAttributes.DISTANCE
+        )
+        self.assertEqual(self.getTotalCosts(expectedSummary), self.getTotalCosts(summary))
+
+    def test_givenAVertexVsASetOfVertexes_then_retrieveTheSameCostSummary(self):
+        expectedSummary = self.privateCarTransportMode.getTotalShortestPathCostOneToMany(
+            startVertexID=99080,
+            endVerticesID=self.verticesID,
+            costAttribute=CostAttributes.DISTANCE
+        )
+        summary = self.boundingBoxTransportMode.getTotalShortestPathCostOneToMany(
+            startVertexID=99080,
+            endVerticesID=self.verticesID,
+            costAttribute=CostAttributes.DISTANCE
+        )
+        self.assertEqual(self.getTotalCosts(expectedSummary), self.getTotalCosts(summary))
+
+    def test_givenPairsOfDifferentComponents_then_doNotRetryTheQuery(self):
+        class RecordingServiceProvider:
+            def __init__(self):
+                self.queries = []
+
+            def execute(self, sql):
+                self.queries.append(sql)
+                return {"features": [{"properties": {"start_vertex_id": 1, "end_vertex_id": 2, "total_cost": 5.0}}]}
+
+        serviceProvider = RecordingServiceProvider()
+        self.privateCarTransportMode.serviceProvider = serviceProvider
+        # The vertices 3 and 4 can not be reached from the vertices 1 and 2.
+        components = StronglyConnectedComponents(vertexIds=[1, 2, 3, 4], labels=[0, 0, 1, 2])
+        boundingBoxTransportMode = BoundingBoxTransportMode(self.privateCarTransportMode,
+                                                            {CostAttributes.DISTANCE: components})
+
+        self.assertEqual(2, boundingBoxTransportMode.getReachablePairCount({1, 2, 3}, {1, 2, 4, 5},
+                                                                           CostAttributes.DISTANCE))
+        summary = boundingBoxTransportMode.calculateCostSummary([1, 3], [2, 4], CostAttributes.DISTANCE)
+        self.assertEqual({(1, 2): 5.0}, self.getTotalCosts(summary))
+        self.assertEqual(1, len(serviceProvider.queries))
+
+        boundingBoxTransportMode.getShortestPath(1, 4, CostAttributes.DISTANCE)
+        self.assertEqual(2, len(serviceProvider.queries))
+
+    def getTotalCosts(self, summary):
+        return {
+            (feature["properties"]["start_vertex_id"], feature["properties"]["end_vertex_id"]):
+                feature["properties"]["total_cost"]
+            for feature in summary["features"]
+        }
@@ -1,6 +1,8 @@
 import os
 import unittest
 
+import numpy as np
+
 from src.main.connection.PostgisServiceProvider import PostgisServiceProvider
 from src.main.entities import Point
 from src.main.logic.Operations import Operations
@@ -92,6 +94,42 @@ class PrivateCarTransportModeTest(unittest.TestCase):
         )
         self.assertEqual(expectedSummary, summaryShortestPathCostManyToMany)
 
+    def test_givenNoSummaryGeometry_then_queryOnlyTheVertexIdsAndCosts(self):
+        class RecordingServiceProvider:
+            def __init__(self):
+                self.queries = []
+
+            def executeStagedCopyReturningArrays(self, sql, columnTypes, startVerticesID, endVerticesID, blocks,
+                                                 jobs=1):
+                self.queries.append((sql, columnTypes, blocks))
+                return [[np.array([1, 1]), np.array([2, 3]), np.array([10.0, 20.0])]]
+
+        serviceProvider = RecordingServiceProvider()
+        privateCarTransportMode = PrivateCarTransportMode(serviceProvider, summaryGeometry=False)
+
+        geojson = privateCarTransportMode.getTotalShortestPathCostManyToMany(
+            startVerticesID=[1, 4],
+            endVerticesID=[2, 3],
+            costAttribute=CostAttributes.DISTANCE
+        )
+
+        sql, columnTypes, blocks = serviceProvider.queries[0]
+        self.assertEqual(["i8", "i8", "f8"], columnTypes)
+        self.assertNotIn("the_geom", sql)
+        self.assertEqual(1, len(blocks))
+        self.assertEqual([None, None], [feature["geometry"] for feature in geojson["features"]])
+        self.assertEqual([10.0, 20.0], [feature["properties"]["total_cost"] for feature in geojson["features"]])
+
+        startVerticesID, endVerticesID, totalCosts = privateCarTransportMode.getTotalShortestPathCostManyToManyColumns(
+            startVerticesID=[1, 4],
+            endVerticesID=[2, 3],
+            costAttribute=CostAttributes.DISTANCE
+        )
+        self.assertEqual(serviceProvider.queries[0], serviceProvider.queries[1])
+        self.assertEqual([1, 1], startVerticesID.tolist())
+        self.assertEqual([2, 3], endVerticesID.tolist())
+        self.assertEqual([10.0, 20.0], totalCosts.tolist())
+
     def test_bucle(self):
         arrayList = [0, 1, 2, 3, 4, 5, 6, 7, 8]
         expected = [[0, 3], [4, 7], [8, 8]]
@@ -0,0 +1,34 @@
+import unittest
+
+import numpy as np
+
+from src.main.util import CostSummaryAccumulator
+
+
+class CostSummaryAccumulatorTest(unittest.TestCase):
+    def test_givenSeveralBlocks_then_concatenateTheirColumnsInOrder(self):
+        costSummary = CostSummaryAccumulator(3)
+        for block in range(10000):
+            costSummary.add([np.array([block]), np.array([block + 1]), np.array([block * 0.5])])
+        costSummary.add([np.empty(0), np.empty(0), np.empty(0)])
+
+        startVerticesID, endVerticesID, totalCosts = costSummary.getColumns()
+
+        self.assertEqual(list(range(10000)), startVerticesID.tolist())
+        self.assertEqual(list(range(1, 10001)), endVerticesID.tolist())
+        self.assertEqual(4999.5, totalCosts[-1])
+
+    def test_givenTheVertexCoordinates_then_createLineStringFeatures(self):
+        costSummary = CostSummaryAccumulator(7)
+        costSummary.add([np.array([1]), np.array([2]), np.array([10.0]),
+                         np.array([0.0]), np.array([1.0]), np.array([2.0]), np.array([3.0])])
+
+        feature = costSummary.toGeojson()["features"][0]
+
+        self.assertEqual({"start_vertex_id": 1, "end_vertex_id": 2, "total_cost": 10.0}, feature["properties"])
+        self.assertEqual([[0.0, 1.0], [2.0, 3.0]], feature["geometry"]["coordinates"])
+
+    def test_givenNoBlocks_then_createAnEmptySummary(self):
+        costSummary = CostSummaryAccumulator(3)
+
+        self.assertEqual([], costSummary.toGeojson()["features"])